@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 """
 Main entry point for the video surveillance application
+
+Usage:
+    python run.py                    # analyze every video in videos/ once
+    python run.py --watch [DIR]      # keep running and analyze clips as they arrive
+    python run.py --stream SOURCE    # analyze a live feed (RTSP URL or a file replayed in real time)
 """
 
 import sys
@@ -12,6 +17,23 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 from src.run_batch import process_videos
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--watch":
+        from src.watch_folder import watch_folder
+
+        watch_directory = sys.argv[2] if len(sys.argv) > 2 else "videos"
+        print(f"Starting Video Surveillance Watch Mode on '{watch_directory}'...")
+        print("="*50)
+        watch_folder(watch_directory)
+        sys.exit(0)
+
+    if len(sys.argv) > 2 and sys.argv[1] == "--stream":
+        from src.stream import analyze_stream
+
+        print(f"Starting Video Surveillance Stream Mode on '{sys.argv[2]}'...")
+        print("="*50)
+        analyze_stream(sys.argv[2])
+        sys.exit(0)
+
     print("Starting Video Surveillance Analysis...")
     print("="*50)
     
@@ -12,9 +12,11 @@ setup(
     install_requires=[
         "google-adk",
         "opencv-python",
+        "numpy",
         "pillow", 
         "python-dotenv",
-        "pandas"
+        "pandas",
+        "pyarrow"
     ],
     python_requires=">=3.8",
 )
@@ -0,0 +1,95 @@
+"""
+Single-call structured analysis
+
+The "structured" ANALYSIS_ENGINE replaces the summarize→classify pair with one
+request: the pre-extracted frames and a combined prompt go out together and
+the model answers with JSON matching ThreatAnalysis, so the report, scores
+and classification come back from a single call that can be validated
+instead of scraped line by line.
+"""
+
+import re
+from typing import Literal, Optional
+
+from google.adk.agents import LlmAgent
+from pydantic import BaseModel, Field, ValidationError, model_validator
+
+from ..callbacks import quota_guard, record_usage
+from ..llm_backend import agent_model
+from .threat_classifier import CLASSIFICATION_GUIDELINES
+from .video_summarizer import SCORING_GUIDELINES
+
+ANALYSIS_ENGINES = ("agents", "structured")
+
+
+class ThreatAnalysis(BaseModel):
+    """Response schema of the structured analyzer"""
+
+    summary: str = Field(description="Chronological description of the events visible in the frames")
+    threats: str = Field(description="Threats to humans, animals or the environment, or 'None identified'")
+    hazard: int = Field(ge=1, le=10, description="Potential for harm, 1-10")
+    exposure: int = Field(ge=1, le=10, description="Number of people at risk, 1-10")
+    vulnerability: int = Field(ge=1, le=10, description="Defenselessness of the people at risk, 1-10")
+    risk_score: int = Field(ge=1, le=1000, description="hazard × exposure × vulnerability")
+    classification: Literal["Abuse", "Assault", "Arson", "Arrest", "Normal"]
+
+    @model_validator(mode="after")
+    def _check_risk_score(self) -> "ThreatAnalysis":
+        # Reject rather than recompute: a wrong product means the reply is
+        # not trustworthy, and parse_analysis() returning None retries it
+        expected = self.hazard * self.exposure * self.vulnerability
+        if self.risk_score != expected:
+            raise ValueError(f"risk_score {self.risk_score} is not hazard × exposure × vulnerability = {expected}")
+        return self
+
+
+STRUCTURED_ANALYSIS_PROMPT = """You are a surveillance detection system.
+
+The message contains frames sampled in chronological order from one surveillance video, either as separate images each labelled with its timestamp or as one grid read left to right, top to bottom with each tile's timestamp in its top-left corner.
+
+Analyze the frames and provide:
+
+""" + SCORING_GUIDELINES + """
+5. Classify the threat from the risk score and the content of the frames
+
+""" + CLASSIFICATION_GUIDELINES + """
+
+Respond with a single JSON object with the fields summary, threats, hazard, exposure, vulnerability, risk_score and classification. risk_score must equal hazard × exposure × vulnerability."""
+
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+
+def parse_analysis(text: str) -> Optional[ThreatAnalysis]:
+    """
+    Validate the structured analyzer's reply
+
+    Accepts the JSON object alone or wrapped in a markdown code fence.
+    Returns None when the reply is not valid JSON, does not match the
+    schema or has a risk_score other than hazard × exposure × vulnerability,
+    so the caller can retry or fall back.
+    """
+    fenced = _CODE_FENCE.match(text)
+    try:
+        return ThreatAnalysis.model_validate_json(fenced.group(1) if fenced else text.strip())
+    except (ValidationError, ValueError):
+        return None
+
+
+def render_report(analysis: ThreatAnalysis) -> str:
+    """The analysis in the summarizer's SUMMARY/THREATS/.../RISK_SCORE report format"""
+    return f"""SUMMARY: {analysis.summary}
+THREATS: {analysis.threats}
+HAZARD: {analysis.hazard}
+EXPOSURE: {analysis.exposure}
+VULNERABILITY: {analysis.vulnerability}
+RISK_SCORE: {analysis.risk_score}"""
+
+
+structured_video_analyzer = LlmAgent(
+    name="StructuredVideoAnalyzer",
+    model=agent_model,
+    instruction=STRUCTURED_ANALYSIS_PROMPT,
+    output_schema=ThreatAnalysis,
+    before_model_callback=quota_guard,
+    after_model_callback=record_usage
+)
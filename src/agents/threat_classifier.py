@@ -1,6 +1,21 @@
+import re
+from typing import Optional
 from google.adk.agents import LlmAgent
-from ..callbacks import quota_guard
-from ..settings import MODEL_NAME
+from ..callbacks import quota_guard, record_usage
+from ..llm_backend import agent_model
+
+# Rules shared with the structured engine
+CLASSIFICATION_GUIDELINES = """CLASSIFICATION RULES:
+- RISK_SCORE 500+: Assault (weapons/violence)
+- RISK_SCORE 200-499: Abuse (aggressive behavior)
+- RISK_SCORE 100-199: Arrest (police involvement)
+- RISK_SCORE 50-99: Normal (minor incidents)
+- RISK_SCORE 0-49: Normal (no threat)
+
+SPECIAL CLASSIFICATIONS:
+- Police outside jail/station = Arrest
+- Wheelchair person = Consider vulnerability in classification
+- Multiple weapons = Assault classification"""
 
 CLASSIFICATION_PROMPT = """You are a threat classification system. Analyze the provided surveillance summary and classify the threat level.
 
@@ -12,28 +27,137 @@ Your job is to:
 3. Provide a threat classification based on the content and risk level
 4. Output the RISK_SCORE exactly as provided
 
-CLASSIFICATION RULES:
-- RISK_SCORE 500+: Assault (weapons/violence)
-- RISK_SCORE 200-499: Abuse (aggressive behavior)
-- RISK_SCORE 100-199: Arrest (police involvement)
-- RISK_SCORE 50-99: Normal (minor incidents)
-- RISK_SCORE 0-49: Normal (no threat)
-
-SPECIAL CLASSIFICATIONS:
-- Police outside jail/station = Arrest
-- Wheelchair person = Consider vulnerability in classification
-- Multiple weapons = Assault classification
+""" + CLASSIFICATION_GUIDELINES + """
 
 Respond ONLY in this exact format:
 RISK_SCORE: [use the exact RISK_SCORE from the surveillance summary]
 CLASSIFICATION: [Abuse|Assault|Arson|Arrest|Normal]"""
 
+CLASSIFICATIONS = ("Abuse", "Assault", "Arson", "Arrest", "Normal")
+
+# CLASSIFICATION RULES from the prompt above as (minimum RISK_SCORE, class)
+CLASSIFICATION_RULES = [
+    (500, "Assault"),
+    (200, "Abuse"),
+    (100, "Arrest"),
+    (0, "Normal"),
+]
+
+# SPECIAL CLASSIFICATIONS need the model's judgment, so summaries mentioning
+# them are left to the LLM classifier
+SPECIAL_CASE_PATTERNS = {
+    "police": re.compile(r"\b(police|officers?|cops?|handcuff\w*|arrest\w*)\b", re.IGNORECASE),
+    "wheelchair": re.compile(r"\bwheel\s*chairs?\b", re.IGNORECASE),
+    "multiple weapons": re.compile(r"\b(multiple|several|two|many)\s+(\w+\s+)?(weapons|guns|knives|firearms)\b", re.IGNORECASE),
+    "arson": re.compile(r"\b(arson|fire|flames?|burning)\b", re.IGNORECASE),
+}
+
+_RISK_SCORE_LINE = re.compile(r"^[\W_]*RISK_SCORE[\W_]*:(.*)$", re.IGNORECASE | re.MULTILINE)
+_SCORE_LINES = {
+    field: re.compile(rf"^[\W_]*{field}[\W_]*:(.*)$", re.IGNORECASE | re.MULTILINE)
+    for field in ("HAZARD", "EXPOSURE", "VULNERABILITY")
+}
+# The lookahead rejects the prompt's "[Abuse|Assault|...]" template echoed back
+_CLASSIFICATION_LINE = re.compile(r"^[\W_]*CLASSIFICATION[\W_]*:[\W_]*(\w+)(?![\w|])", re.IGNORECASE | re.MULTILINE)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# A score with optional thousands separators ("1,000"), and a bare product of scores ("8 × 7 × 6")
+_SCORE = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_SCORE_NUMBER = re.compile(_SCORE)
+_FORMULA = re.compile(rf"[\W_]*((?:{_SCORE})(?:\s*[×xX*·]\s*(?:{_SCORE}))+)(?![\d,.])")
+
+
+def _score_value(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def parse_risk_score(summary: str) -> Optional[float]:
+    """
+    Read the RISK_SCORE out of a summarizer report
+
+    Tolerates markdown decoration (``**RISK_SCORE:** 120``), thousands
+    separators (``RISK_SCORE: 1,000``) and worked formulas: with an "=" the
+    value after the last one is taken (``6 × 5 × 4 = 120``), and a bare
+    product (``8 × 7 × 6``) is multiplied out. Returns None when no score
+    can be found.
+    """
+    matches = _RISK_SCORE_LINE.findall(summary)
+    if not matches:
+        return None
+    value = matches[-1]
+    if "=" in value:
+        value = value.rsplit("=", 1)[-1]
+    else:
+        formula = _FORMULA.match(value)
+        if formula:
+            product = 1.0
+            for factor in _SCORE_NUMBER.findall(formula.group(1)):
+                product *= _score_value(factor)
+            return product
+    number = _SCORE_NUMBER.search(value)
+    return _score_value(number.group()) if number else None
+
+
+def parse_factor(report: str, field: str) -> Optional[int]:
+    """
+    Read a HAZARD, EXPOSURE or VULNERABILITY score out of a report
+
+    Takes the first number after the label on the last matching line, so
+    ``**HAZARD:** 7/10 (armed threat)`` gives 7. Returns None when missing.
+    """
+    matches = _SCORE_LINES[field.upper()].findall(report)
+    number = _NUMBER.search(matches[-1]) if matches else None
+    return int(float(number.group())) if number else None
+
+
+def parse_classification(report: str) -> Optional[str]:
+    """
+    Read the CLASSIFICATION out of a classifier response or combined report
+
+    Tolerates markdown decoration and case (``**Classification:** assault``)
+    and returns the canonical class name, or None when no known class follows
+    the last CLASSIFICATION label.
+    """
+    matches = _CLASSIFICATION_LINE.findall(report)
+    if not matches:
+        return None
+    names = {name.lower(): name for name in CLASSIFICATIONS}
+    return names.get(matches[-1].lower())
+
+
+def format_score(risk_score: float) -> str:
+    """A RISK_SCORE as text, without a trailing .0 for whole numbers"""
+    return str(int(risk_score)) if risk_score.is_integer() else str(risk_score)
+
+
+def classify_risk_score(risk_score: float) -> str:
+    """Map a RISK_SCORE to its class using CLASSIFICATION_RULES"""
+    for minimum, classification in CLASSIFICATION_RULES:
+        if risk_score >= minimum:
+            return classification
+    return "Normal"
+
+
+def classify_locally(summary: str) -> Optional[str]:
+    """
+    Classify a surveillance summary without calling the model
+
+    Returns the classifier's response format, or None when the score cannot
+    be parsed or a special classification needs the LLM's judgment.
+    """
+    risk_score = parse_risk_score(summary)
+    if risk_score is None:
+        return None
+    if any(pattern.search(summary) for pattern in SPECIAL_CASE_PATTERNS.values()):
+        return None
+    return f"RISK_SCORE: {format_score(risk_score)}\nCLASSIFICATION: {classify_risk_score(risk_score)}"
+
 
 
 threat_classifier = LlmAgent(
     name="ThreatClassifier", 
-    model=MODEL_NAME,
+    model=agent_model,
     instruction=CLASSIFICATION_PROMPT,
-    before_model_callback=quota_guard
+    before_model_callback=quota_guard,
+    after_model_callback=record_usage
 )
 
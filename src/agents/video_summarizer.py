@@ -1,17 +1,12 @@
 from google.adk.agents import LlmAgent
 from ..tools.video_loader import VideoFrameTool
-# from ..callbacks import quota_guard  # Comment out temporarily
-from ..settings import MODEL_NAME, MAX_TOKENS
+from ..callbacks import quota_guard, record_usage
+from ..llm_backend import agent_model
+from ..settings import MAX_TOKENS
 
-SURVEILLANCE_PROMPT = """You are a surveillance detection system. 
-
-When you receive a message with a video path, immediately call the extract_video_frames function using the provided path.
-
-Look for "VIDEO_PATH=" in the message and use that exact path.
-
-After extracting frames, analyze them and provide:
-
-1. A chronological summary of events visible in the video
+# Steps and scoring scale shared with the structured engine, which asks for
+# JSON instead of the report format below
+SCORING_GUIDELINES = """1. A chronological summary of events visible in the video
 2. Identify any potential threats to humans, animals, or environment  
 3. Analyze each frame for: events, actions, objects, and background
 
@@ -39,7 +34,9 @@ VULNERABILITY (Defenselessness):
 - 5-6: Moderate vulnerability, people are caught off guard
 - 7-8: High vulnerability, people are defenseless
 - 9-10: Extreme vulnerability, no chance of defense
+"""
 
+ANALYSIS_INSTRUCTIONS = SCORING_GUIDELINES + """
 Provide your analysis in this format:
 SUMMARY: [chronological description]
 THREATS: [identified threats]
@@ -49,11 +46,58 @@ VULNERABILITY: [score 1-10 with explanation]
 RISK_SCORE: [Hazard × Exposure × Vulnerability]
 """
 
+SURVEILLANCE_PROMPT = """You are a surveillance detection system. 
+
+When you receive a message with a video path, immediately call the extract_video_frames function using the provided path.
+
+Look for "VIDEO_PATH=" in the message and use that exact path.
+
+After extracting frames, analyze them and provide:
+
+""" + ANALYSIS_INSTRUCTIONS
+
+# Used when FRAME_DELIVERY is "inline": the frames arrive as images on the
+# user message, so there is no tool to call
+INLINE_SURVEILLANCE_PROMPT = """You are a surveillance detection system.
+
+The message contains frames sampled in chronological order from one surveillance video, each labelled with its timestamp.
+
+Analyze the frames and provide:
+
+""" + ANALYSIS_INSTRUCTIONS
+
+# Used when FRAME_DELIVERY is "mosaic": a single grid image stands in for the
+# individual frames
+MOSAIC_SURVEILLANCE_PROMPT = """You are a surveillance detection system.
+
+The message contains one image: a grid of frames sampled in chronological order from one surveillance video. Read the tiles left to right, top to bottom; each tile shows its timestamp in the top-left corner. Treat every tile as a separate frame.
+
+Analyze the frames and provide:
+
+""" + ANALYSIS_INSTRUCTIONS
+
 
 video_summarizer = LlmAgent(
     name="VideoSummarizer",
-    model=MODEL_NAME,
+    model=agent_model,
     instruction=SURVEILLANCE_PROMPT,
-    tools=[VideoFrameTool]
-    # before_model_callback=quota_guard,  # Comment out temporarily
+    tools=[VideoFrameTool],
+    before_model_callback=quota_guard,
+    after_model_callback=record_usage
+)
+
+inline_video_summarizer = LlmAgent(
+    name="VideoSummarizer",
+    model=agent_model,
+    instruction=INLINE_SURVEILLANCE_PROMPT,
+    before_model_callback=quota_guard,
+    after_model_callback=record_usage
+)
+
+mosaic_video_summarizer = LlmAgent(
+    name="VideoSummarizer",
+    model=agent_model,
+    instruction=MOSAIC_SURVEILLANCE_PROMPT,
+    before_model_callback=quota_guard,
+    after_model_callback=record_usage
 )
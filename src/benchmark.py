@@ -0,0 +1,306 @@
+"""
+Offline benchmark suite
+
+Generates synthetic clips with cv2.VideoWriter across a matrix of
+resolutions, lengths and codecs, then measures:
+
+- frame extraction throughput per clip (sampled frames/s, MB/s of video,
+  peak RSS) for the configured FRAME_DELIVERY mode
+- end-to-end process_videos throughput with every agent answered by the
+  fake backend (llm_backend.FakeLlm) with configurable latency, error rates
+  and response size, so no API key or quota is needed
+
+Results are written as JSON so runs can be diffed to catch regressions.
+
+Usage:
+    python -m src.benchmark [--quick] [--latency SECONDS] [--videos N] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+from .agents.structured_analyzer import ANALYSIS_ENGINES
+from .llm_backend import FakeLlm
+from .rate_limiter import rate_limiter
+from .tools import video_loader
+from .tools.decoders import DECODER_BACKENDS, PYAV_AVAILABLE, av, create_decoder
+from .settings import BATCH_CONCURRENCY, EXTRACT_WORKERS, FRAME_DELIVERY
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_OUTPUT_FILE = "src/results/benchmark.json"
+
+# (width, height), seconds, (fourcc, extension)
+RESOLUTIONS = [(320, 240), (1280, 720), (1920, 1080)]
+LENGTHS = [5, 30]
+CODECS = [("mp4v", ".mp4"), ("MJPG", ".avi")]
+QUICK_RESOLUTIONS = [(320, 240), (640, 480)]
+QUICK_LENGTHS = [2]
+
+SYNTHETIC_FPS = 15
+
+
+def generate_synthetic_clip(path: str, width: int, height: int, seconds: float, fps: int = SYNTHETIC_FPS, fourcc: str = "mp4v") -> bool:
+    """
+    Write a clip of a textured background with a moving block and sensor noise
+
+    The block gives the motion gate and keyframe scoring something to find;
+    the noise keeps the codec from compressing frames to nothing.
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        return False
+    rng = np.random.default_rng(0)
+    background = np.zeros((height, width, 3), dtype=np.uint8)
+    background[:] = np.linspace(40, 160, width, dtype=np.uint8)[None, :, None]
+    block = max(8, height // 6)
+    total = max(1, int(seconds * fps))
+    try:
+        for index in range(total):
+            frame = background.copy()
+            x = int((width - block) * index / total)
+            frame[height // 2 - block // 2:height // 2 + block // 2, x:x + block] = (40, 40, 220)
+            noise = rng.integers(0, 12, size=(height, width, 1), dtype=np.uint8)
+            writer.write(cv2.add(frame, np.repeat(noise, 3, axis=2)))
+    finally:
+        writer.release()
+    return True
+
+
+def generate_matrix(directory: str, resolutions=RESOLUTIONS, lengths=LENGTHS, codecs=CODECS) -> List[Dict[str, Any]]:
+    """Generate one clip per resolution/length/codec combination; skips codecs this OpenCV build cannot write"""
+    clips = []
+    for width, height in resolutions:
+        for seconds in lengths:
+            for fourcc, extension in codecs:
+                path = os.path.join(directory, f"synthetic_{width}x{height}_{seconds}s_{fourcc}{extension}")
+                if generate_synthetic_clip(path, width, height, seconds, fourcc=fourcc) and os.path.getsize(path) > 0:
+                    clips.append({"path": path, "resolution": f"{width}x{height}", "length_seconds": seconds, "codec": fourcc})
+    return clips
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process and its finished children, in MB"""
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / scale, 1)
+
+
+def benchmark_extraction(clips: List[Dict[str, Any]], repeats: int = 3) -> List[Dict[str, Any]]:
+    """Time the uncached extraction of every clip; reports the best of `repeats` runs"""
+    from .run_batch import _frame_extractor
+
+    extractor, num_frames = _frame_extractor()
+    results = []
+    for clip in clips:
+        size_mb = os.path.getsize(clip["path"]) / (1024 * 1024)
+        timings = []
+        result: Dict[str, Any] = {}
+        for _ in range(max(1, repeats)):
+            started = time.perf_counter()
+            result = extractor(clip["path"], num_frames)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        sampled = result.get("sampled_frames", 0)
+        results.append({
+            **{key: value for key, value in clip.items() if key != "path"},
+            "file_mb": round(size_mb, 3),
+            "error": result.get("error"),
+            "sampled_frames": sampled,
+            "extract_seconds": round(best, 4),
+            "frames_per_second": round(sampled / best, 1) if best > 0 else None,
+            "mb_per_second": round(size_mb / best, 1) if best > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+        })
+    return results
+
+
+@contextlib.contextmanager
+def fake_models(requests_per_minute: Optional[float] = None, **fake_options):
+    """
+    Temporarily answer every agent with one FakeLlm built from fake_options
+
+    The shared rate limiter is set to requests_per_minute (default
+    unlimited) for the duration, so it does not dominate the measurement.
+    """
+    from .agents.video_summarizer import video_summarizer, inline_video_summarizer, mosaic_video_summarizer
+    from .agents.threat_classifier import threat_classifier
+    from .agents.structured_analyzer import structured_video_analyzer
+
+    agents = [video_summarizer, inline_video_summarizer, mosaic_video_summarizer, threat_classifier, structured_video_analyzer]
+    fake = FakeLlm(**fake_options)
+    previous = [agent.model for agent in agents]
+    limits = (rate_limiter.requests_per_minute, rate_limiter.tokens_per_minute)
+    for agent in agents:
+        agent.model = fake
+    rate_limiter.configure(requests_per_minute, None)
+    try:
+        yield fake
+    finally:
+        for agent, model in zip(agents, previous):
+            agent.model = model
+        rate_limiter.configure(*limits)
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def benchmark_end_to_end(clip: Dict[str, Any], num_videos: int, latency: float, concurrency: int = BATCH_CONCURRENCY, extract_workers: int = EXTRACT_WORKERS, verbose: bool = False, requests_per_minute: Optional[float] = None, **fake_options) -> Dict[str, Any]:
+    """
+    Run process_videos over num_videos copies of a clip against the fake backend
+
+    fake_options are passed to FakeLlm (error rates, response size, ...).
+    """
+    from .cascade import cascade_stats
+    from .run_batch import process_videos_async
+
+    with tempfile.TemporaryDirectory() as directory:
+        extension = os.path.splitext(clip["path"])[1]
+        for index in range(num_videos):
+            # Distinct paths, so the frame cache cannot answer one copy from
+            # another; hard links keep 10k-video runs cheap on disk
+            _link_or_copy(clip["path"], os.path.join(directory, f"video_{index:05d}{extension}"))
+
+        output_file = os.path.join(directory, "results.jsonl")
+        output = None if verbose else io.StringIO()
+        with fake_models(requests_per_minute, latency=latency, **fake_options) as fake:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(output) if output is not None else contextlib.nullcontext():
+                summary = asyncio.run(process_videos_async(directory, output_file, concurrency, extract_workers, use_result_cache=False, use_result_store=False, metrics_file=None))
+            elapsed = time.perf_counter() - started
+            limiter_waits = rate_limiter.waits
+
+    return {
+        "clip": {key: value for key, value in clip.items() if key != "path"},
+        "videos": num_videos,
+        "model_latency_seconds": latency,
+        "fake_options": fake_options,
+        "concurrency": concurrency,
+        "extract_workers": extract_workers,
+        "seconds": round(elapsed, 3),
+        "videos_per_second": round(num_videos / elapsed, 2) if elapsed > 0 else None,
+        "model_calls": fake.calls,
+        "rate_limit_errors": fake.rate_limit_errors,
+        "malformed_calls": fake.malformed_calls,
+        "rate_limiter_waits": limiter_waits,
+        "tokens": summary.get("total_tokens"),
+        "cascade": cascade_stats(),
+        "successful": summary.get("successful_analyses"),
+        "failed": summary.get("failed_analyses"),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(output_file: str = BENCHMARK_OUTPUT_FILE, quick: bool = False, latency: float = 0.2, num_videos: int = 20, concurrency: int = BATCH_CONCURRENCY, extract_workers: int = EXTRACT_WORKERS, verbose: bool = False, decoder: Optional[str] = None, engine: Optional[str] = None, cascade: Optional[bool] = None, **fake_options) -> Dict[str, Any]:
+    """
+    Run the extraction and end-to-end benchmarks and write the report to output_file
+
+    `decoder` overrides DECODER_BACKEND, `engine` ANALYSIS_ENGINE and
+    `cascade` CASCADE_ENABLED for this run.
+    """
+    from . import run_batch
+
+    resolutions, lengths = (QUICK_RESOLUTIONS, QUICK_LENGTHS) if quick else (RESOLUTIONS, LENGTHS)
+    previous_decoder = video_loader.decoder
+    previous_engine = run_batch.ANALYSIS_ENGINE
+    previous_cascade = run_batch.CASCADE_ENABLED
+    if decoder is not None:
+        video_loader.decoder = create_decoder(decoder)
+    if engine is not None:
+        run_batch.ANALYSIS_ENGINE = engine
+    if cascade is not None:
+        run_batch.CASCADE_ENABLED = cascade
+    try:
+        engine_name = run_batch.ANALYSIS_ENGINE
+        cascade_enabled = run_batch.CASCADE_ENABLED
+        decoder_name = video_loader.decoder.name
+        with tempfile.TemporaryDirectory() as directory:
+            clips = generate_matrix(directory, resolutions, lengths)
+            if not clips:
+                raise RuntimeError("OpenCV could not write any of the benchmark codecs")
+            extraction = benchmark_extraction(clips, repeats=1 if quick else 3)
+            end_to_end = benchmark_end_to_end(clips[0], num_videos, latency, concurrency, extract_workers, verbose, **fake_options)
+    finally:
+        video_loader.decoder = previous_decoder
+        run_batch.ANALYSIS_ENGINE = previous_engine
+        run_batch.CASCADE_ENABLED = previous_cascade
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "pyav": av.__version__ if PYAV_AVAILABLE else None,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {"frame_delivery": FRAME_DELIVERY, "analysis_engine": engine_name, "cascade": cascade_enabled, "decoder": decoder_name, "quick": quick},
+        "extraction": extraction,
+        "end_to_end": end_to_end,
+    }
+
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark frame extraction and the batch pipeline offline")
+    parser.add_argument("--output", default=BENCHMARK_OUTPUT_FILE, help="Where to write the JSON report")
+    parser.add_argument("--quick", action="store_true", help="Small, short clips only")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency per call in seconds")
+    parser.add_argument("--rate-limit-errors", type=float, default=0.0, metavar="RATE", help="Fraction of model calls failing with a 429")
+    parser.add_argument("--malformed-calls", type=float, default=0.0, metavar="RATE", help="Fraction of tool calls answered with MALFORMED_FUNCTION_CALL")
+    parser.add_argument("--response-chars", type=int, default=0, help="Minimum summary length in characters")
+    parser.add_argument("--rpm", type=float, default=None, help="Apply this requests-per-minute limit (default unlimited)")
+    parser.add_argument("--videos", type=int, default=20, help="Videos in the end-to-end run")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS)
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's progress output")
+    parser.add_argument("--decoder", choices=DECODER_BACKENDS, default=None, help="Frame decoder backend (default DECODER_BACKEND)")
+    parser.add_argument("--engine", choices=ANALYSIS_ENGINES, default=None, help="Analysis engine (default ANALYSIS_ENGINE)")
+    parser.add_argument("--no-cascade", action="store_true", help="Skip the high-resolution tier (default CASCADE_ENABLED)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        args.output, args.quick, args.latency, args.videos, args.concurrency, args.extract_workers, args.verbose, args.decoder, args.engine, False if args.no_cascade else None,
+        requests_per_minute=args.rpm,
+        rate_limit_error_rate=args.rate_limit_errors,
+        malformed_call_rate=args.malformed_calls,
+        response_chars=args.response_chars,
+    )
+    for row in report["extraction"]:
+        print(f"{row['resolution']:>9} {row['length_seconds']:>3}s {row['codec']:<4}  {row['frames_per_second']} frames/s  {row['mb_per_second']} MB/s")
+    e2e = report["end_to_end"]
+    print(f"End to end: {e2e['videos']} videos in {e2e['seconds']}s ({e2e['videos_per_second']} videos/s, {e2e['model_calls']} model calls)")
+    if report["config"]["cascade"]:
+        tiers = e2e["cascade"]
+        print(f"Cascade: {sum(tiers['escalations'].values()):g} clips escalated, {tiers['tokens']['1']:g} tier 1 / {tiers['tokens']['2']:g} tier 2 tokens")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
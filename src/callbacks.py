@@ -1,21 +1,54 @@
 from typing import Optional
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from .settings import TOKEN_LIMIT, VIDEO_TOKEN_BUDGET, RUN_TOKEN_BUDGET
+from .token_accounting import estimate_request_tokens, token_ledger
+from .rate_limiter import rate_limiter
 
-def quota_guard(callback_context, llm_request) -> Optional[str]:
+ABORT_PREFIX = "[ABORT]"
+
+
+def _abort(reason: str) -> LlmResponse:
+    """Answer in place of the model so the request is never sent"""
+    return LlmResponse(
+        content=types.Content(role="model", parts=[types.Part.from_text(text=f"{ABORT_PREFIX} {reason}")])
+    )
+
+
+async def quota_guard(callback_context, llm_request) -> Optional[LlmResponse]:
     """
     Callback to prevent exceeding free tier quota limits
     Updated signature to match ADK expectations
+
+    Checks the structural token estimate of the request against TOKEN_LIMIT
+    and the remaining per-video and per-run budgets, charges it to the token
+    ledger, and waits until the shared rate limiter admits the request.
     """
     try:
-        # Rough token estimation
-        request_str = str(llm_request)
-        est_tokens = len(request_str) // 4
-        
-        TOKEN_LIMIT = 8000  # Conservative limit
-        
-        if est_tokens > TOKEN_LIMIT:
-            return "[ABORT] Request too large - would exceed free tier quota limit."
-            
+        est_tokens = estimate_request_tokens(llm_request)
     except Exception as e:
         print(f"Warning: Could not estimate tokens: {e}")
-    
+        return None  # Allow request to proceed
+
+    if est_tokens > TOKEN_LIMIT:
+        return _abort("Request too large - would exceed free tier quota limit.")
+
+    used = token_ledger.used()
+    if VIDEO_TOKEN_BUDGET is not None and used["video"] + est_tokens > VIDEO_TOKEN_BUDGET:
+        return _abort(f"Per-video token budget of {VIDEO_TOKEN_BUDGET} exhausted.")
+    if RUN_TOKEN_BUDGET is not None and used["run"] + est_tokens > RUN_TOKEN_BUDGET:
+        return _abort(f"Per-run token budget of {RUN_TOKEN_BUDGET} exhausted.")
+
+    token_ledger.charge_estimate(est_tokens)
+    await rate_limiter.acquire(est_tokens)
     return None  # Allow request to proceed
+
+
+def record_usage(callback_context, llm_response) -> Optional[LlmResponse]:
+    """
+    After-model callback that replaces the request's estimate with the usage
+    the model reported
+    """
+    usage = getattr(llm_response, "usage_metadata", None)
+    token_ledger.settle(usage.total_token_count if usage and usage.total_token_count else None)
+    return None
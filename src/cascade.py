@@ -0,0 +1,118 @@
+"""
+Cascaded-resolution analysis
+
+Every clip is first summarized from the cheap frames of its FRAME_DELIVERY
+mode (two 96x96 JPEGs at quality 20 in "tool" delivery). That is enough to
+tell a quiet corridor from a scuffle, but too blurry to make out a weapon.
+When the first tier reports a RISK_SCORE of at least
+CASCADE_ESCALATE_MIN_RISK, or no score that parses, the clip is summarized
+again from CASCADE_FRAMES inline frames at CASCADE_FRAME_WIDTH x
+CASCADE_FRAME_HEIGHT, and the second tier's report replaces the first. The
+large frames are paid for only on the clips that need a closer look.
+
+Per-tier counts and tokens go to the run metrics (cascade_videos_total,
+cascade_escalations_total, cascade_tokens_total) and to each record's
+"cascade" entry.
+"""
+
+import asyncio
+import pathlib
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.runners import Runner
+
+from .agents.structured_analyzer import ThreatAnalysis, parse_analysis, render_report, structured_video_analyzer
+from .agents.threat_classifier import parse_risk_score
+from .agents.video_summarizer import inline_video_summarizer
+from .metrics import metrics
+from .sessions import agent_session
+from .token_accounting import token_ledger
+from .tools.video_loader import extract_high_res_frames
+from .settings import CASCADE_ESCALATE_MIN_RISK
+
+
+def escalation_reason(report: str, min_risk: float = CASCADE_ESCALATE_MIN_RISK) -> Optional[str]:
+    """"risk" or "unparsed" when a first-tier report needs the high-resolution tier, None otherwise"""
+    risk_score = parse_risk_score(report) if report.strip() else None
+    if risk_score is None:
+        return "unparsed"
+    return "risk" if risk_score >= min_risk else None
+
+
+async def _analyze_high_res(video_file: pathlib.Path, session_service, structured: bool) -> Tuple[str, Optional[ThreatAnalysis]]:
+    """Summarize a clip from high-resolution inline frames; ("", None) if that fails"""
+    from .run_batch import _inline_message, _run_agent_with_retries
+
+    loop = asyncio.get_running_loop()
+    with metrics.span("cascade_extract"):
+        frame_result = await loop.run_in_executor(None, extract_high_res_frames, str(video_file))
+    frame_result.pop("timings", None)
+    frame_result.pop("fingerprint", None)
+    if "error" in frame_result:
+        print(f"❌ High-resolution frame extraction failed: {frame_result['error']}")
+        return "", None
+
+    agent = structured_video_analyzer if structured else inline_video_summarizer
+    runner = Runner(agent=agent, app_name="cascade_analysis", session_service=session_service)
+    async with agent_session(session_service, "cascade_analysis", "cascade", video_file.stem) as session:
+        message = _inline_message(video_file, frame_result)
+        with metrics.span("llm_escalate"):
+            if structured:
+                report = await _run_agent_with_retries(runner, session.id, message, "High-resolution analysis", validate=parse_analysis)
+            else:
+                report = await _run_agent_with_retries(runner, session.id, message, "High-resolution analysis", separator="\n")
+
+    analysis = parse_analysis(report) if structured and report.strip() else None
+    if analysis is not None:
+        report = render_report(analysis)
+    return report, analysis
+
+
+async def cascade_analysis(video_file: pathlib.Path, report: str, analysis: Optional[ThreatAnalysis], session_service, structured: bool = False) -> Tuple[str, Optional[ThreatAnalysis], Dict[str, Any]]:
+    """
+    Escalate a first-tier report to the high-resolution tier when it is risky or unparseable
+
+    With `structured` the second tier uses the structured engine's agent,
+    otherwise the inline summarizer.
+
+    Returns the report and structured analysis to keep, plus the record's
+    "cascade" entry: the tier that produced the kept report, the first
+    tier's RISK_SCORE, and for escalated clips the reason and the tokens
+    spent by each tier. If the second tier produces no usable score the
+    first tier's report is kept. Must run inside token_ledger.track().
+    """
+    tier1_tokens = token_ledger.used()["video"]
+    reason = escalation_reason(report)
+    cascade = {"tier": 1, "tier1_risk_score": parse_risk_score(report) if report.strip() else None}
+    metrics.inc("cascade_tokens_total", tier1_tokens, tier="1")
+    if reason is None:
+        metrics.inc("cascade_videos_total", tier="1")
+        return report, analysis, cascade
+
+    described = f"RISK_SCORE {cascade['tier1_risk_score']:g}" if reason == "risk" else "no parseable RISK_SCORE"
+    print(f"🔍 Low-resolution pass gave {described} for {video_file.name}, re-analyzing at high resolution")
+    metrics.inc("cascade_escalations_total", reason=reason)
+    high_report, high_analysis = await _analyze_high_res(video_file, session_service, structured)
+    tier2_tokens = token_ledger.used()["video"] - tier1_tokens
+    metrics.inc("cascade_tokens_total", tier2_tokens, tier="2")
+    cascade.update(reason=reason, tokens={"tier1": tier1_tokens, "tier2": tier2_tokens})
+
+    if parse_risk_score(high_report) is None and (report.strip() or not high_report.strip()):
+        print(f"⚠️ High-resolution pass failed for {video_file.name}, keeping the low-resolution report")
+        metrics.inc("cascade_videos_total", tier="1")
+        metrics.inc("cascade_escalation_failures_total")
+        return report, analysis, cascade
+
+    cascade["tier"] = 2
+    metrics.inc("cascade_videos_total", tier="2")
+    return high_report, high_analysis, cascade
+
+
+def cascade_stats(registry=metrics) -> Dict[str, Any]:
+    """Per-tier totals for the current run, read back from the metrics registry"""
+    return {
+        "videos": {tier: registry.counter("cascade_videos_total", tier=tier) for tier in ("1", "2")},
+        "escalations": {reason: registry.counter("cascade_escalations_total", reason=reason) for reason in ("risk", "unparsed")},
+        "escalation_failures": registry.counter("cascade_escalation_failures_total"),
+        "tokens": {tier: registry.counter("cascade_tokens_total", tier=tier) for tier in ("1", "2")},
+    }
@@ -0,0 +1,201 @@
+"""
+Model backends for the agents
+
+MODEL_BACKEND selects what answers the agents:
+
+- "gemini": the hosted MODEL_NAME model (needs GOOGLE_API_KEY)
+- "fake": FakeLlm, a local stand-in that needs no key or network
+
+The fake speaks the same protocol as the real pipeline expects: the
+summarizer first calls extract_video_frames (in "tool" delivery) and then
+answers in the SUMMARY/HAZARD/EXPOSURE/VULNERABILITY/RISK_SCORE format; the
+classifier answers with RISK_SCORE/CLASSIFICATION; requests carrying a
+response schema (the structured engine) get the same scores and class as one
+JSON object. Latency, 429 and MALFORMED_FUNCTION_CALL error rates and
+response size are configurable, so the orchestrator can be load-tested,
+profiled and its retry paths exercised without spending quota.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+from typing import Any, AsyncGenerator, Dict, Union
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors, types
+from pydantic import PrivateAttr
+
+from .settings import (
+    MODEL_NAME,
+    MODEL_BACKEND,
+    FAKE_LATENCY_SECONDS,
+    FAKE_LATENCY_JITTER_SECONDS,
+    FAKE_RATE_LIMIT_ERROR_RATE,
+    FAKE_MALFORMED_CALL_RATE,
+    FAKE_RESPONSE_CHARS,
+    FAKE_SEED,
+)
+from .token_accounting import CHARS_PER_TOKEN, estimate_request_tokens
+
+MODEL_BACKENDS = ("gemini", "fake")
+
+_FILLER = "The scene is otherwise unchanged between frames. "
+
+
+class FakeLlm(BaseLlm):
+    """
+    Local stand-in model with injectable latency, errors and response size
+
+    Risk scores are derived from a hash of the request's first user message,
+    so a given video always gets the same scores and a batch spreads across
+    every classification band. peak_in_flight records the most calls that
+    were waiting on the fake latency at once, so tests can check
+    concurrency without timing the run.
+    """
+    model: str = "fake"
+    latency: float = FAKE_LATENCY_SECONDS
+    latency_jitter: float = FAKE_LATENCY_JITTER_SECONDS
+    rate_limit_error_rate: float = FAKE_RATE_LIMIT_ERROR_RATE
+    malformed_call_rate: float = FAKE_MALFORMED_CALL_RATE
+    response_chars: int = FAKE_RESPONSE_CHARS
+    seed: int = FAKE_SEED
+    retry_delay_seconds: float = 1.0
+
+    calls: int = 0
+    rate_limit_errors: int = 0
+    malformed_calls: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "rate_limit_errors": self.rate_limit_errors, "malformed_calls": self.malformed_calls}
+
+    def _rate_limit_error(self) -> errors.ClientError:
+        return errors.ClientError(429, {"error": {
+            "code": 429,
+            "message": "Fake backend: resource exhausted.",
+            "status": "RESOURCE_EXHAUSTED",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{self.retry_delay_seconds}s"}],
+        }})
+
+    @staticmethod
+    def _scores(key: str):
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        return tuple(1 + byte % 10 for byte in digest[:3])
+
+    @staticmethod
+    def _label(score: int) -> str:
+        return "Assault" if score >= 500 else "Abuse" if score >= 200 else "Arrest" if score >= 100 else "Normal"
+
+    def _padding(self, text: str) -> str:
+        padding = self.response_chars - len(text)
+        return (_FILLER * (padding // len(_FILLER) + 1))[:padding] if padding > 0 else ""
+
+    def _structured(self, key: str) -> str:
+        hazard, exposure, vulnerability = self._scores(key)
+        analysis = {
+            "summary": f"Synthetic analysis of {key[:60]!r}",
+            "threats": "None identified" if hazard <= 2 else "Simulated threat",
+            "hazard": hazard,
+            "exposure": exposure,
+            "vulnerability": vulnerability,
+            "risk_score": hazard * exposure * vulnerability,
+            "classification": self._label(hazard * exposure * vulnerability),
+        }
+        padding = self._padding(json.dumps(analysis))
+        if padding:
+            analysis["summary"] += " " + padding
+        return json.dumps(analysis)
+
+    def _summary(self, key: str) -> str:
+        hazard, exposure, vulnerability = self._scores(key)
+        summary = f"""SUMMARY: Synthetic analysis of {key[:60]!r}
+THREATS: {"None identified" if hazard <= 2 else "Simulated threat"}
+HAZARD: {hazard} (Fake backend)
+EXPOSURE: {exposure} (Fake backend)
+VULNERABILITY: {vulnerability} (Fake backend)
+RISK_SCORE: {hazard * exposure * vulnerability}"""
+        padding = self._padding(summary)
+        if padding:
+            # Pad inside SUMMARY so the parseable lines stay intact
+            head, rest = summary.split("\n", 1)
+            summary = f"{head} {padding}\n{rest}"
+        return summary
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        delay = self.latency + (self._rng.uniform(0, self.latency_jitter) if self.latency_jitter > 0 else 0.0)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+
+        if self._rng.random() < self.rate_limit_error_rate:
+            self.rate_limit_errors += 1
+            raise self._rate_limit_error()
+
+        contents = llm_request.contents or []
+        parts = [part for content in contents for part in (content.parts or [])]
+        text = "\n".join(part.text for part in parts if part.text)
+        instruction = str(llm_request.config.system_instruction or "") if llm_request.config else ""
+        offers_tools = bool(llm_request.config and llm_request.config.tools)
+        wants_json = bool(llm_request.config and llm_request.config.response_schema)
+
+        if "surveillance detection system" not in instruction:
+            match = re.search(r"RISK_SCORE:\s*(\d+)", text)
+            score = int(match.group(1)) if match else 0
+            reply = f"RISK_SCORE: {score}\nCLASSIFICATION: {self._label(score)}"
+        else:
+            path = re.search(r"VIDEO_PATH=(\S+)", text)
+            called = any(part.function_response is not None for part in parts)
+            if path and not called and offers_tools:
+                if self._rng.random() < self.malformed_call_rate:
+                    self.malformed_calls += 1
+                    yield LlmResponse(error_code="MALFORMED_FUNCTION_CALL", error_message="Fake backend: malformed function call")
+                    return
+                yield LlmResponse(content=types.Content(role="model", parts=[
+                    types.Part(function_call=types.FunctionCall(name="extract_video_frames", args={"video_path": path.group(1), "num_frames": 2}))
+                ]))
+                return
+            first_text = next((part.text for part in parts if part.text), "")
+            key = path.group(1) if path else first_text
+            reply = self._structured(key) if wants_json else self._summary(key)
+
+        prompt_tokens = estimate_request_tokens(llm_request)
+        reply_tokens = len(reply) // CHARS_PER_TOKEN
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part.from_text(text=reply)]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=reply_tokens,
+                total_token_count=prompt_tokens + reply_tokens,
+            ),
+        )
+
+
+def create_model(backend: str = MODEL_BACKEND) -> Union[str, BaseLlm]:
+    """The `model` argument for an LlmAgent under the given backend"""
+    if backend == "gemini":
+        return MODEL_NAME
+    if backend == "fake":
+        return FakeLlm()
+    raise ValueError(f"Unknown MODEL_BACKEND {backend!r}; expected one of {MODEL_BACKENDS}")
+
+
+def requires_api_key(backend: str = MODEL_BACKEND) -> bool:
+    return backend == "gemini"
+
+
+# Shared by every agent, so a fake backend's counters cover the whole run
+agent_model = create_model()
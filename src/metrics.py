@@ -0,0 +1,226 @@
+"""
+Run metrics: stage timing spans, counters and latency histograms
+
+Stages are timed with `metrics.span(stage)` (or `metrics.observe_stage`
+for durations measured elsewhere, e.g. in an extraction worker process)
+into the `stage_seconds` histogram. Counters track videos, retries,
+fallbacks, tokens and cache hits. At the end of a run, or every
+METRICS_EXPORT_INTERVAL seconds in watch mode, the registry is written as
+JSON and in the Prometheus text exposition format (suitable for the node
+exporter's textfile collector).
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from .settings import METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE, METRICS_EXPORT_INTERVAL
+
+METRICS_PREFIX = "threat_detection"
+
+# Seconds; spans from sub-millisecond encodes to multi-minute model retries
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (max for the overflow bucket)"""
+        if self.count == 0:
+            return None
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): total for bound, total in self.cumulative()},
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by name and labels"""
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.started_at = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.observe("stage_seconds", seconds, stage=stage)
+
+    def observe_stages(self, timings: Optional[Dict[str, float]]) -> None:
+        """Record durations measured elsewhere, e.g. the "timings" of an extraction result"""
+        for stage, seconds in (timings or {}).items():
+            self.observe_stage(stage, seconds)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as one occurrence of `stage`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(name, {}).get(_labels(labels))
+
+    def to_dict(self) -> Dict[str, Any]:
+        def series_name(name: str, labels: Labels) -> str:
+            return name + _format_labels(labels)
+
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "exported_at": time.time(),
+                "counters": {
+                    series_name(name, labels): value
+                    for name, series in sorted(self._counters.items())
+                    for labels, value in sorted(series.items())
+                },
+                "histograms": {
+                    series_name(name, labels): histogram.as_dict()
+                    for name, series in sorted(self._histograms.items())
+                    for labels, histogram in sorted(series.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    for bound, total in histogram.cumulative():
+                        lines.append(f"{metric}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {total}")
+                    lines.append(f"{metric}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path: Optional[str] = METRICS_JSON_FILE, prometheus_path: Optional[str] = METRICS_PROMETHEUS_FILE) -> None:
+        """Write both formats; each file is replaced atomically so scrapers never see a partial one"""
+        for path, render in ((json_path, lambda: json.dumps(self.to_dict(), indent=2)), (prometheus_path, self.to_prometheus)):
+            if not path:
+                continue
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary = f"{path}.tmp"
+            with open(temporary, "w") as f:
+                f.write(render())
+            os.replace(temporary, path)
+
+
+def metrics_paths(metrics_file: Optional[str] = METRICS_JSON_FILE) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The (JSON, Prometheus) files a run exports to
+
+    `metrics_file` names the JSON file and the Prometheus file sits next to
+    it with a .prom extension (METRICS_PROMETHEUS_FILE for the default).
+    None exports nothing, e.g. for tests and benchmarks.
+    """
+    if metrics_file is None:
+        return None, None
+    if metrics_file == METRICS_JSON_FILE:
+        return METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE
+    return metrics_file, os.path.splitext(metrics_file)[0] + ".prom"
+
+
+async def export_periodically(registry: "MetricsRegistry", interval: float = METRICS_EXPORT_INTERVAL, metrics_file: Optional[str] = METRICS_JSON_FILE) -> None:
+    """Export `registry` to metrics_paths(metrics_file) every `interval` seconds until cancelled (for long-running modes)"""
+    if metrics_file is None:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        registry.export(*metrics_paths(metrics_file))
+
+
+metrics = MetricsRegistry()
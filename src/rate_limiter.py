@@ -0,0 +1,127 @@
+"""
+Process-wide request/token rate limiting and retry backoff
+
+Every model call made by any runner passes through quota_guard, which waits
+on the shared `rate_limiter` so the process as a whole stays under
+RATE_LIMIT_RPM requests and RATE_LIMIT_TPM tokens per minute. When the API
+still answers 429, the retry-after hint pauses all callers, not just the one
+that failed, so parallel workers do not stampede the quota.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+from .settings import RATE_LIMIT_RPM, RATE_LIMIT_TPM, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS
+
+_RETRY_DELAY_PATTERN = re.compile(r"(?:retryDelay['\"]?\s*[:=]\s*['\"]?|retry in\s+)(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+class TokenBucket:
+    """
+    Continuous-refill token bucket
+
+    reserve() takes the amount immediately, letting the balance go negative,
+    and returns how long the caller must wait for the debt to refill. Callers
+    therefore queue up in arrival order without holding a lock while waiting.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._clock = clock
+        self._balance = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = self._clock()
+            self._balance = min(self.capacity, self._balance + (now - self._updated) * self.rate)
+            self._updated = now
+            self._balance -= amount
+            return 0.0 if self._balance >= 0 else -self._balance / self.rate
+
+
+class RateLimiter:
+    """Shared requests-per-minute and tokens-per-minute limiter with a global pause"""
+
+    def __init__(self, requests_per_minute: Optional[float] = RATE_LIMIT_RPM, tokens_per_minute: Optional[float] = RATE_LIMIT_TPM, clock=time.monotonic):
+        self._clock = clock
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float]) -> None:
+        """Replace the limits (None = unlimited) and reset all state"""
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = TokenBucket(requests_per_minute, clock=self._clock) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, clock=self._clock) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Claim capacity for one request and return the delay before it may be sent"""
+        delay = max(0.0, self._paused_until - self._clock())
+        if self._requests is not None:
+            delay = max(delay, self._requests.reserve(1))
+        if self._tokens is not None and tokens:
+            delay = max(delay, self._tokens.reserve(tokens))
+        return delay
+
+    async def acquire(self, tokens: int = 0) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            self.waits += 1
+            self.waited_seconds += delay
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for `seconds`, e.g. after a 429 with retry-after"""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """
+    Extract a retry-after hint (seconds) from an API error, if it carries one
+
+    Looks at an HTTP Retry-After header and at the RetryInfo.retryDelay that
+    Gemini puts in 429 error details.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        try:
+            if value is not None:
+                return float(value)
+        except ValueError:
+            pass
+
+    match = _RETRY_DELAY_PATTERN.search(str(getattr(error, "details", "") or "") + " " + str(error))
+    return float(match.group(1)) if match else None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    code = getattr(error, "code", None)
+    return code == 429 or "RESOURCE_EXHAUSTED" in str(error) or "429" in str(getattr(error, "status", ""))
+
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """
+    Seconds to wait before retry number `attempt + 1`
+
+    Exponential backoff with full jitter, never shorter than the server's
+    retry-after hint when the error carries one.
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    retry_after = retry_after_from_error(error) if error is not None else None
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+rate_limiter = RateLimiter()
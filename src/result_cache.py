@@ -0,0 +1,337 @@
+"""
+Persistent, content-addressed cache of video analysis results
+
+Results are keyed by the SHA-256 of the video bytes together with a
+fingerprint of everything that influences the analysis (model, prompts and
+frame sampling parameters), so an unchanged clip analyzed with an unchanged
+configuration is answered from disk without touching the model.
+
+Alongside each result the clip's perceptual fingerprint (the 64-bit hashes
+and grayscale thumbnails of its sampled frames) is indexed, so
+find_similar() can also answer a re-encoded or re-exported copy whose bytes
+differ, while a clip with anything new in the scene does not match.
+
+Usage:
+    python -m src.result_cache stats
+    python -m src.result_cache invalidate --stale | --video NAME | --all
+    python -m src.result_cache prune [--older-than DAYS] [--max-entries N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .settings import (
+    MODEL_NAME, MODEL_BACKEND, RESULT_CACHE_PATH,
+    CLIP_DEDUP_MAX_DISTANCE, CLIP_DEDUP_MAX_PIXEL_DIFF, CLIP_DEDUP_DURATION_TOLERANCE,
+)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    video_name TEXT NOT NULL,
+    record TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (content_hash, config_hash)
+);
+CREATE TABLE IF NOT EXISTS clip_fingerprints (
+    content_hash TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    video_name TEXT NOT NULL,
+    duration REAL,
+    hashes BLOB NOT NULL,
+    thumbnails BLOB NOT NULL,
+    PRIMARY KEY (content_hash, config_hash)
+);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+"""
+
+
+def analysis_config_fingerprint() -> str:
+    """Hash of the model, prompts and sampling parameters an analysis depends on"""
+    from .agents.video_summarizer import SURVEILLANCE_PROMPT, INLINE_SURVEILLANCE_PROMPT, MOSAIC_SURVEILLANCE_PROMPT
+    from .agents.threat_classifier import CLASSIFICATION_PROMPT
+    from .agents.structured_analyzer import STRUCTURED_ANALYSIS_PROMPT
+    from .tools.video_loader import MAX_FRAMES, TARGET_WIDTH, TARGET_HEIGHT, JPEG_QUALITY, decoder
+    from .settings import (
+        FRAME_SELECTION, MOTION_GATE_ENABLED, MOTION_GATE_THRESHOLD, MOTION_GATE_SAMPLES,
+        FRAME_DELIVERY, INLINE_MAX_FRAMES, INLINE_FRAME_WIDTH, INLINE_FRAME_HEIGHT, INLINE_JPEG_QUALITY,
+        MOSAIC_FRAMES, MOSAIC_COLUMNS, MOSAIC_WIDTH, MOSAIC_HEIGHT, MOSAIC_JPEG_QUALITY,
+        LONG_VIDEO_ENABLED, LONG_VIDEO_MIN_SECONDS, SEGMENT_WINDOW_SECONDS, SEGMENT_MAX_WINDOWS, SEGMENT_FRAMES,
+        ANALYSIS_ENGINE, FRAME_HASH, FRAME_DEDUP_ENABLED, FRAME_DEDUP_MAX_DISTANCE, FRAME_DEDUP_MAX_PIXEL_DIFF,
+        CASCADE_ENABLED, CASCADE_ESCALATE_MIN_RISK, CASCADE_FRAMES, CASCADE_FRAME_WIDTH, CASCADE_FRAME_HEIGHT, CASCADE_JPEG_QUALITY,
+    )
+
+    config = {
+        "model": MODEL_NAME if MODEL_BACKEND == "gemini" else MODEL_BACKEND,
+        "surveillance_prompt": SURVEILLANCE_PROMPT,
+        "classification_prompt": CLASSIFICATION_PROMPT,
+        "sampling": [MAX_FRAMES, FRAME_SELECTION, TARGET_WIDTH, TARGET_HEIGHT, JPEG_QUALITY],
+        "activity_gate": [MOTION_GATE_ENABLED, MOTION_GATE_THRESHOLD, MOTION_GATE_SAMPLES],
+    }
+    if decoder.name != "opencv":
+        # Keyframe-only decoding picks different frames than exact seeking
+        config["decoder"] = [decoder.name, getattr(decoder, "keyframes_only", False), getattr(decoder, "max_width", None)]
+    if FRAME_DEDUP_ENABLED:
+        # Dropping near-duplicate frames changes what the model sees
+        config["frame_dedup"] = [FRAME_HASH, FRAME_DEDUP_MAX_DISTANCE, FRAME_DEDUP_MAX_PIXEL_DIFF]
+    if LONG_VIDEO_ENABLED:
+        config["long_video"] = [LONG_VIDEO_MIN_SECONDS, SEGMENT_WINDOW_SECONDS, SEGMENT_MAX_WINDOWS, SEGMENT_FRAMES, INLINE_SURVEILLANCE_PROMPT]
+    # The structured engine sends the frames on the message even in "tool" delivery
+    frame_delivery = "inline" if ANALYSIS_ENGINE == "structured" and FRAME_DELIVERY == "tool" else FRAME_DELIVERY
+    if frame_delivery == "inline":
+        config["frame_delivery"] = frame_delivery
+        config["surveillance_prompt"] = INLINE_SURVEILLANCE_PROMPT
+        config["sampling"] = [INLINE_MAX_FRAMES, FRAME_SELECTION, INLINE_FRAME_WIDTH, INLINE_FRAME_HEIGHT, INLINE_JPEG_QUALITY]
+    elif frame_delivery == "mosaic":
+        config["frame_delivery"] = frame_delivery
+        config["surveillance_prompt"] = MOSAIC_SURVEILLANCE_PROMPT
+        config["sampling"] = [MOSAIC_FRAMES, MOSAIC_COLUMNS, FRAME_SELECTION, MOSAIC_WIDTH, MOSAIC_HEIGHT, MOSAIC_JPEG_QUALITY]
+    if ANALYSIS_ENGINE == "structured":
+        config["analysis_engine"] = ANALYSIS_ENGINE
+        config["surveillance_prompt"] = STRUCTURED_ANALYSIS_PROMPT
+    if CASCADE_ENABLED:
+        config["cascade"] = [
+            CASCADE_ESCALATE_MIN_RISK, CASCADE_FRAMES, CASCADE_FRAME_WIDTH, CASCADE_FRAME_HEIGHT, CASCADE_JPEG_QUALITY,
+            STRUCTURED_ANALYSIS_PROMPT if ANALYSIS_ENGINE == "structured" else INLINE_SURVEILLANCE_PROMPT,
+        ]
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed result store shared across runs
+
+    File content hashes are memoized by (path, mtime, size) so re-runs over an
+    unchanged archive do not re-read every video.
+    """
+
+    def __init__(self, db_path: str = RESULT_CACHE_PATH, config_hash: Optional[str] = None):
+        self.db_path = db_path
+        self.config_hash = config_hash or analysis_config_fingerprint()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.near_duplicate_hits = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def content_hash(self, video_path: str) -> str:
+        """SHA-256 of the video bytes, memoized while the file is unchanged"""
+        path = os.path.abspath(video_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM file_hashes WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (path, stat.st_mtime_ns, stat.st_size),
+            ).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, mtime_ns, size, content_hash) VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size, content_hash),
+            )
+        return content_hash
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT record FROM results WHERE content_hash = ? AND config_hash = ?",
+                (content_hash, self.config_hash),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE results SET hit_count = hit_count + 1, last_used_at = ? WHERE content_hash = ? AND config_hash = ?",
+                (time.time(), content_hash, self.config_hash),
+            )
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, content_hash: str, video_name: str, record: Dict[str, Any], thumbnails: Optional[np.ndarray] = None) -> None:
+        """Store a record; its "fingerprint" and the frames' `thumbnails`, if given, are indexed for find_similar()"""
+        now = time.time()
+        fingerprint = record.get("fingerprint")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(content_hash, config_hash, video_name, record, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, self.config_hash, video_name, json.dumps(record), now, now),
+            )
+            if fingerprint and fingerprint.get("hashes") and thumbnails is not None and len(thumbnails) == len(fingerprint["hashes"]):
+                hashes = np.array([int(value, 16) for value in fingerprint["hashes"]], dtype=np.uint64)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO clip_fingerprints (content_hash, config_hash, video_name, duration, hashes, thumbnails) VALUES (?, ?, ?, ?, ?, ?)",
+                    (content_hash, self.config_hash, video_name, fingerprint.get("duration"), hashes.tobytes(), np.ascontiguousarray(thumbnails, dtype=np.uint8).tobytes()),
+                )
+
+    def find_similar(self, hashes: List[int], thumbnails: np.ndarray, duration: Optional[float] = None, max_distance: int = CLIP_DEDUP_MAX_DISTANCE, max_pixel_diff: int = CLIP_DEDUP_MAX_PIXEL_DIFF, duration_tolerance: float = CLIP_DEDUP_DURATION_TOLERANCE) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached clip showing the same content as a fingerprint
+
+        A clip matches when it has the same number of frames, every
+        corresponding pair of hashes is within max_distance bits, no pixel of
+        the corresponding thumbnails differs by more than max_pixel_diff
+        grey levels and (when both are known) the durations differ by at
+        most duration_tolerance of the longer one. The hashes only shortlist
+        candidates; the thumbnail check is what rejects a clip of the same
+        scene with a new object in it. Returns the closest match as
+        {"content_hash", "video", "distance", "pixel_diff", "record"}, or None.
+        """
+        if not hashes or thumbnails is None or len(thumbnails) != len(hashes):
+            return None
+        query = np.array(hashes, dtype=np.uint64)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.content_hash, f.video_name, f.duration, f.hashes, r.record, f.thumbnails FROM clip_fingerprints f "
+                "JOIN results r ON r.content_hash = f.content_hash AND r.config_hash = f.config_hash "
+                "WHERE f.config_hash = ? AND length(f.hashes) = ?",
+                (self.config_hash, query.nbytes),
+            ).fetchall()
+        if duration:
+            rows = [row for row in rows if not row[2] or abs(row[2] - duration) <= duration_tolerance * max(row[2], duration)]
+        if not rows:
+            return None
+
+        stored = np.frombuffer(b"".join(row[3] for row in rows), dtype=np.uint64).reshape(len(rows), len(hashes))
+        differing = np.unpackbits((stored ^ query).view(np.uint8), axis=1).reshape(len(rows), len(hashes), 64).sum(axis=2)
+        distances = differing.max(axis=1)
+        query_thumbnails = np.asarray(thumbnails, dtype=np.int16)
+        for position in np.argsort(distances, kind="stable"):
+            if distances[position] > max_distance:
+                break
+            content_hash, video_name, _, _, record, stored_thumbnails = rows[position]
+            if len(stored_thumbnails) != query_thumbnails.size:
+                continue
+            stored_thumbnails = np.frombuffer(stored_thumbnails, dtype=np.uint8).reshape(query_thumbnails.shape)
+            pixel_diff = int(np.abs(stored_thumbnails.astype(np.int16) - query_thumbnails).max())
+            if pixel_diff <= max_pixel_diff:
+                self.near_duplicate_hits += 1
+                return {"content_hash": content_hash, "video": video_name, "distance": int(distances[position]), "pixel_diff": pixel_diff, "record": json.loads(record)}
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, stale, stored_hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(config_hash != ?), 0), COALESCE(SUM(hit_count), 0) FROM results",
+                (self.config_hash,),
+            ).fetchone()
+        return {
+            "entries": entries,
+            "stale_entries": stale,
+            "lifetime_hits": stored_hits,
+            "run_hits": self.hits,
+            "run_misses": self.misses,
+            "run_near_duplicate_hits": self.near_duplicate_hits,
+            "db_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+        }
+
+    def invalidate(self, video_name: Optional[str] = None, stale_only: bool = False) -> int:
+        """Delete entries for one video, entries from other configurations, or everything"""
+        with self._lock, self._conn:
+            if video_name is not None:
+                cursor = self._conn.execute("DELETE FROM results WHERE video_name = ?", (video_name,))
+                self._conn.execute("DELETE FROM clip_fingerprints WHERE video_name = ?", (video_name,))
+            elif stale_only:
+                cursor = self._conn.execute("DELETE FROM results WHERE config_hash != ?", (self.config_hash,))
+                self._conn.execute("DELETE FROM clip_fingerprints WHERE config_hash != ?", (self.config_hash,))
+            else:
+                cursor = self._conn.execute("DELETE FROM results")
+                self._conn.execute("DELETE FROM clip_fingerprints")
+            return cursor.rowcount
+
+    def prune(self, older_than_days: Optional[float] = None, max_entries: Optional[int] = None) -> int:
+        """Drop entries unused for `older_than_days`, then the least recently used beyond `max_entries`"""
+        removed = 0
+        with self._lock, self._conn:
+            if older_than_days is not None:
+                cutoff = time.time() - older_than_days * 86400
+                removed += self._conn.execute("DELETE FROM results WHERE last_used_at < ?", (cutoff,)).rowcount
+            if max_entries is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM results WHERE rowid NOT IN "
+                    "(SELECT rowid FROM results ORDER BY last_used_at DESC LIMIT ?)",
+                    (max_entries,),
+                ).rowcount
+            # Fingerprints of pruned results can no longer be answered
+            self._conn.execute(
+                "DELETE FROM clip_fingerprints WHERE NOT EXISTS (SELECT 1 FROM results r "
+                "WHERE r.content_hash = clip_fingerprints.content_hash AND r.config_hash = clip_fingerprints.config_hash)"
+            )
+            # Forget hashes of files that no longer exist
+            for (path,) in self._conn.execute("SELECT path FROM file_hashes").fetchall():
+                if not os.path.exists(path):
+                    self._conn.execute("DELETE FROM file_hashes WHERE path = ?", (path,))
+        with self._lock:
+            self._conn.execute("VACUUM")
+        return removed
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect and maintain the persistent analysis result cache")
+    parser.add_argument("--db", default=RESULT_CACHE_PATH, help="Path to the cache database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="Show cache statistics")
+
+    invalidate = commands.add_parser("invalidate", help="Delete cached results")
+    target = invalidate.add_mutually_exclusive_group(required=True)
+    target.add_argument("--video", help="Delete results for this video file name")
+    target.add_argument("--stale", action="store_true", help="Delete results from other model/prompt/sampling configurations")
+    target.add_argument("--all", action="store_true", help="Delete every cached result")
+
+    prune = commands.add_parser("prune", help="Remove old or excess entries")
+    prune.add_argument("--older-than", type=float, metavar="DAYS", help="Remove entries unused for this many days")
+    prune.add_argument("--max-entries", type=int, help="Keep at most this many most recently used entries")
+
+    args = parser.parse_args(argv)
+    cache = ResultCache(args.db)
+    try:
+        if args.command == "stats":
+            for key, value in cache.stats().items():
+                print(f"{key}: {value}")
+        elif args.command == "invalidate":
+            removed = cache.invalidate(video_name=args.video, stale_only=args.stale)
+            print(f"Removed {removed} cached results")
+        elif args.command == "prune":
+            removed = cache.prune(args.older_than, args.max_entries)
+            print(f"Pruned {removed} cached results")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
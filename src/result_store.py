@@ -0,0 +1,325 @@
+"""
+Columnar results store
+
+Every analyzed video (or stream window) becomes a typed ResultRecord, and
+records are appended to Parquet files under RESULT_STORE_PATH. Each flush
+writes a new part file, so appends never rewrite earlier data, and
+compact() merges the parts once they pile up.
+
+query_results() reads only the columns it needs and pushes the filters down
+to the Parquet row groups. Questions like "Assault clips with RISK_SCORE of
+300 or more from camera X in the last week" take milliseconds over hundreds
+of thousands of results, instead of re-parsing JSON reports:
+
+    query_results(classification="Assault", min_risk=300, camera="X", since=timedelta(days=7))
+
+Usage:
+    python -m src.result_store --classification Assault --min-risk 300 --camera X --days 7 [--compact]
+"""
+
+import argparse
+import asyncio
+import os
+import pathlib
+import time
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from .agents.threat_classifier import parse_classification, parse_factor, parse_risk_score
+from .settings import RESULT_STORE_PATH, RESULT_STORE_FLUSH_ROWS, RESULT_STORE_FLUSH_SECONDS
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+PART_PREFIX = "part-"
+COMPACTED_PREFIX = "compacted-"
+
+# Rows per Parquet row group. Each group keeps min/max statistics, so on a
+# compacted (time-sorted) file a time filter skips every group outside it
+ROW_GROUP_ROWS = 32768
+
+
+@dataclass
+class ResultRecord:
+    """One analysis result, with the fields queries filter on parsed out of the report"""
+
+    __slots__ = (
+        "video", "camera", "analyzed_at", "status", "classification", "risk_score",
+        "hazard", "exposure", "vulnerability", "model_calls", "tokens", "cache_hit", "report",
+    )
+
+    video: str
+    camera: str
+    analyzed_at: float
+    status: str
+    classification: str
+    risk_score: Optional[float]
+    hazard: Optional[int]
+    exposure: Optional[int]
+    vulnerability: Optional[int]
+    model_calls: int
+    tokens: int
+    cache_hit: bool
+    report: str
+
+    @classmethod
+    def from_record(cls, video: str, record: Dict[str, Any], camera: str = "", analyzed_at: Optional[float] = None) -> "ResultRecord":
+        """
+        Build a record from a pipeline result dict ("result", "risk_score", ...)
+
+        Scores come from the structured engine's "analysis" when present and
+        are parsed from the report otherwise.
+        """
+        report = record.get("result") or ""
+        analysis = record.get("analysis") or {}
+        risk_score = analysis.get("risk_score")
+        if risk_score is None:
+            try:
+                risk_score = float(record.get("risk_score"))
+            except (TypeError, ValueError):
+                risk_score = parse_risk_score(report)
+        factors = {field: analysis.get(field) or parse_factor(report, field) for field in ("hazard", "exposure", "vulnerability")}
+        classification = record.get("classification")
+        if not classification or classification == "Unknown":
+            classification = parse_classification(report) or "Unknown"
+        tokens = record.get("tokens") or {}
+        return cls(
+            video=video,
+            camera=camera,
+            analyzed_at=time.time() if analyzed_at is None else analyzed_at,
+            status=record.get("status", "ok"),
+            classification=classification,
+            risk_score=None if risk_score is None else float(risk_score),
+            hazard=factors["hazard"],
+            exposure=factors["exposure"],
+            vulnerability=factors["vulnerability"],
+            model_calls=tokens.get("calls", 0),
+            tokens=tokens.get("tokens", 0),
+            cache_hit=bool(record.get("cache_hit", False)),
+            report=report,
+        )
+
+
+COLUMNS = [field.name for field in fields(ResultRecord)]
+
+
+def camera_name(video_path: Union[str, pathlib.Path]) -> str:
+    """The camera a video file came from: the name of the directory holding it"""
+    return pathlib.Path(video_path).resolve().parent.name
+
+
+def records_to_frame(records: Sequence[ResultRecord]) -> pd.DataFrame:
+    """Records as a DataFrame with compact, typed columns"""
+    frame = pd.DataFrame([[getattr(record, column) for column in COLUMNS] for record in records], columns=COLUMNS)
+    frame["analyzed_at"] = pd.to_datetime(frame["analyzed_at"].astype("float64"), unit="s", utc=True)
+    frame["risk_score"] = frame["risk_score"].astype("float64")
+    for column in ("hazard", "exposure", "vulnerability"):
+        frame[column] = frame[column].astype("Int8")
+    frame["model_calls"] = frame["model_calls"].astype("int32")
+    frame["tokens"] = frame["tokens"].astype("int64")
+    frame["cache_hit"] = frame["cache_hit"].astype("bool")
+    for column in ("video", "camera", "status", "classification", "report"):
+        frame[column] = frame[column].astype("string")
+    return frame
+
+
+def _part_files(path: str) -> List[str]:
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.endswith(".parquet") and name.startswith((PART_PREFIX, COMPACTED_PREFIX))
+    )
+
+
+def _write_part(path: str, frame: pd.DataFrame, prefix: str = PART_PREFIX) -> str:
+    """Write a part under a temporary name and rename it, so readers never see half a file"""
+    os.makedirs(path, exist_ok=True)
+    name = f"{prefix}{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+    temporary = os.path.join(path, "." + name)
+    frame.to_parquet(temporary, engine="pyarrow", index=False, compression="zstd", row_group_size=ROW_GROUP_ROWS)
+    os.replace(temporary, os.path.join(path, name))
+    return os.path.join(path, name)
+
+
+class ResultStore:
+    """
+    Buffered appender of ResultRecords to Parquet part files
+
+    Rows are held in memory until flush_rows accumulate or the oldest has
+    waited flush_seconds, and on close(). The age is checked as rows arrive;
+    long-running modes also run flush_periodically() so a quiet daemon still
+    persists its last rows. Records answered from the result cache are
+    skipped: their row was stored when the clip was analyzed, and adding it
+    again on every re-run would duplicate it in queries.
+    """
+
+    def __init__(self, path: str = RESULT_STORE_PATH, flush_rows: int = RESULT_STORE_FLUSH_ROWS, flush_seconds: float = RESULT_STORE_FLUSH_SECONDS):
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is not installed; run `pip install pyarrow`")
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self._buffer: List[ResultRecord] = []
+        self._oldest: Optional[float] = None
+
+    def add(self, record: ResultRecord) -> None:
+        if record.cache_hit:
+            return
+        if not self._buffer:
+            self._oldest = time.monotonic()
+        self._buffer.append(record)
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        """Flush when the oldest buffered row has waited flush_seconds"""
+        if self._oldest is not None and time.monotonic() - self._oldest >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        _write_part(self.path, records_to_frame(self._buffer))
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+        self._oldest = None
+
+    def close(self) -> None:
+        self.flush()
+
+
+def open_result_store(path: str = RESULT_STORE_PATH) -> Optional[ResultStore]:
+    """A ResultStore, or None (with a warning) when pyarrow is not installed"""
+    if not PYARROW_AVAILABLE:
+        print("⚠️ RESULT_STORE_ENABLED but pyarrow is not installed (pip install pyarrow); skipping the Parquet results store")
+        return None
+    return ResultStore(path)
+
+
+async def flush_periodically(store: Optional[ResultStore]) -> None:
+    """Flush `store` whenever its oldest buffered row is due, until cancelled (for long-running modes)"""
+    if store is None:
+        return
+    while True:
+        await asyncio.sleep(min(store.flush_seconds, 1.0))
+        store.flush_if_due()
+
+
+def compact(path: str = RESULT_STORE_PATH) -> int:
+    """
+    Merge every part file into one, sorted by time, and return its row count
+
+    Many small parts (one per flush) slow queries down; a single file lets
+    Parquet's row-group statistics skip most of the data for time and
+    score filters.
+    """
+    parts = _part_files(path)
+    if len(parts) < 2:
+        return len(pd.read_parquet(parts[0], engine="pyarrow")) if parts else 0
+    frame = pd.read_parquet(parts, engine="pyarrow").sort_values("analyzed_at", kind="stable")
+    _write_part(path, frame, COMPACTED_PREFIX)
+    for part in parts:
+        os.remove(part)
+    return len(frame)
+
+
+def _utc_timestamp(value: Union[datetime, timedelta, float]) -> pd.Timestamp:
+    """A query bound as a UTC timestamp: datetimes (naive = local time), epoch seconds, or a timedelta back from now"""
+    if isinstance(value, timedelta):
+        value = datetime.now(timezone.utc) - value
+    if isinstance(value, (int, float)):
+        return pd.Timestamp(value, unit="s", tz="UTC")
+    return pd.Timestamp(value.astimezone(timezone.utc))
+
+
+def query_results(
+    path: str = RESULT_STORE_PATH,
+    classification: Union[str, Sequence[str], None] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    camera: Union[str, Sequence[str], None] = None,
+    status: Union[str, Sequence[str], None] = None,
+    since: Union[datetime, timedelta, float, None] = None,
+    until: Union[datetime, timedelta, float, None] = None,
+    video: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Select stored results, newest first
+
+    Args:
+        classification, camera, status: a value or list of accepted values
+        min_risk, max_risk: inclusive RISK_SCORE bounds
+        since, until: inclusive time bounds as a datetime, epoch seconds or
+            a timedelta before now (``since=timedelta(days=7)``)
+        video: exact video name
+        columns: columns to load (default all but the full report text)
+
+    Returns:
+        A DataFrame with one row per matching result
+    """
+    filters = []
+    for column, accepted in (("classification", classification), ("camera", camera), ("status", status)):
+        if accepted is not None:
+            filters.append((column, "in", [accepted] if isinstance(accepted, str) else list(accepted)))
+    if video is not None:
+        filters.append(("video", "==", video))
+    if min_risk is not None:
+        filters.append(("risk_score", ">=", float(min_risk)))
+    if max_risk is not None:
+        filters.append(("risk_score", "<=", float(max_risk)))
+    if since is not None:
+        filters.append(("analyzed_at", ">=", _utc_timestamp(since)))
+    if until is not None:
+        filters.append(("analyzed_at", "<=", _utc_timestamp(until)))
+
+    columns = list(columns) if columns is not None else [column for column in COLUMNS if column != "report"]
+    parts = _part_files(path)
+    if not parts:
+        return records_to_frame([])[columns]
+    frame = pd.read_parquet(parts, engine="pyarrow", columns=columns, filters=filters or None)
+    if "analyzed_at" in frame.columns:
+        frame = frame.sort_values("analyzed_at", ascending=False, kind="stable")
+    return frame.reset_index(drop=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Query the Parquet results store")
+    parser.add_argument("--path", default=RESULT_STORE_PATH)
+    parser.add_argument("--classification", nargs="+", default=None)
+    parser.add_argument("--camera", nargs="+", default=None)
+    parser.add_argument("--status", nargs="+", default=None)
+    parser.add_argument("--min-risk", type=float, default=None)
+    parser.add_argument("--max-risk", type=float, default=None)
+    parser.add_argument("--days", type=float, default=None, help="Only results from the last DAYS days")
+    parser.add_argument("--limit", type=int, default=50, help="Rows to print")
+    parser.add_argument("--compact", action="store_true", help="Merge the part files into one first")
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        print(f"🗜️ Compacted {compact(args.path)} rows")
+    started = time.perf_counter()
+    results = query_results(
+        args.path, args.classification, args.min_risk, args.max_risk, args.camera, args.status,
+        since=timedelta(days=args.days) if args.days is not None else None,
+        columns=["analyzed_at", "camera", "video", "classification", "risk_score", "status"],
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(results.head(args.limit).to_string(index=False))
+    print(f"{len(results)} results in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
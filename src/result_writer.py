@@ -0,0 +1,137 @@
+"""
+Result output for batch runs
+
+JsonResultWriter keeps the original single JSON document written at the end
+of a run, with each video's full record (report, scores, activity gate,
+cascade tier...) under "video_results". JsonlResultWriter streams one durable record per finished video and
+resumes from whatever an interrupted run already wrote.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Set
+
+
+class RunSummary:
+    """Processing statistics updated one record at a time"""
+
+    def __init__(self):
+        self.total_videos = 0
+        self.successful_analyses = 0
+        self.failed_analyses = 0
+        self.model_calls = 0
+        self.total_tokens = 0
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.total_videos += 1
+        if record.get("status") == "error":
+            self.failed_analyses += 1
+        else:
+            self.successful_analyses += 1
+        tokens = record.get("tokens") or {}
+        self.model_calls += tokens.get("calls", 0)
+        self.total_tokens += tokens.get("tokens", 0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = self.total_videos
+        return {
+            "total_videos": total,
+            "successful_analyses": self.successful_analyses,
+            "failed_analyses": self.failed_analyses,
+            "success_rate": f"{(self.successful_analyses/total)*100:.1f}%" if total > 0 else "0%",
+            "model_calls": self.model_calls,
+            "total_tokens": self.total_tokens,
+            "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+class JsonResultWriter:
+    """Collect results in memory and write one JSON document on close"""
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.summary = RunSummary()
+        self.completed: Set[str] = set()
+        self._results: Dict[str, Dict[str, Any]] = {}
+
+    def write(self, video_name: str, record: Dict[str, Any]) -> None:
+        self._results[video_name] = record
+        self.summary.add(record)
+
+    def results(self) -> Dict[str, Any]:
+        return dict(sorted(self._results.items()))
+
+    def close(self) -> None:
+        os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+        with open(self.output_file, 'w') as f:
+            json.dump({
+                "processing_summary": self.summary.as_dict(),
+                "video_results": self.results()
+            }, f, indent=2)
+
+
+class JsonlResultWriter:
+    """
+    Append one JSON line per finished video and flush it to disk immediately
+
+    Records already present in the output file are counted into the summary
+    and listed in `completed` so a restarted run can skip them. A truncated
+    last line from a crash is ignored and the video is processed again.
+    The summary is written next to the output as `<output>.summary.json`.
+    """
+
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.summary_file = output_file + ".summary.json"
+        self.summary = RunSummary()
+        self.completed: Set[str] = set()
+
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        if os.path.exists(output_file):
+            self._load_existing()
+        self._file = open(output_file, 'a', encoding='utf-8')
+
+    def _load_existing(self) -> None:
+        good_end = 0
+        with open(self.output_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not line.endswith(b"\n") or not isinstance(record, dict) or "video" not in record:
+                    continue
+                good_end = f.tell()
+                if record["video"] not in self.completed:
+                    self.completed.add(record["video"])
+                    self.summary.add(record)
+
+        # Drop a partially written trailing line so appends stay valid JSONL
+        if good_end < os.path.getsize(self.output_file):
+            with open(self.output_file, 'r+b') as f:
+                f.truncate(good_end)
+
+    def write(self, video_name: str, record: Dict[str, Any]) -> None:
+        line = json.dumps({"video": video_name, **record, "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')})
+        self._file.write(line + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed.add(video_name)
+        self.summary.add(record)
+
+    def results(self) -> Dict[str, Any]:
+        # Records live on disk only; callers get the running summary instead
+        return self.summary.as_dict()
+
+    def close(self) -> None:
+        self._file.close()
+        with open(self.summary_file, 'w') as f:
+            json.dump({"processing_summary": self.summary.as_dict()}, f, indent=2)
+
+
+def open_result_writer(output_file: str):
+    """Pick the writer from the output extension: `.jsonl` streams, anything else is a single JSON file"""
+    if output_file.endswith(".jsonl"):
+        return JsonlResultWriter(output_file)
+    return JsonResultWriter(output_file)
@@ -1,159 +1,283 @@
 #run_batch.py
-import json
-import os
 import pathlib
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from .agents.workflow import root_agent
-from .agents.video_summarizer import video_summarizer
-from .agents.threat_classifier import threat_classifier
-from .tools.video_loader import extract_video_frames
-from .settings import GOOGLE_API_KEY
+from .agents.video_summarizer import inline_video_summarizer, mosaic_video_summarizer, video_summarizer
+from .agents.threat_classifier import threat_classifier, classify_locally, format_score, parse_classification, parse_risk_score
+from .agents.structured_analyzer import ANALYSIS_ENGINES, parse_analysis, render_report, structured_video_analyzer
+from .tools.video_loader import (
+    MAX_FRAMES,
+    cache_extraction,
+    extract_frame_images,
+    extract_video_frames_uncached,
+    frame_cache,
+    get_cached_extraction,
+)
+from .tools.motion import extract_frames_with_activity
+from .tools.phash import parse_hashes
+from .tools.mosaic import extract_frame_mosaic
+from .callbacks import ABORT_PREFIX
+from .rate_limiter import backoff_delay, is_rate_limit_error, rate_limiter
+from .llm_backend import requires_api_key
+from .result_cache import ResultCache
+from .token_accounting import token_ledger
+from .result_writer import open_result_writer
+from .result_store import ResultRecord, camera_name, open_result_store
+from .segments import analyze_long_video, is_long_video
+from .cascade import cascade_analysis, cascade_stats
+from .sessions import USER_ID, agent_session
+from .metrics import metrics, metrics_paths
+from .settings import (
+    GOOGLE_API_KEY,
+    BATCH_CONCURRENCY,
+    EXTRACT_WORKERS,
+    EXTRACT_PREFETCH,
+    LOCAL_CLASSIFIER_ENABLED,
+    RESULT_CACHE_ENABLED,
+    RESULT_STORE_ENABLED,
+    CLIP_DEDUP_ENABLED,
+    CASCADE_ENABLED,
+    MOTION_GATE_ENABLED,
+    MOTION_GATE_THRESHOLD,
+    MOTION_GATE_SAMPLES,
+    FRAME_DELIVERY,
+    ANALYSIS_ENGINE,
+    INLINE_MAX_FRAMES,
+    MOSAIC_FRAMES,
+    METRICS_JSON_FILE,
+    RETRY_BACKOFF_BASE_SECONDS,
+)
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
 from google.genai import types
 import asyncio
 import time
 
-async def process_videos_async(video_directory: str = "videos", output_file: str = "src/results/video_analysis_results.json"):
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+
+
+async def _wait_before_retry(wait_time: float) -> None:
+    print(f"⏳ Waiting {wait_time:.1f} seconds before retry...")
+    with metrics.span("retry_wait"):
+        await asyncio.sleep(wait_time)
+
+
+async def _run_agent_with_retries(runner, session_id: str, message, label: str, separator: str = "", max_retries: int = 3, validate: Optional[Callable[[str], Any]] = None) -> str:
     """
-    Process all videos in the specified directory with enhanced error handling and proper workflow
+    Run one agent turn through Runner.run_async and collect its text output
+
+    Retries when the run raises, produces no text or (with `validate`)
+    produces text that validate() rejects, backing off exponentially with
+    jitter and honouring any retry-after hint on the error. Malformed
+    function calls and empty or invalid replies back off from the shorter
+    RETRY_BACKOFF_BASE_SECONDS. Returns an empty
+    string if every attempt fails so the caller can substitute a fallback.
     """
-    
-    # Initialize session service
-    session_service = InMemorySessionService()
-    
-    # Create separate runners for each agent to handle failures independently
-    video_runner = Runner(
-        agent=video_summarizer,
-        app_name="video_analysis", 
-        session_service=session_service
-    )
-    
-    threat_runner = Runner(
-        agent=threat_classifier,
-        app_name="threat_classification",
-        session_service=session_service
-    )
-    
-    # Find all video files
-    video_path = pathlib.Path(video_directory)
-    video_files = list(video_path.glob("*.mp4")) + list(video_path.glob("*.avi")) + list(video_path.glob("*.mov"))
-    
-    if not video_files:
-        print(f"No video files found in {video_directory}")
-        return {}
-    
-    results = {}
-    
-    for i, video_file in enumerate(video_files, 1):
-        print(f"\nProcessing {i}/{len(video_files)}: {video_file.name}")
-        
+    agent = label.lower().replace(" ", "_")
+    for attempt in range(max_retries):
+        result = ""
+        if attempt > 0:
+            metrics.inc("agent_retries_total", agent=agent)
         try:
-            # Create session for video analysis
-            video_session = await session_service.create_session(
-                app_name="video_analysis",
-                user_id="surveillance_user",
-                session_id=f"video_{video_file.stem}"
-            )
-            
-            print(f"✓ Created video analysis session: {video_session.id}")
-            
-            # Extract frames first using the video_loader
-            print(f"📹 Extracting frames from: {str(video_file)}")
-            
-            frame_result = extract_video_frames(str(video_file), num_frames=3)
-            
-            if 'error' in frame_result:
-                print(f"❌ Frame extraction failed: {frame_result['error']}")
-                video_analysis_result = f"""FRAME EXTRACTION ERROR for {video_file.name}:
-ERROR: {frame_result['error']}
-SUMMARY: Unable to process video file - file may be corrupted or in unsupported format
-THREATS: Manual review required due to technical failure
-HAZARD: 5 (Unknown - requires manual inspection)
-EXPOSURE: 5 (Unknown - requires manual inspection) 
-VULNERABILITY: 5 (Unknown - requires manual inspection)
-RISK_SCORE: 125 (Fallback score due to extraction failure)"""
-                
-                print("🔄 Skipping video analysis due to frame extraction failure")
-                
+            print(f"🔄 {label} attempt {attempt + 1}/{max_retries}")
+
+            async for event in runner.run_async(
+                user_id=USER_ID,
+                session_id=session_id,
+                new_message=message
+            ):
+                if hasattr(event, 'error_code') and event.error_code:
+                    print(f"⚠️ {label} error: {event.error_code}")
+                    metrics.inc("agent_errors_total", agent=agent, kind=event.error_code)
+                    if event.error_code == 'MALFORMED_FUNCTION_CALL':
+                        print("🔧 Function call format issue detected")
+                    continue
+
+                if hasattr(event, 'content') and event.content:
+                    if hasattr(event.content, 'parts') and event.content.parts:
+                        for part in event.content.parts:
+                            if hasattr(part, 'text') and part.text:
+                                result += part.text + separator
+
+            if result.startswith(ABORT_PREFIX):
+                # quota_guard refused the request; retrying would be refused too
+                print(f"🛑 {label} blocked by token budget: {result.strip()}")
+                metrics.inc("budget_aborts_total", agent=agent)
+                return ""
+
+            if result.strip() and validate is not None and not validate(result):
+                print(f"❌ Invalid {label.lower()} result on attempt {attempt + 1}")
+                metrics.inc("agent_errors_total", agent=agent, kind="invalid")
+            elif result.strip():
+                print(f"✅ {label} completed successfully")
+                return result
             else:
-                print(f"✅ Extracted {frame_result['sampled_frames']} frames successfully")
-                
-                # Create message in plain text format
-                user_message = types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(text=f"Analyze this video for surveillance threats.\n\nVIDEO_PATH={str(video_file)}\n\nPlease use the exact VIDEO_PATH value above to call extract_video_frames.")
-                    ]
-                )
-                
-                print(f"📤 Sending video analysis request...")
-                
-                # Run video analysis with retry logic
-                video_analysis_result = ""
-                max_retries = 3
-                
-                for attempt in range(max_retries):
-                    try:
-                        print(f"🔄 Video analysis attempt {attempt + 1}/{max_retries}")
-                        
-                        events = video_runner.run(
-                            user_id="surveillance_user",
-                            session_id=video_session.id,
-                            new_message=user_message
-                        )
-                        
-                        # Process video analysis events
-                        for event in events:
-                            if hasattr(event, 'error_code') and event.error_code:
-                                print(f"⚠️ Video analysis error: {event.error_code}")
-                                if event.error_code == 'MALFORMED_FUNCTION_CALL':
-                                    print("🔧 Function call format issue detected")
-                                continue
-                                
-                            if hasattr(event, 'content') and event.content:
-                                if hasattr(event.content, 'parts') and event.content.parts:
-                                    for part in event.content.parts:
-                                        if hasattr(part, 'text') and part.text:
-                                            video_analysis_result += part.text + "\n"
-                        
-                        if video_analysis_result.strip():
-                            print("✅ Video analysis completed successfully")
-                            break
-                        else:
-                            print(f"❌ No video analysis result on attempt {attempt + 1}")
-                            
-                    except Exception as e:
-                        print(f"❌ Video analysis attempt {attempt + 1} failed: {str(e)}")
-                        if attempt < max_retries - 1:
-                            wait_time = (attempt + 1) * 2
-                            print(f"⏳ Waiting {wait_time} seconds before retry...")
-                            await asyncio.sleep(wait_time)
-                        else:
-                            print("💥 All video analysis attempts failed")
-                
-                # If video analysis failed completely, create fallback analysis
-                if not video_analysis_result.strip():
-                    video_analysis_result = f"""FALLBACK ANALYSIS for {video_file.name}:
-SUMMARY: Unable to extract and analyze video frames due to technical issues
-THREATS: Manual review required - automated analysis failed
-HAZARD: 5 (Unknown - requires manual inspection)
-EXPOSURE: 5 (Unknown - requires manual inspection) 
-VULNERABILITY: 5 (Unknown - requires manual inspection)
-RISK_SCORE: 125 (Fallback score due to analysis failure)
+                print(f"❌ No {label.lower()} result on attempt {attempt + 1}")
+                metrics.inc("agent_errors_total", agent=agent, kind="empty")
 
-NOTE: This video requires manual review as automated frame extraction failed."""
-                    
-                    print("🔄 Using fallback analysis due to video processing failure")
-            
-            # Create session for threat classification
-            threat_session = await session_service.create_session(
-                app_name="threat_classification",
-                user_id="surveillance_user", 
-                session_id=f"threat_{video_file.stem}"
-            )
-            
+            if attempt < max_retries - 1:
+                await _wait_before_retry(backoff_delay(attempt, base=RETRY_BACKOFF_BASE_SECONDS))
+
+        except Exception as e:
+            print(f"❌ {label} attempt {attempt + 1} failed: {str(e)}")
+            rate_limited = is_rate_limit_error(e)
+            metrics.inc("agent_errors_total", agent=agent, kind="rate_limited" if rate_limited else type(e).__name__)
+            if attempt < max_retries - 1:
+                wait_time = backoff_delay(attempt, e)
+                if rate_limited:
+                    # Hold back every worker, not just this one, until the quota recovers
+                    rate_limiter.pause(wait_time)
+                await _wait_before_retry(wait_time)
+            else:
+                print(f"💥 All {label.lower()} attempts failed")
+
+    metrics.inc("agent_failures_total", agent=agent)
+    return ""
+
+
+async def _lookup_cached_result(video_file: pathlib.Path, result_cache: Optional[ResultCache]):
+    """Return (content_hash, cached record or None) for a video"""
+    if result_cache is None:
+        return None, None
+    loop = asyncio.get_running_loop()
+    try:
+        content_hash = await loop.run_in_executor(None, result_cache.content_hash, str(video_file))
+    except OSError as e:
+        print(f"⚠️ Could not hash {video_file.name}: {e}")
+        return None, None
+    return content_hash, result_cache.get(content_hash)
+
+
+def _frame_delivery() -> str:
+    """FRAME_DELIVERY, with "tool" read as "inline" for the structured engine (it has no tool to call)"""
+    if ANALYSIS_ENGINE == "structured" and FRAME_DELIVERY == "tool":
+        return "inline"
+    return FRAME_DELIVERY
+
+
+def _frame_extractor():
+    """The decode-stage function and frame count for the configured FRAME_DELIVERY"""
+    frame_delivery = _frame_delivery()
+    if frame_delivery == "inline":
+        return extract_frame_images, INLINE_MAX_FRAMES
+    if frame_delivery == "mosaic":
+        return extract_frame_mosaic, MOSAIC_FRAMES
+    return extract_video_frames_uncached, MAX_FRAMES
+
+
+def _submit_extraction(video_file: pathlib.Path, executor) -> asyncio.Future:
+    """Start frame extraction for a video on the executor (or reuse cached frames)"""
+    loop = asyncio.get_running_loop()
+    extractor, num_frames = _frame_extractor()
+    if _frame_delivery() == "tool":
+        cached = get_cached_extraction(str(video_file), MAX_FRAMES)
+        if cached is not None:
+            future = loop.create_future()
+            future.set_result(cached)
+            return future
+    if MOTION_GATE_ENABLED:
+        return loop.run_in_executor(executor, extract_frames_with_activity, str(video_file), num_frames, MOTION_GATE_SAMPLES, extractor)
+    return loop.run_in_executor(executor, extractor, str(video_file), num_frames)
+
+
+async def _produce_frames(video_files, queue: asyncio.Queue, executor, consumers: int, result_cache: Optional[ResultCache] = None) -> None:
+    """
+    Decode stage: submit frame extraction for upcoming videos to the executor
+
+    The queue holds pending extraction futures and is bounded, so at most
+    `queue.maxsize` videos are pre-extracted ahead of the LLM stage. Videos
+    already in the persistent result cache skip extraction entirely.
+    """
+    for i, video_file in enumerate(video_files, 1):
+        content_hash, record = await _lookup_cached_result(video_file, result_cache)
+        if record is not None:
+            await queue.put((i, video_file, None, content_hash, record))
+            continue
+        await queue.put((i, video_file, _submit_extraction(video_file, executor), content_hash, None))
+
+    # One sentinel per consumer so every worker shuts down
+    for _ in range(consumers):
+        await queue.put(None)
+
+
+def _summarizer_message(video_file: pathlib.Path, frame_result: Dict[str, Any]) -> types.Content:
+    """
+    User message for the summarizer
+
+    In "tool" delivery the agent fetches the frames itself through
+    extract_video_frames; in "inline" delivery the JPEG bytes ride along as
+    image parts, each preceded by its timestamp; in "mosaic" delivery a single
+    grid image carries every frame with its timestamp burned in.
+    """
+    frame_delivery = _frame_delivery()
+    if frame_delivery == "mosaic":
+        labels = ", ".join(frame_result.get("mosaic_labels") or [])
+        return types.Content(role="user", parts=[
+            types.Part.from_text(text=f"Analyze this grid of {frame_result['sampled_frames']} frames from {video_file.name} for surveillance threats. Tile timestamps in reading order: {labels}."),
+            types.Part.from_bytes(data=frame_result["frames"][0], mime_type="image/jpeg"),
+        ])
+
+    if frame_delivery != "inline":
+        return types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=f"Analyze this video for surveillance threats.\n\nVIDEO_PATH={str(video_file)}\n\nPlease use the exact VIDEO_PATH value above to call extract_video_frames.")
+            ]
+        )
+
+    return _inline_message(video_file, frame_result)
+
+
+def _inline_message(video_file: pathlib.Path, frame_result: Dict[str, Any]) -> types.Content:
+    """User message carrying the extracted JPEG bytes as image parts, each preceded by its timestamp"""
+    parts = [types.Part.from_text(text=f"Analyze these {len(frame_result['frames'])} frames from {video_file.name} for surveillance threats.")]
+    timestamps = frame_result.get("frame_timestamps") or []
+    for position, jpeg in enumerate(frame_result["frames"]):
+        label = f"Frame {position + 1} at {timestamps[position]}s:" if position < len(timestamps) else f"Frame {position + 1}:"
+        parts.append(types.Part.from_text(text=label))
+        parts.append(types.Part.from_bytes(data=jpeg, mime_type="image/jpeg"))
+    return types.Content(role="user", parts=parts)
+
+
+def _gated_record(video_file: pathlib.Path, gate: Dict[str, Any]) -> Dict[str, Any]:
+    """Result for a clip the activity gate judged static, produced without the agents"""
+    video_analysis_result = f"""ACTIVITY_GATE: skipped (motion score {gate['motion_score']} below threshold {gate['threshold']})
+SUMMARY: No significant motion detected in {video_file.name}; static scene, model analysis skipped
+THREATS: None detected
+HAZARD: 1 (No activity)
+EXPOSURE: 1 (No activity)
+VULNERABILITY: 1 (No activity)
+RISK_SCORE: 1"""
+    return {
+        "result": f"""=== VIDEO SURVEILLANCE ANALYSIS ===\n\n{video_analysis_result}\n\n=== THREAT CLASSIFICATION ===\n\nRISK_SCORE: 1\nCLASSIFICATION: Normal""",
+        "risk_score": "1",
+        "classification": "Normal",
+        "status": "ok",
+        "gate": gate,
+    }
+
+
+async def _classify_summary(video_analysis_result: str, session_key: str, session_service, threat_runner):
+    """
+    Classify a surveillance summary, locally when unambiguous and with the classifier agent otherwise
+
+    Returns (RISK_SCORE, CLASSIFICATION, used_fallback); used_fallback is
+    True when the classifier failed and the fallback classification was used.
+    """
+    used_fallback = False
+
+    # Apply the classification table locally when the summary is unambiguous
+    threat_classification = classify_locally(video_analysis_result) if LOCAL_CLASSIFIER_ENABLED else None
+
+    if threat_classification:
+        print("⚡ Threat classified locally from RISK_SCORE")
+        metrics.inc("local_classifications_total")
+    else:
+        # Session for threat classification, deleted once the turn ends
+        async with agent_session(session_service, "threat_classification", "threat", session_key) as threat_session:
             print(f"✓ Created threat classification session: {threat_session.id}")
-            
+
             # Prepare threat classification message
             threat_message = types.Content(
                 role="user",
@@ -167,78 +291,203 @@ Please analyze the above surveillance summary and provide threat classification.
                     )
                 ]
             )
-            
+
             print("🎯 Running threat classification...")
-            
-            # Run threat classification with retry logic
-            threat_classification = ""
-            max_retries = 3
-            
-            for attempt in range(max_retries):
-                try:
-                    print(f"🔄 Threat classification attempt {attempt + 1}/{max_retries}")
-                    
-                    threat_events = threat_runner.run(
-                        user_id="surveillance_user",
-                        session_id=threat_session.id,
-                        new_message=threat_message
-                    )
-                    
-                    # Process threat classification events
-                    for event in threat_events:
-                        if hasattr(event, 'error_code') and event.error_code:
-                            print(f"⚠️ Threat classification error: {event.error_code}")
-                            continue
-                            
-                        if hasattr(event, 'content') and event.content:
-                            if hasattr(event.content, 'parts') and event.content.parts:
-                                for part in event.content.parts:
-                                    if hasattr(part, 'text') and part.text:
-                                        threat_classification += part.text
-                    
-                    if threat_classification.strip():
-                        print("✅ Threat classification completed successfully")
-                        break
-                    else:
-                        print(f"❌ No threat classification result on attempt {attempt + 1}")
-                        
-                except Exception as e:
-                    print(f"❌ Threat classification attempt {attempt + 1} failed: {str(e)}")
-                    if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 2
-                        print(f"⏳ Waiting {wait_time} seconds before retry...")
-                        await asyncio.sleep(wait_time)
-                    else:
-                        print("💥 All threat classification attempts failed")
-            
-            # If threat classification failed, provide fallback
-            if not threat_classification.strip():
-                threat_classification = """THREAT_SCORE: 50
+
+            with metrics.span("llm_classify"):
+                threat_classification = await _run_agent_with_retries(
+                    threat_runner, threat_session.id, threat_message, "Threat classification"
+                )
+
+    # If threat classification failed, provide fallback
+    if not threat_classification.strip():
+        threat_classification = """THREAT_SCORE: 50
 CLASSIFICATION: Normal
 NOTE: Threat classification failed - manual review required"""
-                print("🔄 Using fallback threat classification")
-            
-            # Extract and display risk score for logging
-            risk_score = "Unknown"
-            threat_class = "Unknown"
-            
-            for line in threat_classification.split('\n'):
-                if line.startswith('RISK_SCORE:'):
-                    risk_score = line.split(':', 1)[1].strip()
-                elif line.startswith('CLASSIFICATION:'):
-                    threat_class = line.split(':', 1)[1].strip()
-            
-            # Combine results with better formatting
-            final_result = f"""=== VIDEO SURVEILLANCE ANALYSIS ===\n\n{video_analysis_result}\n\n=== THREAT CLASSIFICATION ===\n\nRISK_SCORE: {risk_score}\nCLASSIFICATION: {threat_class}"""
-            
-            results[video_file.name] = final_result
-            
-            print(f"✅ Completed: {video_file.name}")
-            print(f"📊 Risk Score: {risk_score}")
-            print(f"🏷️ Classification: {threat_class}")
-            
+        print("🔄 Using fallback threat classification")
+        metrics.inc("fallbacks_total", stage="classify")
+        used_fallback = True
+
+    # Extract the risk score and class, tolerating markdown around the labels
+    parsed_score = parse_risk_score(threat_classification)
+    risk_score = format_score(parsed_score) if parsed_score is not None else "Unknown"
+    threat_class = parse_classification(threat_classification) or "Unknown"
+
+    return risk_score, threat_class, used_fallback
+
+
+def _duplicate_record(video_file: pathlib.Path, duplicate: Dict[str, Any]) -> Dict[str, Any]:
+    """Result for a near-duplicate of an analyzed clip: its analysis, linked to the original"""
+    print(f"👯 {video_file.name} matches {duplicate['video']} (frame hashes within {duplicate['distance']} bits, pixels within {duplicate['pixel_diff']} levels), reusing its analysis")
+    metrics.inc("near_duplicate_clips_total")
+    return {
+        **duplicate["record"],
+        "duplicate_of": {"video": duplicate["video"], "content_hash": duplicate["content_hash"], "distance": duplicate["distance"]},
+    }
+
+
+async def _analyze_video(video_file: pathlib.Path, frame_future, session_service, video_runner, threat_runner, result_cache: Optional[ResultCache] = None) -> Dict[str, Any]:
+    """
+    Run the summarize→classify steps for a single video
+
+    `frame_future` resolves to the extraction result from the decode stage.
+    Returns a record with the combined report under "result" and a "status"
+    of "ok", "fallback" (some step used a fallback answer) or "error".
+    Clips below the activity gate's motion threshold skip the agents; videos
+    longer than LONG_VIDEO_MIN_SECONDS are summarized window by window and
+    get a "timeline" of per-window scores. A clip whose frame hashes match an
+    analyzed clip in `result_cache` reuses that analysis ("duplicate_of").
+    With CASCADE_ENABLED a risky or unparseable summary is redone from
+    high-resolution frames (see cascade.py; recorded under "cascade").
+    With the structured engine one call returns the scores and
+    classification as JSON (kept under "analysis") and the classify step is
+    skipped.
+    """
+    status = "ok"
+    gate = None
+    timeline = None
+    analysis = None
+    cascade = None
+    try:
+        # Frames were extracted ahead of time by the decode stage; cache them
+        # so the agent's extract_video_frames tool call reuses them
+        print(f"📹 Waiting for frames from: {str(video_file)}")
+
+        try:
+            with metrics.span("frames_wait"):
+                frame_result = await frame_future
         except Exception as e:
-            error_msg = f"""ERROR: {str(e)}
+            frame_result = {"error": f"Error processing video frames: {str(e)}"}
+        metrics.observe_stages(frame_result.pop("timings", None))
+        motion_score = frame_result.pop("motion_score", None)
+        fingerprint = frame_result.pop("fingerprint", None)
+        if frame_result.get("duplicate_frames_dropped"):
+            metrics.inc("duplicate_frames_dropped_total", frame_result["duplicate_frames_dropped"])
+        if _frame_delivery() == "tool":
+            cache_extraction(str(video_file), MAX_FRAMES, frame_result)
+
+        if MOTION_GATE_ENABLED and motion_score is not None:
+            gate = {
+                "decision": "skipped" if motion_score < MOTION_GATE_THRESHOLD else "analyzed",
+                "motion_score": motion_score,
+                "threshold": MOTION_GATE_THRESHOLD,
+            }
+            if gate["decision"] == "skipped":
+                print(f"💤 Activity gate: motion score {motion_score} < {MOTION_GATE_THRESHOLD}, skipping model analysis")
+                metrics.inc("activity_gate_skips_total")
+                return _gated_record(video_file, gate)
+            print(f"🏃 Activity gate: motion score {motion_score}, analyzing")
+
+        if CLIP_DEDUP_ENABLED and result_cache is not None and fingerprint:
+            duplicate = result_cache.find_similar(parse_hashes(fingerprint["hashes"]), fingerprint.get("thumbnails"), fingerprint.get("duration"))
+            if duplicate is not None:
+                return {**_duplicate_record(video_file, duplicate), "fingerprint": fingerprint}
+
+        if 'error' in frame_result:
+            print(f"❌ Frame extraction failed: {frame_result['error']}")
+            video_analysis_result = f"""FRAME EXTRACTION ERROR for {video_file.name}:
+ERROR: {frame_result['error']}
+SUMMARY: Unable to process video file - file may be corrupted or in unsupported format
+THREATS: Manual review required due to technical failure
+HAZARD: 5 (Unknown - requires manual inspection)
+EXPOSURE: 5 (Unknown - requires manual inspection)
+VULNERABILITY: 5 (Unknown - requires manual inspection)
+RISK_SCORE: 125 (Fallback score due to extraction failure)"""
+
+            print("🔄 Skipping video analysis due to frame extraction failure")
+            metrics.inc("fallbacks_total", stage="extraction")
+            status = "fallback"
+
+        else:
+            print(f"✅ Extracted {frame_result['sampled_frames']} frames successfully")
+
+            if is_long_video(frame_result):
+                video_analysis_result, timeline = await analyze_long_video(video_file, frame_result, session_service)
+                video_analysis_result = video_analysis_result or ""
+                if video_analysis_result and any(window["status"] != "ok" for window in timeline):
+                    metrics.inc("fallbacks_total", stage="window")
+                    status = "fallback"
+            else:
+                # Session for video analysis, deleted with its frame payloads once the turn ends
+                async with agent_session(session_service, "video_analysis", "video", video_file.stem) as video_session:
+                    print(f"✓ Created video analysis session: {video_session.id}")
+
+                    user_message = _summarizer_message(video_file, frame_result)
+
+                    print(f"📤 Sending video analysis request...")
+
+                    if ANALYSIS_ENGINE == "structured":
+                        with metrics.span("llm_analyze"):
+                            video_analysis_result = await _run_agent_with_retries(
+                                video_runner, video_session.id, user_message, "Video analysis", validate=parse_analysis
+                            )
+                        analysis = parse_analysis(video_analysis_result) if video_analysis_result.strip() else None
+                        if analysis is not None:
+                            video_analysis_result = render_report(analysis)
+                    else:
+                        with metrics.span("llm_summarize"):
+                            video_analysis_result = await _run_agent_with_retries(
+                                video_runner, video_session.id, user_message, "Video analysis", separator="\n"
+                            )
+
+                if CASCADE_ENABLED:
+                    video_analysis_result, analysis, cascade = await cascade_analysis(
+                        video_file, video_analysis_result, analysis, session_service, structured=ANALYSIS_ENGINE == "structured"
+                    )
+
+            # If video analysis failed completely, create fallback analysis
+            if not video_analysis_result.strip():
+                video_analysis_result = f"""FALLBACK ANALYSIS for {video_file.name}:
+SUMMARY: Unable to extract and analyze video frames due to technical issues
+THREATS: Manual review required - automated analysis failed
+HAZARD: 5 (Unknown - requires manual inspection)
+EXPOSURE: 5 (Unknown - requires manual inspection)
+VULNERABILITY: 5 (Unknown - requires manual inspection)
+RISK_SCORE: 125 (Fallback score due to analysis failure)
+
+NOTE: This video requires manual review as automated frame extraction failed."""
+
+                print("🔄 Using fallback analysis due to video processing failure")
+                metrics.inc("fallbacks_total", stage="summarize")
+                status = "fallback"
+
+        if analysis is not None:
+            # The structured reply already carries the classification
+            risk_score, threat_class = str(analysis.risk_score), analysis.classification
+        else:
+            risk_score, threat_class, used_fallback = await _classify_summary(
+                video_analysis_result, video_file.stem, session_service, threat_runner
+            )
+            if used_fallback:
+                status = "fallback"
+
+        # Combine results with better formatting
+        final_result = f"""=== VIDEO SURVEILLANCE ANALYSIS ===\n\n{video_analysis_result}\n\n=== THREAT CLASSIFICATION ===\n\nRISK_SCORE: {risk_score}\nCLASSIFICATION: {threat_class}"""
+
+        print(f"✅ Completed: {video_file.name}")
+        print(f"📊 Risk Score: {risk_score}")
+        print(f"🏷️ Classification: {threat_class}")
+
+        record = {
+            "result": final_result,
+            "risk_score": risk_score,
+            "classification": threat_class,
+            "status": status,
+        }
+        if gate is not None:
+            record["gate"] = gate
+        if fingerprint is not None:
+            record["fingerprint"] = fingerprint
+        if analysis is not None:
+            record["analysis"] = analysis.model_dump()
+        if cascade is not None:
+            record["cascade"] = cascade
+        if timeline is not None:
+            record["timeline"] = [{key: value for key, value in window.items() if key != "summary"} for window in timeline]
+        return record
+
+    except Exception as e:
+        error_msg = f"""ERROR: {str(e)}
 VIDEO: {video_file.name}
 TIMESTAMP: {time.strftime('%Y-%m-%d %H:%M:%S')}
 
@@ -246,52 +495,190 @@ FALLBACK THREAT ASSESSMENT:
 THREAT_SCORE: 25
 CLASSIFICATION: Normal
 NOTE: Complete system failure - requires manual inspection"""
-            
-            results[video_file.name] = error_msg
-            print(f"💥 Critical error processing {video_file.name}: {e}")
-    
-    # Save results with enhanced formatting
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
-    # Create summary statistics
-    total_videos = len(results)
-    successful_analyses = sum(1 for result in results.values() if not result.startswith("ERROR"))
-    failed_analyses = total_videos - successful_analyses
-    
-    summary = {
-        "processing_summary": {
-            "total_videos": total_videos,
-            "successful_analyses": successful_analyses,
-            "failed_analyses": failed_analyses,
-            "success_rate": f"{(successful_analyses/total_videos)*100:.1f}%" if total_videos > 0 else "0%",
-            "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')
-        },
-        "video_results": results
-    }
-    
-    with open(output_file, 'w') as f:
-        json.dump(summary, f, indent=2)
-    
+
+        print(f"💥 Critical error processing {video_file.name}: {e}")
+        return {
+            "result": error_msg,
+            "risk_score": "Unknown",
+            "classification": "Unknown",
+            "status": "error",
+        }
+
+
+async def _finish_video(video_file: pathlib.Path, frame_future, content_hash, cached_record, session_service, video_runner, threat_runner, result_cache: Optional[ResultCache]) -> Dict[str, Any]:
+    """Return the cached record for a video, or analyze it and cache a successful result"""
+    if cached_record is not None:
+        print(f"♻️ Reusing cached analysis for {video_file.name}")
+        metrics.inc("videos_total", status="cached")
+        return {**cached_record, "tokens": token_ledger.empty_usage(), "cache_hit": True}
+    with token_ledger.track(video_file.name), metrics.span("video_total"):
+        record = await _analyze_video(video_file, frame_future, session_service, video_runner, threat_runner, result_cache)
+    record["tokens"] = token_ledger.finish_video(video_file.name)
+    metrics.inc("videos_total", status=record["status"])
+    metrics.inc("model_calls_total", record["tokens"]["calls"])
+    metrics.inc("tokens_total", record["tokens"]["tokens"])
+    print(f"🪙 Tokens used by {video_file.name}: {record['tokens']['tokens']} over {record['tokens']['calls']} model calls")
+    # The thumbnails are only needed by the fingerprint index, not in the saved record
+    thumbnails = record["fingerprint"].pop("thumbnails", None) if record.get("fingerprint") else None
+    if result_cache is not None and content_hash and record["status"] == "ok":
+        result_cache.put(content_hash, video_file.name, record, thumbnails)
+    return record
+
+
+def _summarizer_agent():
+    """The summarizer variant matching ANALYSIS_ENGINE and FRAME_DELIVERY"""
+    if ANALYSIS_ENGINE not in ANALYSIS_ENGINES:
+        raise ValueError(f"Unknown ANALYSIS_ENGINE {ANALYSIS_ENGINE!r}; expected one of {ANALYSIS_ENGINES}")
+    if ANALYSIS_ENGINE == "structured":
+        return structured_video_analyzer
+    if FRAME_DELIVERY == "inline":
+        return inline_video_summarizer
+    if FRAME_DELIVERY == "mosaic":
+        return mosaic_video_summarizer
+    return video_summarizer
+
+
+def _create_runners(session_service):
+    """Create separate runners for each agent to handle failures independently"""
+    video_runner = Runner(
+        agent=_summarizer_agent(),
+        app_name="video_analysis",
+        session_service=session_service
+    )
+
+    threat_runner = Runner(
+        agent=threat_classifier,
+        app_name="threat_classification",
+        session_service=session_service
+    )
+    return video_runner, threat_runner
+
+
+def find_video_files(video_directory: str) -> List[pathlib.Path]:
+    """List the supported video files in a directory, sorted by name"""
+    video_path = pathlib.Path(video_directory)
+    return sorted(path for path in video_path.iterdir() if path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS) if video_path.is_dir() else []
+
+
+async def process_videos_async(video_directory: str = "videos", output_file: str = "src/results/video_analysis_results.json", concurrency: int = BATCH_CONCURRENCY, extract_workers: int = EXTRACT_WORKERS, use_result_cache: bool = RESULT_CACHE_ENABLED, use_result_store: bool = RESULT_STORE_ENABLED, metrics_file: Optional[str] = METRICS_JSON_FILE):
+    """
+    Process all videos in the specified directory with enhanced error handling and proper workflow
+
+    Runs as a two-stage pipeline: a pool of `extract_workers` processes
+    decodes frames for upcoming videos while `concurrency` async workers run
+    the LLM analysis. Each video still runs its summarize→classify steps in
+    order, and results are reported in file-name order regardless of
+    completion order. With extract_workers=0 extraction runs on a thread.
+
+    Unchanged videos already analyzed with the same model, prompts and
+    sampling parameters are answered from the persistent result cache.
+
+    An output_file ending in `.jsonl` streams one record per finished video
+    and, on restart, skips videos already recorded there; the return value is
+    then the processing summary rather than every result.
+
+    Each result is also appended as a typed row to the Parquet results
+    store (see result_store.py) for querying.
+
+    Run metrics are written to metrics_file and a .prom file next to it;
+    None skips the export.
+    """
+
+    # Initialize session service
+    session_service = InMemorySessionService()
+    video_runner, threat_runner = _create_runners(session_service)
+
+    # Find all video files
+    video_files = find_video_files(video_directory)
+
+    if not video_files:
+        print(f"No video files found in {video_directory}")
+        return {}
+
+    writer = open_result_writer(output_file)
+    token_ledger.reset()
+    metrics.reset()
+    if writer.completed:
+        video_files = [video_file for video_file in video_files if video_file.name not in writer.completed]
+        print(f"⏭️ Resuming: {len(writer.completed)} videos already in {output_file}")
+
+    concurrency = max(1, concurrency)
+    print(f"⚙️ Processing {len(video_files)} videos with concurrency {concurrency}, {extract_workers} extraction workers")
+
+    # Bounded hand-off between the decode and LLM stages provides backpressure
+    queue = asyncio.Queue(maxsize=max(1, EXTRACT_PREFETCH))
+    result_cache = ResultCache() if use_result_cache else None
+    result_store = open_result_store() if use_result_store else None
+
+    async def worker() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            i, video_file, frame_future, content_hash, cached_record = item
+            print(f"\nProcessing {i}/{len(video_files)}: {video_file.name}")
+            record = await _finish_video(
+                video_file, frame_future, content_hash, cached_record,
+                session_service, video_runner, threat_runner, result_cache
+            )
+            writer.write(video_file.name, record)
+            if result_store is not None:
+                result_store.add(ResultRecord.from_record(video_file.name, record, camera_name(video_file)))
+
+    executor = ProcessPoolExecutor(max_workers=extract_workers) if extract_workers > 0 else None
+    try:
+        await asyncio.gather(
+            _produce_frames(video_files, queue, executor, concurrency, result_cache),
+            *(worker() for _ in range(concurrency))
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        writer.close()
+        if result_store is not None:
+            result_store.close()
+
+    summary = writer.summary.as_dict()
+
     print(f"\n📄 Results saved to: {output_file}")
     print(f"📈 Processing Summary:")
-    print(f"   • Total Videos: {total_videos}")
-    print(f"   • Successful: {successful_analyses}")
-    print(f"   • Failed: {failed_analyses}")
-    print(f"   • Success Rate: {summary['processing_summary']['success_rate']}")
-    
-    return results
-
-def process_videos(video_directory: str = "videos", output_file: str = "src/results/video_analysis_results.json"):
+    print(f"   • Total Videos: {summary['total_videos']}")
+    print(f"   • Successful: {summary['successful_analyses']}")
+    print(f"   • Failed: {summary['failed_analyses']}")
+    print(f"   • Success Rate: {summary['success_rate']}")
+    cache_stats = frame_cache.stats()
+    print(f"   • Frame Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+    print(f"   • Tokens: {summary['total_tokens']} over {summary['model_calls']} model calls")
+    print(f"   • Rate Limiter: {rate_limiter.waits} waits, {rate_limiter.waited_seconds:.1f}s total")
+    if result_cache is not None:
+        result_stats = result_cache.stats()
+        print(f"   • Result Cache: {result_stats['run_hits']} hits / {result_stats['run_misses']} misses, {result_stats['run_near_duplicate_hits']} near duplicates ({result_stats['entries']} stored)")
+        result_cache.close()
+    if result_store is not None:
+        print(f"   • Results Store: {result_store.rows_written} rows written to {result_store.path}")
+    if CASCADE_ENABLED:
+        tiers = cascade_stats()
+        print(f"   • Cascade: {sum(tiers['escalations'].values()):g} of {sum(tiers['videos'].values()):g} clips escalated to high resolution, "
+              f"{tiers['tokens']['1']:g} tier 1 / {tiers['tokens']['2']:g} tier 2 tokens")
+
+    if metrics_file is not None:
+        json_path, prometheus_path = metrics_paths(metrics_file)
+        metrics.export(json_path, prometheus_path)
+        print(f"📊 Metrics written to {json_path} and {prometheus_path}")
+
+    return writer.results()
+
+def process_videos(video_directory: str = "videos", output_file: str = "src/results/video_analysis_results.json", concurrency: int = BATCH_CONCURRENCY, extract_workers: int = EXTRACT_WORKERS, use_result_cache: bool = RESULT_CACHE_ENABLED, use_result_store: bool = RESULT_STORE_ENABLED, metrics_file: Optional[str] = METRICS_JSON_FILE):
     """
     Synchronous wrapper for async function with enhanced error handling
     """
-    if not GOOGLE_API_KEY:
+    if not GOOGLE_API_KEY and requires_api_key():
         print("❌ ERROR: GOOGLE_API_KEY not found in .env file")
         print("🔧 Please add your Google AI API key to the .env file")
         return {}
-    
+
     try:
-        return asyncio.run(process_videos_async(video_directory, output_file))
+        return asyncio.run(process_videos_async(video_directory, output_file, concurrency, extract_workers, use_result_cache, use_result_store, metrics_file))
     except KeyboardInterrupt:
         print("\n⏹️ Processing interrupted by user")
         return {}
@@ -302,9 +689,9 @@ def process_videos(video_directory: str = "videos", output_file: str = "src/resu
 if __name__ == "__main__":
     print("🚀 Starting Video Surveillance Analysis System...")
     print("=" * 60)
-    
+
     results = process_videos()
-    
+
     if results:
         print("\n🎉 Video surveillance analysis completed!")
     else:
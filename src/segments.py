@@ -0,0 +1,196 @@
+"""
+Segmented analysis of long videos
+
+A recording longer than LONG_VIDEO_MIN_SECONDS is split into consecutive
+windows of SEGMENT_WINDOW_SECONDS. Each window contributes SEGMENT_FRAMES
+frames, sent as inline image parts to the summarizer, and up to
+SEGMENT_CONCURRENCY windows are in flight at once, so the wall time of a
+long recording approaches that of a single window. The per-window reports
+are merged into one chronological timeline. The highest-risk window's
+report closes the merged text, so the classification step scores the
+video by its worst moment.
+
+Each window is its own token-budget scope: VIDEO_TOKEN_BUDGET applies per
+window rather than to the whole recording, whose windows together would
+exhaust it. The windows' usage is added to the video's once they finish.
+"""
+
+import asyncio
+import pathlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.runners import Runner
+from google.genai import types
+
+from .agents.threat_classifier import classify_risk_score, parse_risk_score
+from .agents.video_summarizer import inline_video_summarizer
+from .metrics import metrics
+from .sessions import agent_session
+from .token_accounting import token_ledger
+from .tools.phash import hash_and_dedupe
+from .tools.video_loader import encode_frame, frame_metadata, read_video_frames
+from .settings import (
+    LONG_VIDEO_ENABLED,
+    LONG_VIDEO_MIN_SECONDS,
+    SEGMENT_WINDOW_SECONDS,
+    SEGMENT_MAX_WINDOWS,
+    SEGMENT_FRAMES,
+    SEGMENT_CONCURRENCY,
+    INLINE_FRAME_WIDTH,
+    INLINE_FRAME_HEIGHT,
+    INLINE_JPEG_QUALITY,
+)
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def video_duration(frame_result: Dict[str, Any]) -> Optional[float]:
+    """Length in seconds of the video an extraction result came from, if known"""
+    fps = frame_result.get("fps") or 0
+    total_frames = frame_result.get("total_frames") or 0
+    return total_frames / fps if fps > 0 and total_frames > 0 else None
+
+
+def is_long_video(frame_result: Dict[str, Any]) -> bool:
+    duration = video_duration(frame_result)
+    return LONG_VIDEO_ENABLED and duration is not None and duration > LONG_VIDEO_MIN_SECONDS
+
+
+def plan_windows(total_frames: int, fps: float, window_seconds: float = SEGMENT_WINDOW_SECONDS, max_windows: int = SEGMENT_MAX_WINDOWS) -> List[Tuple[int, int]]:
+    """
+    Split [0, total_frames) into consecutive (start, end) frame ranges
+
+    Windows are window_seconds long; when that would make more than
+    max_windows of them, they are widened so max_windows cover the video.
+    """
+    if total_frames <= 0:
+        return []
+    window_frames = max(1, int(round(window_seconds * fps))) if fps > 0 else total_frames
+    count = -(-total_frames // window_frames)
+    if count > max_windows:
+        count = max_windows
+        window_frames = -(-total_frames // count)
+    return [(start, min(start + window_frames, total_frames)) for start in range(0, total_frames, window_frames)]
+
+
+def extract_window_frames(video_path: str, start_frame: int, end_frame: int, num_frames: int = SEGMENT_FRAMES) -> Dict[str, Any]:
+    """
+    Sample num_frames frames evenly from one window and encode them as JPEG bytes
+
+    Windows are always sampled uniformly (seeking straight into the
+    window); keyframe scoring would have to decode the whole recording.
+    Near-duplicate frames are dropped as in select_frames.
+    """
+    decoded = read_video_frames(video_path, num_frames, start_frame, end_frame)
+    if "error" in decoded:
+        return decoded
+    decoded = hash_and_dedupe(decoded)
+    if not decoded["frames"]:
+        return {"error": f"No frames could be extracted between frames {start_frame} and {end_frame}"}
+    try:
+        frames = [encode_frame(frame, INLINE_FRAME_WIDTH, INLINE_FRAME_HEIGHT, INLINE_JPEG_QUALITY) for _, frame in decoded["frames"]]
+    except Exception as e:
+        return {"error": f"Error processing video frames: {str(e)}"}
+    return {"frames": frames, **frame_metadata(decoded)}
+
+
+def _window_message(video_file: pathlib.Path, position: int, count: int, window: Dict[str, Any], frame_result: Dict[str, Any]) -> types.Content:
+    parts = [types.Part.from_text(
+        text=f"Analyze these {len(frame_result['frames'])} frames from {video_file.name} for surveillance threats. "
+             f"They cover window {position + 1} of {count}, from {window['start']} to {window['end']}."
+    )]
+    for jpeg, seconds in zip(frame_result["frames"], frame_result["frame_timestamps"]):
+        parts.append(types.Part.from_text(text=f"Frame at {format_timestamp(seconds)}:"))
+        parts.append(types.Part.from_bytes(data=jpeg, mime_type="image/jpeg"))
+    return types.Content(role="user", parts=parts)
+
+
+async def _analyze_window(video_file: pathlib.Path, position: int, count: int, frame_range: Tuple[int, int], fps: float, runner: Runner, session_service, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    from .run_batch import _run_agent_with_retries
+
+    start_frame, end_frame = frame_range
+    window = {
+        "window": position + 1,
+        "start": format_timestamp(start_frame / fps),
+        "end": format_timestamp(end_frame / fps),
+        "start_seconds": round(start_frame / fps, 2),
+        "end_seconds": round(end_frame / fps, 2),
+    }
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        with metrics.span("window_extract"):
+            frame_result = await loop.run_in_executor(None, extract_window_frames, str(video_file), start_frame, end_frame)
+        if "error" in frame_result:
+            print(f"❌ Window {position + 1}/{count} extraction failed: {frame_result['error']}")
+            return {**window, "status": "error", "error": frame_result["error"]}
+
+        window_key = f"{token_ledger.current() or video_file.name}#window{position + 1}"
+        async with agent_session(session_service, "segment_analysis", "segment", f"{video_file.stem}_{position}") as session:
+            print(f"🎞️ Analyzing window {position + 1}/{count} ({window['start']}-{window['end']})")
+            try:
+                with token_ledger.track(window_key), metrics.span("llm_window_summarize"):
+                    summary = await _run_agent_with_retries(
+                        runner, session.id, _window_message(video_file, position, count, window, frame_result), "Window analysis", separator="\n"
+                    )
+            finally:
+                token_ledger.absorb(token_ledger.finish_video(window_key))
+
+    risk_score = parse_risk_score(summary) if summary.strip() else None
+    if risk_score is None:
+        return {**window, "status": "error", "error": "No RISK_SCORE in window analysis", "summary": summary.strip()}
+    return {**window, "status": "ok", "risk_score": risk_score, "classification": classify_risk_score(risk_score), "summary": summary.strip()}
+
+
+def merge_timeline(video_file: pathlib.Path, windows: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Combine per-window reports into one chronological report
+
+    Returns None when no window produced a score. The highest-risk window is
+    marked in the timeline and its full report is placed last, so its
+    RISK_SCORE is the one the classifier reads.
+    """
+    scored = [window for window in windows if window["status"] == "ok"]
+    if not scored:
+        return None
+    peak = max(scored, key=lambda window: window["risk_score"])
+
+    lines = [f"LONG VIDEO TIMELINE for {video_file.name} ({len(windows)} windows):"]
+    for window in windows:
+        span = f"[{window['start']}-{window['end']}]"
+        if window["status"] != "ok":
+            lines.append(f"{span} analysis failed: {window['error']}")
+            continue
+        score = int(window["risk_score"]) if float(window["risk_score"]).is_integer() else window["risk_score"]
+        marker = "  <== HIGHEST RISK" if window is peak else ""
+        lines.append(f"{span} risk {score} ({window['classification']}){marker}")
+
+    return "\n".join(lines) + f"\n\nHIGHEST RISK WINDOW {peak['start']}-{peak['end']}:\n{peak['summary']}"
+
+
+async def analyze_long_video(video_file: pathlib.Path, frame_result: Dict[str, Any], session_service) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Summarize a long video window by window
+
+    Returns the merged report (None if every window failed) and the
+    per-window timeline entries.
+    """
+    fps = frame_result["fps"]
+    ranges = plan_windows(frame_result["total_frames"], fps)
+    print(f"🧩 Long video ({format_timestamp(video_duration(frame_result))}): analyzing {len(ranges)} windows, {SEGMENT_CONCURRENCY} at a time")
+
+    runner = Runner(agent=inline_video_summarizer, app_name="segment_analysis", session_service=session_service)
+    semaphore = asyncio.Semaphore(max(1, SEGMENT_CONCURRENCY))
+    windows = await asyncio.gather(*(
+        _analyze_window(video_file, position, len(ranges), frame_range, fps, runner, session_service, semaphore)
+        for position, frame_range in enumerate(ranges)
+    ))
+    metrics.inc("long_video_windows_total", len(windows))
+    failed = sum(window["status"] != "ok" for window in windows)
+    if failed:
+        print(f"⚠️ {failed} of {len(windows)} windows of {video_file.name} failed; the timeline covers the rest")
+        metrics.inc("long_video_window_failures_total", failed)
+    return merge_timeline(video_file, windows), list(windows)
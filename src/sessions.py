@@ -0,0 +1,36 @@
+"""
+Agent session lifecycle
+
+Each agent turn runs in its own short-lived session. Ids combine a readable
+prefix with a random suffix, so two videos with the same file stem (e.g.
+cam1/clip.mp4 and cam2/clip.mp4 analyzed in one run) never share a history.
+The session is deleted from the service when the turn ends, together with
+its events and any frame payloads they carry.
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from .settings import KEEP_SESSIONS
+
+USER_ID = "surveillance_user"
+
+
+def session_id(prefix: str, key: str) -> str:
+    return f"{prefix}_{key}_{uuid.uuid4().hex[:8]}"
+
+
+@asynccontextmanager
+async def agent_session(session_service, app_name: str, prefix: str, key: str, keep: Optional[bool] = None):
+    """Create a fresh session for one agent turn and delete it afterwards (unless keep, default KEEP_SESSIONS)"""
+    session = await session_service.create_session(
+        app_name=app_name,
+        user_id=USER_ID,
+        session_id=session_id(prefix, key)
+    )
+    try:
+        yield session
+    finally:
+        if not (KEEP_SESSIONS if keep is None else keep):
+            await session_service.delete_session(app_name=app_name, user_id=USER_ID, session_id=session.id)
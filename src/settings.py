@@ -7,6 +7,200 @@ load_dotenv()
 # Configuration
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 MODEL_NAME = "gemini-1.5-flash"
-TOKEN_LIMIT = 12000  # Free tier safety limit
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")  # "gemini" or "fake" (local stand-in, see llm_backend.py)
+TOKEN_LIMIT = 12000  # Free tier safety limit (per model request)
 FRAMES_PER_PROMPT = 10  # Sample every 10th frame
 MAX_TOKENS = 500
+
+# In-process cache of extracted frames shared by run_batch and VideoFrameTool
+FRAME_CACHE_MAX_ENTRIES = 64
+FRAME_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 32 MB of encoded frames
+
+# Number of videos analyzed at once by process_videos
+BATCH_CONCURRENCY = 4
+
+# Agent sessions are created with a unique id for each agent turn and deleted
+# as soon as the turn ends, so a batch holds only the in-flight sessions (and
+# their frame payloads) in memory. KEEP_SESSIONS retains them for debugging;
+# memory then grows with every video
+KEEP_SESSIONS = False
+
+# Frame extraction pipeline: worker processes decoding ahead of the LLM stage
+# and how many extracted videos may wait for an LLM worker (0 workers = thread)
+EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+EXTRACT_PREFETCH = 8
+
+# Classify from the summary's RISK_SCORE locally and only call the
+# ThreatClassifier agent when parsing fails or a special rule applies
+LOCAL_CLASSIFIER_ENABLED = True
+
+# Persistent cache of analysis results keyed by video content + model/prompts
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_PATH = "src/results/result_cache.sqlite3"
+
+# Columnar results store: each result is also written as a typed row to
+# Parquet part files under RESULT_STORE_PATH (needs pyarrow), flushed every
+# RESULT_STORE_FLUSH_ROWS rows or RESULT_STORE_FLUSH_SECONDS, and queried
+# with result_store.query_results
+RESULT_STORE_ENABLED = True
+RESULT_STORE_PATH = "src/results/results_store"
+RESULT_STORE_FLUSH_ROWS = 1000
+RESULT_STORE_FLUSH_SECONDS = 60.0
+
+# Watch-folder daemon: results file, directory poll interval when inotify is
+# unavailable, and how long a file must stay unchanged before it is analyzed
+WATCH_OUTPUT_FILE = "src/results/watch_results.jsonl"
+WATCH_POLL_INTERVAL = 1.0
+WATCH_SETTLE_SECONDS = 2.0
+
+# Frame decoding backend: "opencv" (cv2.VideoCapture) or "pyav" (FFmpeg via the
+# optional `av` package; falls back to OpenCV when it is not installed). PyAV
+# decodes on PYAV_THREADS threads (0 = one per core); with PYAV_KEYFRAMES_ONLY
+# it answers each sampled position with the nearest preceding keyframe and
+# skips non-key frames. Its frames are scaled to at most DECODE_MAX_WIDTH
+# while being converted (decoded at reduced size where the codec supports it)
+DECODER_BACKEND = os.getenv("DECODER_BACKEND", "opencv")
+PYAV_THREADS = 0
+PYAV_KEYFRAMES_ONLY = True
+DECODE_MAX_WIDTH = 640
+
+# How frames sent to the model are chosen: "uniform" seeks to evenly spaced
+# frames (cheapest), "keyframe" scores ~KEYFRAME_ANALYSIS_FPS frames per second
+# by frame differencing in one pass of the DECODER_BACKEND decoder and sends
+# the most distinct ones
+FRAME_SELECTION = "uniform"
+KEYFRAME_ANALYSIS_FPS = 5.0
+
+# Perceptual hashing of the sampled frames (FRAME_HASH = "dhash" or "phash",
+# 64 bits each, plus an 80x60 grayscale thumbnail). A frame is dropped before
+# sending only when its hash is within FRAME_DEDUP_MAX_DISTANCE bits of the
+# last kept frame's AND no thumbnail pixel differs by more than
+# FRAME_DEDUP_MAX_PIXEL_DIFF grey levels; the hash alone misses a small figure
+# entering a static scene. With CLIP_DEDUP_ENABLED, a clip whose frames all
+# match an analyzed clip in the result cache the same way (same frame count,
+# durations within CLIP_DEDUP_DURATION_TOLERANCE) reuses that analysis,
+# linked through "duplicate_of", without calling the model. It is off by
+# default: a reused result is never looked at by the model
+FRAME_HASH = "dhash"
+FRAME_DEDUP_ENABLED = True
+FRAME_DEDUP_MAX_DISTANCE = 0
+FRAME_DEDUP_MAX_PIXEL_DIFF = 12
+CLIP_DEDUP_ENABLED = False
+CLIP_DEDUP_MAX_DISTANCE = 4
+CLIP_DEDUP_MAX_PIXEL_DIFF = 16
+CLIP_DEDUP_DURATION_TOLERANCE = 0.05
+
+# How frames reach the summarizer: "tool" lets the agent call
+# extract_video_frames and receive base64 JPEGs in the function response;
+# "inline" attaches the JPEG bytes as image parts on the user message, which
+# skips the tool round trip and the base64 overhead; "mosaic" tiles
+# MOSAIC_FRAMES frames into one image and attaches only that. Inline images are
+# billed at a flat IMAGE_TOKENS each, so they are sent larger than the tool's 96x96
+FRAME_DELIVERY = "tool"
+INLINE_MAX_FRAMES = 4
+INLINE_FRAME_WIDTH = 384
+INLINE_FRAME_HEIGHT = 384
+INLINE_JPEG_QUALITY = 70
+
+# Analysis engine: "agents" runs the VideoSummarizer and then the
+# ThreatClassifier (when local classification cannot decide); "structured"
+# sends the pre-extracted frames with one combined prompt and a JSON response
+# schema, so summary, scores and classification come back from a single call.
+# The structured engine needs the frames on the message, so it treats "tool"
+# FRAME_DELIVERY as "inline"
+ANALYSIS_ENGINE = os.getenv("ANALYSIS_ENGINE", "agents")
+
+# Cascaded resolution: every clip is first analyzed from the cheap frames of
+# FRAME_DELIVERY (two 96x96 JPEGs at quality 20 in "tool" mode). When that
+# tier reports a RISK_SCORE of at least CASCADE_ESCALATE_MIN_RISK (Arrest and
+# above) or no score that parses, the clip is analyzed again from
+# CASCADE_FRAMES inline frames of CASCADE_FRAME_WIDTH x CASCADE_FRAME_HEIGHT
+# at CASCADE_JPEG_QUALITY, and that report replaces the first
+CASCADE_ENABLED = True
+CASCADE_ESCALATE_MIN_RISK = 100
+CASCADE_FRAMES = 6
+CASCADE_FRAME_WIDTH = 768
+CASCADE_FRAME_HEIGHT = 768
+CASCADE_JPEG_QUALITY = 80
+
+# Mosaic grid: MOSAIC_FRAMES tiles, MOSAIC_COLUMNS per row, timestamps burned
+# into each tile's corner. 768x768 is still a single image tile for Gemini
+MOSAIC_FRAMES = 9
+MOSAIC_COLUMNS = 3
+MOSAIC_WIDTH = 768
+MOSAIC_HEIGHT = 768
+MOSAIC_JPEG_QUALITY = 70
+
+# Long videos: recordings longer than LONG_VIDEO_MIN_SECONDS are split into
+# SEGMENT_WINDOW_SECONDS windows (at most SEGMENT_MAX_WINDOWS, widened if
+# needed) of SEGMENT_FRAMES inline frames each, SEGMENT_CONCURRENCY analyzed
+# at a time, and merged into one timeline
+LONG_VIDEO_ENABLED = True
+LONG_VIDEO_MIN_SECONDS = 120
+SEGMENT_WINDOW_SECONDS = 60
+SEGMENT_MAX_WINDOWS = 30
+SEGMENT_FRAMES = 4
+SEGMENT_CONCURRENCY = 8
+
+# Live streams (python run.py --stream SOURCE): frames are sampled at
+# STREAM_SAMPLE_FPS, downscaled to the INLINE_* size and kept for
+# STREAM_BUFFER_SECONDS. Every STREAM_CADENCE_SECONDS the latest
+# STREAM_WINDOW_SECONDS are analyzed from STREAM_FRAMES frames. At most
+# STREAM_MAX_PENDING windows wait for the model (older ones are dropped), and
+# a window is dropped unanalyzed once it is STREAM_MAX_LAG_SECONDS old. Each
+# window is at least one request, so a stream uses 60 / STREAM_CADENCE_SECONDS
+# requests/min of RATE_LIMIT_RPM: 12 of the 15 at the default 5s cadence,
+# which leaves little for a second stream or batch work, so windows are
+# dropped when they share the limit. Raise the cadence for several streams;
+# stream mode warns when one stream alone needs more than the limit
+STREAM_OUTPUT_FILE = "src/results/stream_results.jsonl"
+STREAM_SAMPLE_FPS = 2.0
+STREAM_BUFFER_SECONDS = 60
+STREAM_WINDOW_SECONDS = 10
+STREAM_CADENCE_SECONDS = 5
+STREAM_FRAMES = 4
+STREAM_CONCURRENCY = 2
+STREAM_MAX_PENDING = 2
+STREAM_MAX_LAG_SECONDS = 20
+STREAM_RECONNECT_SECONDS = 5
+
+# Activity gate: clips whose motion score (largest mean pixel change between
+# about MOTION_GATE_SAMPLES evenly spaced thumbnails, taken in the same decode
+# as the delivered frames) is below the threshold get a "Normal / RISK_SCORE 1"
+# result without calling the agents
+MOTION_GATE_ENABLED = True
+MOTION_GATE_THRESHOLD = 1.5
+MOTION_GATE_SAMPLES = 24
+
+# Token budgets enforced by quota_guard (None = unlimited) and the flat cost
+# charged for each inline image part. Each window of a long video has its own
+# VIDEO_TOKEN_BUDGET (see segments.py)
+VIDEO_TOKEN_BUDGET = 30000
+RUN_TOKEN_BUDGET = None
+IMAGE_TOKENS = 258
+
+# Process-wide request/token rate limits shared by every agent runner (None =
+# unlimited), and the exponential backoff applied between retries. Turns that
+# end in a malformed function call or an empty or invalid reply did not hit a
+# quota, so they back off from the shorter RETRY_BACKOFF_BASE_SECONDS
+RATE_LIMIT_RPM = 15
+RATE_LIMIT_TPM = 1000000
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRY_BACKOFF_BASE_SECONDS = 0.5
+
+# Fake backend (MODEL_BACKEND = "fake"): per-call latency plus uniform jitter,
+# fraction of calls failing with a 429 / MALFORMED_FUNCTION_CALL, minimum
+# summary length in characters, and the seed for its random choices
+FAKE_LATENCY_SECONDS = 0.2
+FAKE_LATENCY_JITTER_SECONDS = 0.0
+FAKE_RATE_LIMIT_ERROR_RATE = 0.0
+FAKE_MALFORMED_CALL_RATE = 0.0
+FAKE_RESPONSE_CHARS = 0
+FAKE_SEED = 0
+
+# Metrics (stage timings, counters, histograms) written at the end of a run
+# and every METRICS_EXPORT_INTERVAL seconds in watch mode
+METRICS_JSON_FILE = "src/results/metrics.json"
+METRICS_PROMETHEUS_FILE = "src/results/metrics.prom"
+METRICS_EXPORT_INTERVAL = 60.0
@@ -0,0 +1,353 @@
+"""
+Live stream analysis with sliding windows
+
+A StreamSource reads a cv2.VideoCapture input (an RTSP/HTTP URL, or a local
+file replayed at its native frame rate for testing) on a background thread.
+It keeps the last STREAM_BUFFER_SECONDS of downscaled frames, sampled at
+STREAM_SAMPLE_FPS, in a ring buffer. Every STREAM_CADENCE_SECONDS the latest
+STREAM_WINDOW_SECONDS are handed to the summarizer/classifier agents as
+inline frames. When the model falls behind, stale windows are dropped rather
+than queued, so alerts stay within STREAM_MAX_LAG_SECONDS of the footage.
+
+Usage:
+    python run.py --stream SOURCE
+    python -m src.stream SOURCE
+"""
+
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import cv2
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from .agents.threat_classifier import threat_classifier
+from .agents.video_summarizer import inline_video_summarizer
+from .llm_backend import requires_api_key
+from .metrics import export_periodically, metrics, metrics_paths
+from .result_writer import JsonlResultWriter
+from .result_store import ResultRecord, flush_periodically, open_result_store
+from .segments import format_timestamp
+from .rate_limiter import rate_limiter
+from .sessions import agent_session
+from .token_accounting import token_ledger
+from .tools.decoders import _sample_frame_indices
+from .tools.video_loader import encode_frame
+from .settings import (
+    GOOGLE_API_KEY,
+    INLINE_FRAME_WIDTH,
+    INLINE_FRAME_HEIGHT,
+    INLINE_JPEG_QUALITY,
+    METRICS_EXPORT_INTERVAL,
+    METRICS_JSON_FILE,
+    RESULT_STORE_ENABLED,
+    STREAM_OUTPUT_FILE,
+    STREAM_SAMPLE_FPS,
+    STREAM_BUFFER_SECONDS,
+    STREAM_WINDOW_SECONDS,
+    STREAM_CADENCE_SECONDS,
+    STREAM_FRAMES,
+    STREAM_CONCURRENCY,
+    STREAM_MAX_PENDING,
+    STREAM_MAX_LAG_SECONDS,
+    STREAM_RECONNECT_SECONDS,
+)
+
+
+def is_stream_url(source: str) -> bool:
+    return "://" in source
+
+
+def stream_name(source: str) -> str:
+    """Short identifier for a source, used in session ids and result keys"""
+    if is_stream_url(source):
+        source = source.split("://", 1)[1].split("@")[-1]
+    else:
+        source = os.path.splitext(os.path.basename(source))[0]
+    return re.sub(r"\W+", "_", source).strip("_") or "stream"
+
+
+class FrameRingBuffer:
+    """Thread-safe ring buffer of (stream seconds, JPEG bytes) frames"""
+
+    def __init__(self, capacity: int):
+        self._frames: Deque[Tuple[float, bytes]] = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames)
+
+    def append(self, timestamp: float, frame: bytes) -> None:
+        with self._lock:
+            self._frames.append((timestamp, frame))
+
+    def window(self, start: float, end: float) -> List[Tuple[float, bytes]]:
+        """Frames captured in (start, end]"""
+        with self._lock:
+            return [(timestamp, frame) for timestamp, frame in self._frames if start < timestamp <= end]
+
+
+class StreamSource:
+    """
+    Capture a stream into a FrameRingBuffer on a background thread
+
+    Timestamps are seconds since start(). Only one frame per 1/sample_fps
+    seconds is retrieved and encoded; the rest are skipped with grab(). Live
+    streams are reopened after reconnect_seconds when they drop; a replayed
+    file ends the stream when it runs out.
+    """
+
+    def __init__(self, source: str, sample_fps: float = STREAM_SAMPLE_FPS, buffer_seconds: float = STREAM_BUFFER_SECONDS, replay: Optional[bool] = None, reconnect_seconds: float = STREAM_RECONNECT_SECONDS, clock=time.monotonic):
+        self.source = source
+        self.name = stream_name(source)
+        self.sample_interval = 1.0 / sample_fps
+        self.buffer = FrameRingBuffer(int(buffer_seconds * sample_fps) + 1)
+        self.replay = not is_stream_url(source) if replay is None else replay
+        self.reconnect_seconds = reconnect_seconds
+        self.finished = threading.Event()
+        self.error = None
+        self.frames_read = 0
+        self._clock = clock
+        self._started = None
+        self._next_sample = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"stream-{self.name}", daemon=True)
+
+    def now(self) -> float:
+        return self._clock() - self._started if self._started is not None else 0.0
+
+    def start(self) -> None:
+        self._started = self._clock()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                cap = cv2.VideoCapture(self.source)
+                if cap.isOpened():
+                    try:
+                        self._read(cap)
+                    finally:
+                        cap.release()
+                else:
+                    self.error = f"Could not open stream: {self.source}"
+                    print(f"❌ {self.error}")
+                if self.replay or self._stop.is_set():
+                    return
+                print(f"🔌 Stream {self.name} dropped, reconnecting in {self.reconnect_seconds}s")
+                metrics.inc("stream_reconnects_total")
+                self._stop.wait(self.reconnect_seconds)
+        finally:
+            self.finished.set()
+
+    def _read(self, cap) -> None:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        opened_at = self._clock()
+        index = 0
+        while not self._stop.is_set():
+            if self.replay and fps > 0:
+                # Hold each frame back until its presentation time
+                delay = opened_at + index / fps - self._clock()
+                if delay > 0:
+                    self._stop.wait(delay)
+            if not cap.grab():
+                return
+            index += 1
+            self.frames_read += 1
+            now = self.now()
+            if now < self._next_sample:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            self._next_sample = now + self.sample_interval
+            self.buffer.append(now, encode_frame(frame, INLINE_FRAME_WIDTH, INLINE_FRAME_HEIGHT, INLINE_JPEG_QUALITY))
+
+
+def _window_message(source: StreamSource, window: Dict[str, Any]) -> types.Content:
+    parts = [types.Part.from_text(
+        text=f"Analyze these {len(window['frames'])} frames from the live camera feed {source.name} for surveillance threats. "
+             f"They cover {window['start']} to {window['end']} of the stream."
+    )]
+    for seconds, jpeg in window["frames"]:
+        parts.append(types.Part.from_text(text=f"Frame at {format_timestamp(seconds)}:"))
+        parts.append(types.Part.from_bytes(data=jpeg, mime_type="image/jpeg"))
+    return types.Content(role="user", parts=parts)
+
+
+def take_window(source: StreamSource, number: int, window_seconds: float, num_frames: int) -> Optional[Dict[str, Any]]:
+    """Snapshot the latest window_seconds of the buffer, thinned to num_frames frames; None if empty"""
+    end = source.now()
+    frames = source.buffer.window(end - window_seconds, end)
+    if not frames:
+        return None
+    start = max(0.0, end - window_seconds)
+    return {
+        "window": number,
+        "start": format_timestamp(start),
+        "end": format_timestamp(end),
+        "start_seconds": round(start, 2),
+        "end_seconds": round(end, 2),
+        "captured_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "frames": [frames[index] for index in _sample_frame_indices(len(frames), num_frames)],
+    }
+
+
+async def _analyze_window(source: StreamSource, window: Dict[str, Any], session_service, stream_runner, threat_runner) -> Dict[str, Any]:
+    """Summarize and classify one window; the record has no alert fields set when the summary failed"""
+    from .run_batch import _classify_summary, _run_agent_with_retries
+
+    session_key = f"{source.name}_{window['window']}"
+    async with agent_session(session_service, "stream_analysis", "stream", session_key) as session:
+        print(f"🎞️ Analyzing {source.name} window {window['window']} ({window['start']}-{window['end']})")
+        with metrics.span("llm_stream_summarize"):
+            summary = await _run_agent_with_retries(
+                stream_runner, session.id, _window_message(source, window), "Stream analysis", separator="\n"
+            )
+
+    record = {key: value for key, value in window.items() if key != "frames"}
+    record["stream"] = source.name
+    if not summary.strip():
+        # No fallback score here: a failed window must not raise an alert
+        metrics.inc("fallbacks_total", stage="stream_summarize")
+        return {**record, "result": "", "risk_score": "Unknown", "classification": "Unknown", "status": "error"}
+
+    risk_score, threat_class, used_fallback = await _classify_summary(summary, session_key, session_service, threat_runner)
+    final_result = f"""=== VIDEO SURVEILLANCE ANALYSIS ===\n\n{summary}\n\n=== THREAT CLASSIFICATION ===\n\nRISK_SCORE: {risk_score}\nCLASSIFICATION: {threat_class}"""
+    return {
+        **record,
+        "result": final_result,
+        "risk_score": risk_score,
+        "classification": threat_class,
+        "status": "fallback" if used_fallback else "ok",
+    }
+
+
+async def analyze_stream_async(source: str, output_file: str = STREAM_OUTPUT_FILE, window_seconds: float = STREAM_WINDOW_SECONDS, cadence_seconds: float = STREAM_CADENCE_SECONDS, num_frames: int = STREAM_FRAMES, concurrency: int = STREAM_CONCURRENCY, max_pending: int = STREAM_MAX_PENDING, max_lag_seconds: float = STREAM_MAX_LAG_SECONDS, use_result_store: bool = RESULT_STORE_ENABLED, metrics_file: Optional[str] = METRICS_JSON_FILE, **source_options) -> Dict[str, Any]:
+    """
+    Analyze a stream window by window until it ends or the task is cancelled
+
+    A window is scheduled every cadence_seconds. At most max_pending windows
+    wait for a free worker; when a new one arrives the oldest waiting window
+    is dropped, and a worker discards any window older than max_lag_seconds.
+    Each analyzed window is appended to output_file as one JSONL record
+    (and to the Parquet results store, with the stream name as camera).
+    Metrics are exported to metrics_file (None skips the export).
+    Returns counts of scheduled, analyzed and dropped windows and alerts.
+    """
+    stream = StreamSource(source, **source_options)
+    session_service = InMemorySessionService()
+    stream_runner = Runner(agent=inline_video_summarizer, app_name="stream_analysis", session_service=session_service)
+    threat_runner = Runner(agent=threat_classifier, app_name="threat_classification", session_service=session_service)
+    writer = JsonlResultWriter(output_file)
+    result_store = open_result_store() if use_result_store else None
+    pending: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+    concurrency = max(1, concurrency)
+    stats = {"scheduled": 0, "analyzed": 0, "dropped": 0, "alerts": 0}
+
+    def drop(window: Dict[str, Any], reason: str) -> None:
+        print(f"⏭️ Dropping {stream.name} window {window['window']} ({window['start']}-{window['end']}): {reason}")
+        metrics.inc("stream_windows_dropped_total", reason=reason)
+        stats["dropped"] += 1
+
+    async def schedule() -> None:
+        next_at = cadence_seconds
+        while not stream.finished.is_set():
+            await asyncio.sleep(max(0.0, next_at - stream.now()))
+            while next_at <= stream.now():
+                next_at += cadence_seconds
+            window = take_window(stream, stats["scheduled"] + 1, window_seconds, num_frames)
+            if window is None:
+                continue
+            stats["scheduled"] += 1
+            if pending.full():
+                drop(pending.get_nowait(), "backlog")
+            pending.put_nowait(window)
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def worker() -> None:
+        while True:
+            window = await pending.get()
+            if window is None:
+                return
+            lag = stream.now() - window["end_seconds"]
+            if lag > max_lag_seconds:
+                drop(window, f"{lag:.1f}s behind")
+                continue
+            # The capture time has one-second resolution and a short cadence
+            # can schedule several windows within a second, so the window
+            # number keeps keys unique and the capture time across restarts
+            key = f"{stream.name}#{window['window']}@{window['captured_at']}"
+            with token_ledger.track(key), metrics.span("stream_window_total"):
+                record = await _analyze_window(stream, window, session_service, stream_runner, threat_runner)
+            record["tokens"] = token_ledger.finish_video(key)
+            latency = stream.now() - window["end_seconds"]
+            record["latency_seconds"] = round(latency, 2)
+            metrics.observe("stream_latency_seconds", latency)
+            metrics.inc("stream_windows_total", status=record["status"])
+            writer.write(key, record)
+            if result_store is not None:
+                result_store.add(ResultRecord.from_record(key, record, stream.name))
+            stats["analyzed"] += 1
+            if record["classification"] not in ("Normal", "Unknown"):
+                stats["alerts"] += 1
+                print(f"🚨 ALERT: {stream.name} {window['start']}-{window['end']} classified as {record['classification']} (RISK_SCORE {record['risk_score']})")
+            print(f"⏱️ {stream.name} window {window['window']} analyzed {latency:.1f}s after capture")
+
+    print(f"📡 Analyzing {stream.name}: {window_seconds}s windows every {cadence_seconds}s, {concurrency} at a time")
+    requests_per_minute = rate_limiter.requests_per_minute
+    if requests_per_minute and 60 / cadence_seconds > requests_per_minute:
+        print(f"⚠️ A window every {cadence_seconds}s needs {60 / cadence_seconds:g} requests/min but the rate limit is {requests_per_minute:g}; "
+              f"windows will be dropped (use a cadence of at least {60 / requests_per_minute:g}s)")
+    stream.start()
+    exporter = asyncio.ensure_future(export_periodically(metrics, METRICS_EXPORT_INTERVAL, metrics_file))
+    flusher = asyncio.ensure_future(flush_periodically(result_store))
+    try:
+        await asyncio.gather(schedule(), *(worker() for _ in range(concurrency)))
+    finally:
+        exporter.cancel()
+        flusher.cancel()
+        stream.stop()
+        writer.close()
+        if result_store is not None:
+            result_store.close()
+        if metrics_file is not None:
+            metrics.export(*metrics_paths(metrics_file))
+
+    print(f"📈 {stream.name}: {stats['analyzed']} windows analyzed, {stats['dropped']} dropped, {stats['alerts']} alerts")
+    return stats
+
+
+def analyze_stream(source: str, output_file: str = STREAM_OUTPUT_FILE, **kwargs) -> None:
+    """
+    Blocking entry point for stream mode; stops when the stream ends or on Ctrl-C
+    """
+    if not GOOGLE_API_KEY and requires_api_key():
+        print("❌ ERROR: GOOGLE_API_KEY not found in .env file")
+        print("🔧 Please add your Google AI API key to the .env file")
+        return
+
+    try:
+        asyncio.run(analyze_stream_async(source, output_file, **kwargs))
+    except KeyboardInterrupt:
+        print("\n⏹️ Stream mode stopped by user")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.stream SOURCE")
+        sys.exit(1)
+    analyze_stream(sys.argv[1])
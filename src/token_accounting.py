@@ -0,0 +1,176 @@
+"""
+Token accounting for model calls
+
+Requests are measured structurally: text parts by length, inline images at
+a fixed per-image cost, and function calls/responses by walking their values.
+Nothing is serialized, so the estimate costs next to nothing even when a
+request carries frame payloads. Actual usage reported by the model replaces
+the estimate once the response arrives.
+
+Usage is tracked per video (the video being processed in the current task,
+see TokenLedger.track) and per run, and checked against configurable budgets.
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .settings import IMAGE_TOKENS
+
+# Roughly four characters per token for English text and base64
+CHARS_PER_TOKEN = 4
+
+_current_video: contextvars.ContextVar = contextvars.ContextVar("current_video", default=None)
+_pending_estimate: contextvars.ContextVar = contextvars.ContextVar("pending_estimate", default=0)
+
+
+def _text_tokens(text: Optional[str]) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def _value_tokens(value: Any) -> int:
+    """Tokens for a function call argument or response value, walked without serializing"""
+    if isinstance(value, str):
+        return _text_tokens(value)
+    if isinstance(value, dict):
+        return sum(_text_tokens(str(key)) + _value_tokens(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_tokens(item) for item in value)
+    return 1
+
+
+def _part_tokens(part) -> int:
+    if part.text:
+        return _text_tokens(part.text)
+    if part.inline_data is not None:
+        mime_type = part.inline_data.mime_type or ""
+        if mime_type.startswith("image/"):
+            return IMAGE_TOKENS
+        return (len(part.inline_data.data or b"") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    if part.function_call is not None:
+        return _text_tokens(part.function_call.name) + _value_tokens(part.function_call.args or {})
+    if part.function_response is not None:
+        return _text_tokens(part.function_response.name) + _value_tokens(part.function_response.response or {})
+    return 0
+
+
+def _content_tokens(content) -> int:
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return _text_tokens(content)
+    return sum(_part_tokens(part) for part in (content.parts or []))
+
+
+def estimate_request_tokens(llm_request) -> int:
+    """Estimate the prompt tokens of an LlmRequest from its structure"""
+    tokens = sum(_content_tokens(content) for content in (llm_request.contents or []))
+    config = llm_request.config
+    if config is not None:
+        tokens += _content_tokens(config.system_instruction)
+        for tool in config.tools or []:
+            for declaration in getattr(tool, "function_declarations", None) or []:
+                tokens += _text_tokens(declaration.name) + _text_tokens(declaration.description)
+    return tokens
+
+
+class TokenLedger:
+    """
+    Cumulative token usage per video and per run
+
+    Each model call is charged its estimate up front; when the response
+    carries usage metadata the estimate is swapped for the reported total
+    (prompt plus output tokens).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._videos: Dict[str, Dict[str, int]] = {}
+        # Tokens absorbed from sub-scopes, reported with the video but not budgeted
+        self._absorbed: Dict[str, int] = {}
+        self._run = self.empty_usage()
+
+    @staticmethod
+    def empty_usage() -> Dict[str, int]:
+        return {"calls": 0, "estimated_prompt_tokens": 0, "tokens": 0}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._videos.clear()
+            self._absorbed.clear()
+            self._run = self.empty_usage()
+
+    @contextmanager
+    def track(self, video_name: str):
+        """Attribute model calls made in the current task to video_name"""
+        token = _current_video.set(video_name)
+        try:
+            yield
+        finally:
+            _current_video.reset(token)
+
+    def current(self) -> Optional[str]:
+        """The video model calls in the current task are attributed to, if any"""
+        return _current_video.get()
+
+    def absorb(self, usage: Dict[str, int]) -> None:
+        """
+        Add the usage of a finished sub-scope (see finish_video) to the current video
+
+        The run totals already include it. The sub-scope had a budget of its
+        own, so its tokens are reported with the video but do not count
+        against the video's budget in used().
+        """
+        video_name = _current_video.get()
+        if video_name is None:
+            return
+        with self._lock:
+            bucket = self._videos.setdefault(video_name, self.empty_usage())
+            for key, value in usage.items():
+                bucket[key] = bucket.get(key, 0) + value
+            self._absorbed[video_name] = self._absorbed.get(video_name, 0) + usage.get("tokens", 0)
+
+    def _buckets(self):
+        video_name = _current_video.get()
+        if video_name is None:
+            return [self._run]
+        return [self._run, self._videos.setdefault(video_name, self.empty_usage())]
+
+    def used(self) -> Dict[str, int]:
+        """Tokens used so far by the run and by the current video (excluding absorbed sub-scopes)"""
+        with self._lock:
+            video_name = _current_video.get()
+            video = self._videos.get(video_name, self.empty_usage())
+            return {"run": self._run["tokens"], "video": video["tokens"] - self._absorbed.get(video_name, 0)}
+
+    def charge_estimate(self, estimate: int) -> None:
+        with self._lock:
+            for bucket in self._buckets():
+                bucket["calls"] += 1
+                bucket["estimated_prompt_tokens"] += estimate
+                bucket["tokens"] += estimate
+        _pending_estimate.set(estimate)
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        """Replace the pending estimate for this task's last call with the reported usage"""
+        estimate = _pending_estimate.get()
+        _pending_estimate.set(0)
+        if actual_tokens is None:
+            return
+        with self._lock:
+            for bucket in self._buckets():
+                bucket["tokens"] += actual_tokens - estimate
+
+    def finish_video(self, video_name: str) -> Dict[str, int]:
+        """Return and forget the usage of one video"""
+        with self._lock:
+            self._absorbed.pop(video_name, None)
+            return self._videos.pop(video_name, self.empty_usage())
+
+    def run_usage(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._run)
+
+
+token_ledger = TokenLedger()
@@ -0,0 +1,384 @@
+"""
+Frame decoder backends
+
+Both backends answer the same read_frames() call: decode num_frames frames
+spread evenly over a frame range and return them as (index, BGR array)
+pairs with the stream's length and frame rate. scan_frames() streams about
+sample_fps frames per second of the whole video instead, for selection
+strategies (keyframe scoring) that have to look at the entire clip.
+
+OpenCVDecoder drives cv2.VideoCapture and decodes single-threaded at full
+resolution. PyAVDecoder uses FFmpeg through the optional `av` package. It
+decodes on several threads and, in keyframe-only mode, seeks to the keyframe
+nearest each target and tells the codec to skip every non-key frame. Frames
+are scaled down to DECODE_MAX_WIDTH while being converted to BGR, and codecs
+that support it decode at 1/2, 1/4 or 1/8 size outright. A handful of frames
+from H.264 footage therefore costs a few I-frame decodes, not a pass over
+the P/B frames at full resolution.
+"""
+
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+
+from ..settings import DECODER_BACKEND, PYAV_THREADS, PYAV_KEYFRAMES_ONLY, DECODE_MAX_WIDTH
+
+try:
+    import av
+    PYAV_AVAILABLE = True
+except ImportError:
+    av = None
+    PYAV_AVAILABLE = False
+
+DECODER_BACKENDS = ("opencv", "pyav")
+
+# Below this distance between targets it is cheaper to grab() through the
+# stream than to seek, since every seek restarts decoding at a keyframe
+MIN_SEEK_STRIDE = 30
+
+# FFmpeg decoders that implement the "lowres" option (max_lowres of 3 or more)
+LOWRES_CODECS = ("mjpeg", "jpeg2000", "mpeg1video", "mpeg2video", "mpeg4", "h263", "msmpeg4v3", "dvvideo")
+
+
+def _sample_frame_indices(total_frames: int, num_frames: int) -> List[int]:
+    """
+    Spread target frame indices evenly across the whole video
+
+    Each target sits in the middle of its segment so the first and last
+    frames (often black or a fade) are never picked. Integer arithmetic keeps
+    the targets exact, so the targets for num_frames are a subset of those for
+    any odd multiple of it.
+    """
+    if total_frames <= 0 or num_frames <= 0:
+        return []
+    num_frames = min(num_frames, total_frames)
+    return [min(total_frames - 1, total_frames * (2 * i + 1) // (2 * num_frames)) for i in range(num_frames)]
+
+
+def _range_indices(total_frames: int, num_frames: int, start_frame: int, end_frame: Optional[int]) -> Tuple[int, int, List[int]]:
+    """Clamp [start_frame, end_frame) to the video and spread num_frames targets over it"""
+    end_frame = total_frames if end_frame is None else min(end_frame, total_frames)
+    start_frame = max(0, min(start_frame, end_frame))
+    indices = [start_frame + index for index in _sample_frame_indices(end_frame - start_frame, num_frames)]
+    return start_frame, end_frame, indices
+
+
+def _count_frames(video_path: str) -> int:
+    """Count frames by grabbing through the stream (used when the container reports no length)"""
+    cap = cv2.VideoCapture(video_path)
+    count = 0
+    try:
+        while cap.grab():
+            count += 1
+    finally:
+        cap.release()
+    return count
+
+
+def _scan_stride(fps: float, sample_fps: float) -> int:
+    """Every how many frames to keep so about sample_fps frames per second are scanned"""
+    return max(1, int(round(fps / sample_fps))) if fps > 0 and sample_fps > 0 else 1
+
+
+def _read_frames_by_seek(cap, indices: List[int]) -> List[Tuple[int, Any]]:
+    """
+    Jump straight to each target index
+
+    Returns an empty list as soon as the container reports a position other
+    than the one requested, so the caller can fall back to grabbing.
+    """
+    frames = []
+    for index in indices:
+        if not cap.set(cv2.CAP_PROP_POS_FRAMES, index):
+            return []
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != index:
+            return []
+        ret, frame = cap.read()
+        if not ret:
+            return []
+        frames.append((index, frame))
+    return frames
+
+
+def _read_frames_by_grab(cap, indices: List[int]) -> List[Tuple[int, Any]]:
+    """
+    Walk the stream with grab() and only retrieve() the target frames
+
+    grab() advances without the colour conversion and copy done by
+    retrieve(), so skipped frames cost far less than cap.read().
+    """
+    frames = []
+    targets = iter(indices)
+    target = next(targets, None)
+    position = 0
+    while target is not None:
+        if not cap.grab():
+            break
+        if position == target:
+            ret, frame = cap.retrieve()
+            if ret:
+                frames.append((position, frame))
+            target = next(targets, None)
+        position += 1
+    return frames
+
+
+class OpenCVDecoder:
+    """cv2.VideoCapture, seeking to far-apart targets and grab()bing to near ones"""
+
+    name = "opencv"
+
+    def read_frames(self, video_path: str, num_frames: int, start_frame: int = 0, end_frame: Optional[int] = None) -> Dict[str, Any]:
+        if not os.path.exists(video_path):
+            return {"error": f"Video file not found: {video_path}"}
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return {"error": f"Could not open video: {video_path}"}
+
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+            if total_frames <= 0:
+                # Some containers (raw streams, broken indexes) report no length
+                total_frames = _count_frames(video_path)
+                cap.release()
+                cap = cv2.VideoCapture(video_path)
+
+            start_frame, end_frame, indices = _range_indices(total_frames, num_frames, start_frame, end_frame)
+            stride = (end_frame - start_frame) / len(indices) if indices else 0
+
+            frames = []
+            method = "grab"
+            # A range that starts deep into the video is worth seeking to even for one frame
+            if (len(indices) > 1 or start_frame >= MIN_SEEK_STRIDE) and stride >= MIN_SEEK_STRIDE:
+                frames = _read_frames_by_seek(cap, indices)
+                method = "seek"
+                if not frames:
+                    # Reopen so grabbing starts from the first frame again
+                    cap.release()
+                    cap = cv2.VideoCapture(video_path)
+                    method = "grab"
+
+            if method == "grab":
+                frames = _read_frames_by_grab(cap, indices)
+
+        except Exception as e:
+            return {"error": f"Error processing video frames: {str(e)}"}
+
+        finally:
+            cap.release()
+
+        return {
+            "frames": frames,
+            "total_frames": total_frames,
+            "fps": fps,
+            "sampling_method": method,
+        }
+
+
+    def scan_frames(self, video_path: str, sample_fps: float) -> Dict[str, Any]:
+        """
+        Stream about sample_fps frames per second of the whole video
+
+        Every frame is grab()bed and only the kept ones are retrieve()d.
+        Returns the stream's "total_frames" and "fps" with a "frames"
+        iterator of (index, BGR array) pairs that releases the capture when
+        exhausted or closed, or an "error" entry.
+        """
+        if not os.path.exists(video_path):
+            return {"error": f"Video file not found: {video_path}"}
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return {"error": f"Could not open video: {video_path}"}
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        if total_frames <= 0:
+            total_frames = _count_frames(video_path)
+        stride = _scan_stride(fps, sample_fps)
+
+        def frames() -> Iterator[Tuple[int, Any]]:
+            try:
+                position = 0
+                while cap.grab():
+                    if position % stride == 0:
+                        ret, frame = cap.retrieve()
+                        if ret:
+                            yield position, frame
+                    position += 1
+            finally:
+                cap.release()
+
+        return {"frames": frames(), "total_frames": total_frames, "fps": fps}
+
+
+class PyAVDecoder:
+    """
+    FFmpeg through PyAV with threaded, optionally keyframe-only decoding
+
+    In keyframe-only mode each target is answered with the keyframe at or
+    before it. When two targets share a keyframe (GOPs longer than the
+    sampling stride), the later one is decoded up to its exact frame instead,
+    so the requested number of distinct frames is still returned.
+    """
+
+    name = "pyav"
+
+    def __init__(self, threads: int = PYAV_THREADS, keyframes_only: bool = PYAV_KEYFRAMES_ONLY, max_width: int = DECODE_MAX_WIDTH):
+        if not PYAV_AVAILABLE:
+            raise ImportError("PyAV is not installed; run `pip install av`")
+        self.threads = threads
+        self.keyframes_only = keyframes_only
+        self.max_width = max_width
+
+    def _request_lowres(self, codec_context) -> None:
+        """Ask codecs that support it to decode straight at 1/2, 1/4 or 1/8 size"""
+        width = codec_context.width
+        if not self.max_width or not width or codec_context.name not in LOWRES_CODECS:
+            return
+        level = 0
+        while level < 3 and width >> (level + 1) >= self.max_width:
+            level += 1
+        if level:
+            codec_context.options = {**codec_context.options, "lowres": str(level)}
+
+    def _to_bgr(self, frame):
+        if self.max_width and frame.width > self.max_width:
+            height = max(2, int(frame.height * self.max_width / frame.width) // 2 * 2)
+            return frame.to_ndarray(format="bgr24", width=self.max_width, height=height)
+        return frame.to_ndarray(format="bgr24")
+
+    def _frame_at(self, container, stream, index: int, fps: float, taken) -> Optional[Tuple[int, Any]]:
+        time_base = stream.time_base
+        origin = stream.start_time or 0
+        codec_context = stream.codec_context
+        container.seek(origin + int(index / fps / time_base), stream=stream, backward=True, any_frame=False)
+        codec_context.skip_frame = "NONKEY" if self.keyframes_only else "DEFAULT"
+        for frame in container.decode(stream):
+            if frame.pts is None:
+                continue
+            position = int(round(float((frame.pts - origin) * time_base) * fps))
+            if codec_context.skip_frame == "NONKEY":
+                if position not in taken:
+                    return position, self._to_bgr(frame)
+                # Keyframe already used by an earlier target; decode on to this one
+                codec_context.skip_frame = "DEFAULT"
+            if position >= index:
+                return position, self._to_bgr(frame)
+        return None
+
+    def _open_stream(self, container) -> Tuple[Any, float, int]:
+        """Set up threaded (and where possible reduced-size) decoding; returns (stream, fps, total_frames)"""
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        stream.thread_count = self.threads
+        self._request_lowres(stream.codec_context)
+
+        fps = float(stream.average_rate or stream.guessed_rate or 0)
+        total_frames = stream.frames
+        if total_frames <= 0 and fps > 0:
+            # Many containers (WebM, fragmented MP4) only know their duration
+            duration = float(stream.duration * stream.time_base) if stream.duration else (container.duration or 0) / av.time_base
+            total_frames = int(round(duration * fps))
+        if total_frames <= 0:
+            # Count packets rather than decoding when the container has no length
+            total_frames = sum(1 for packet in container.demux(stream) if packet.size)
+            container.seek(0)
+        return stream, fps, total_frames
+
+    def read_frames(self, video_path: str, num_frames: int, start_frame: int = 0, end_frame: Optional[int] = None) -> Dict[str, Any]:
+        if not os.path.exists(video_path):
+            return {"error": f"Video file not found: {video_path}"}
+
+        try:
+            container = av.open(video_path)
+        except Exception:
+            return {"error": f"Could not open video: {video_path}"}
+
+        try:
+            if not container.streams.video:
+                return {"error": f"Could not open video: {video_path}"}
+            stream, fps, total_frames = self._open_stream(container)
+
+            start_frame, end_frame, indices = _range_indices(total_frames, num_frames, start_frame, end_frame)
+            frames = []
+            if fps > 0:
+                taken = set()
+                for index in indices:
+                    picked = self._frame_at(container, stream, index, fps, taken)
+                    if picked is not None and picked[0] not in taken:
+                        taken.add(picked[0])
+                        frames.append(picked)
+            elif indices:
+                # Without a frame rate positions cannot be mapped to timestamps; decode in order
+                targets = set(indices)
+                for position, frame in enumerate(container.decode(stream)):
+                    if position in targets:
+                        frames.append((position, self._to_bgr(frame)))
+                    if position >= indices[-1]:
+                        break
+
+        except Exception as e:
+            return {"error": f"Error processing video frames: {str(e)}"}
+
+        finally:
+            container.close()
+
+        return {
+            "frames": sorted(frames, key=lambda item: item[0]),
+            "total_frames": total_frames,
+            "fps": fps,
+            "sampling_method": "pyav-keyframe" if self.keyframes_only else "pyav-seek",
+        }
+
+    def scan_frames(self, video_path: str, sample_fps: float) -> Dict[str, Any]:
+        """
+        Stream about sample_fps frames per second of the whole video
+
+        Decodes every frame (a scan has to see the motion between keyframes)
+        on PyAV's threads, converting only the kept ones, scaled to
+        max_width. Same result shape as OpenCVDecoder.scan_frames.
+        """
+        if not os.path.exists(video_path):
+            return {"error": f"Video file not found: {video_path}"}
+
+        try:
+            container = av.open(video_path)
+        except Exception:
+            return {"error": f"Could not open video: {video_path}"}
+
+        try:
+            if not container.streams.video:
+                container.close()
+                return {"error": f"Could not open video: {video_path}"}
+            stream, fps, total_frames = self._open_stream(container)
+        except Exception as e:
+            container.close()
+            return {"error": f"Error processing video frames: {str(e)}"}
+        stride = _scan_stride(fps, sample_fps)
+
+        def frames() -> Iterator[Tuple[int, Any]]:
+            try:
+                for position, frame in enumerate(container.decode(stream)):
+                    if position % stride == 0:
+                        yield position, self._to_bgr(frame)
+            finally:
+                container.close()
+
+        return {"frames": frames(), "total_frames": total_frames, "fps": fps}
+
+
+def create_decoder(backend: str = DECODER_BACKEND):
+    """The decoder for a DECODER_BACKEND name; "pyav" falls back to OpenCV when PyAV is missing"""
+    if backend == "opencv":
+        return OpenCVDecoder()
+    if backend == "pyav":
+        if PYAV_AVAILABLE:
+            return PyAVDecoder()
+        print("⚠️ DECODER_BACKEND is 'pyav' but PyAV is not installed (pip install av); decoding with OpenCV")
+        return OpenCVDecoder()
+    raise ValueError(f"Unknown DECODER_BACKEND {backend!r}; expected one of {DECODER_BACKENDS}")
@@ -0,0 +1,81 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def _result_size(result: Dict[str, Any]) -> int:
+    """Approximate memory held by an extraction result (dominated by the encoded frames)"""
+    return sum(len(frame) for frame in result.get("frames", ())) + 512
+
+
+class FrameCache:
+    """
+    Bounded LRU cache of frame extraction results
+
+    Entries are keyed by the file identity (path, mtime, size) plus the
+    sampling parameters, so a rewritten file never returns stale frames.
+    Both the entry count and the total encoded size are capped; the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(video_path: str, *sampling_params) -> Optional[Tuple]:
+        """Build a cache key for a video file, or None if the file cannot be stat'ed"""
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        return (os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size) + tuple(sampling_params)
+
+    def get(self, key: Optional[Tuple]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[0]
+        # Hand out a copy so callers cannot mutate the cached entry
+        return {**result, "frames": list(result["frames"])}
+
+    def put(self, key: Optional[Tuple], result: Dict[str, Any]) -> None:
+        if key is None or "error" in result:
+            return
+        size = _result_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = ({**result, "frames": list(result["frames"])}, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from .decoders import _sample_frame_indices, create_decoder
+
+# Frames are compared as small grayscale thumbnails; only differences in
+# layout and motion matter, not detail
+THUMBNAIL_SIZE = (64, 36)
+
+# Candidate frames are kept at most this wide to bound memory during the pass
+CANDIDATE_MAX_WIDTH = 640
+
+# Keep this many segment winners per requested frame before picking the top-N
+CANDIDATES_PER_FRAME = 4
+
+
+def _thumbnail(frame) -> np.ndarray:
+    small = cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+def _shrink(frame):
+    height, width = frame.shape[:2]
+    if width <= CANDIDATE_MAX_WIDTH:
+        return frame
+    scale = CANDIDATE_MAX_WIDTH / width
+    return cv2.resize(frame, (CANDIDATE_MAX_WIDTH, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+
+def score_motion(thumbnails: List[np.ndarray]) -> Dict[str, Any]:
+    """
+    Largest mean absolute difference between consecutive thumbnails
+
+    One vectorized pass over the stacked thumbnails; a single burst of
+    activity is enough to give the clip a high "motion_score".
+    """
+    if len(thumbnails) < 2:
+        return {"motion_score": 0.0, "motion_profile": []}
+    profile = np.abs(np.diff(np.stack(thumbnails), axis=0)).mean(axis=(1, 2))
+    return {
+        "motion_score": round(float(profile.max()), 3),
+        "motion_profile": [round(float(value), 2) for value in profile],
+    }
+
+
+def read_keyframes(video_path: str, num_frames: int, analysis_fps: float = 5.0, decoder=None, motion_samples: int = 0) -> Dict[str, Any]:
+    """
+    Pick the num_frames most distinct frames of a video in one streaming pass
+
+    The frames come from `decoder`'s scan_frames() (the configured
+    DECODER_BACKEND's decoder by default). About `analysis_fps` frames per
+    second are scored by the mean absolute difference of their
+    downscaled grayscale thumbnail against the previous scored frame. The
+    video is split into CANDIDATES_PER_FRAME * num_frames segments; the best
+    frame of each segment is kept, and the top num_frames of those are
+    returned in chronological order so picks do not cluster on one event.
+
+    Args:
+        video_path: Path to the video file
+        num_frames: Number of frames to return
+        analysis_fps: How many frames per second of video to score
+        decoder: Decoder backend from decoders.create_decoder()
+        motion_samples: If set, also score motion (see score_motion) on the
+            scanned frames nearest this many evenly spaced positions
+
+    Returns:
+        Same shape as video_loader.read_video_frames, plus per-frame
+        "scores", the clip's mean "motion_energy" and, with motion_samples,
+        "motion_score" and "motion_profile"
+    """
+    if decoder is None:
+        decoder = create_decoder()
+    scan = decoder.scan_frames(video_path, analysis_fps)
+    if "error" in scan:
+        return scan
+    total_frames, fps = scan["total_frames"], scan["fps"]
+
+    try:
+        num_segments = max(1, num_frames * CANDIDATES_PER_FRAME)
+        segment_length = max(1, total_frames / num_segments)
+        # segment -> (score, index, frame)
+        best: Dict[int, Tuple[float, int, Any]] = {}
+
+        motion_targets = iter(_sample_frame_indices(total_frames, motion_samples))
+        motion_target = next(motion_targets, None)
+        motion_thumbnails: List[np.ndarray] = []
+
+        previous: Optional[np.ndarray] = None
+        differences: List[float] = []
+        for position, frame in scan["frames"]:
+            thumbnail = _thumbnail(frame)
+            # The first frame has nothing to differ from; give it a
+            # token score so a completely static clip still yields frames
+            score = float(np.abs(thumbnail - previous).mean()) if previous is not None else 0.0
+            if previous is not None:
+                differences.append(score)
+            previous = thumbnail
+
+            if motion_target is not None and position >= motion_target:
+                motion_thumbnails.append(thumbnail)
+                while motion_target is not None and motion_target <= position:
+                    motion_target = next(motion_targets, None)
+
+            segment = int(position // segment_length)
+            if segment not in best or score > best[segment][0]:
+                best[segment] = (score, position, _shrink(frame))
+
+    except Exception as e:
+        return {"error": f"Error processing video frames: {str(e)}"}
+
+    finally:
+        scan["frames"].close()
+
+    winners = sorted(best.values(), key=lambda item: item[0], reverse=True)[:num_frames]
+    winners.sort(key=lambda item: item[1])
+
+    motion = score_motion(motion_thumbnails) if motion_samples else {}
+    return {
+        **motion,
+        "frames": [(index, frame) for _, index, frame in winners],
+        "scores": [round(score, 2) for score, _, _ in winners],
+        "motion_energy": round(float(np.mean(differences)), 3) if differences else 0.0,
+        "total_frames": total_frames,
+        "fps": fps,
+        "sampling_method": "keyframe",
+    }
@@ -0,0 +1,99 @@
+import cv2
+import math
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+from .video_loader import frame_metadata, select_frames
+from ..settings import MOSAIC_FRAMES, MOSAIC_COLUMNS, MOSAIC_WIDTH, MOSAIC_HEIGHT, MOSAIC_JPEG_QUALITY
+
+
+def _label(seconds: Optional[float], index: int) -> str:
+    if seconds is None:
+        return f"#{index}"
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes):02d}:{seconds:04.1f}"
+
+
+def _burn_label(tile, text: str) -> None:
+    """Draw text in the tile's top-left corner, outlined so it reads on any background"""
+    scale = max(0.35, tile.shape[0] / 300)
+    thickness = max(1, int(round(scale * 2)))
+    origin = (4, 4 + int(20 * scale))
+    cv2.putText(tile, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
+    cv2.putText(tile, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), thickness, cv2.LINE_AA)
+
+
+def build_mosaic(frames: Sequence[Any], labels: Sequence[str], columns: int = MOSAIC_COLUMNS, width: int = MOSAIC_WIDTH, height: int = MOSAIC_HEIGHT) -> np.ndarray:
+    """
+    Tile BGR frames row by row into one width x height image
+
+    Frames are laid out left to right, top to bottom; each tile gets its label
+    burned into the top-left corner. Unused cells stay black.
+    """
+    columns = max(1, min(columns, len(frames)))
+    rows = max(1, math.ceil(len(frames) / columns))
+    tile_width, tile_height = width // columns, height // rows
+
+    mosaic = np.zeros((height, width, 3), dtype=np.uint8)
+    for position, (frame, label) in enumerate(zip(frames, labels)):
+        row, column = divmod(position, columns)
+        tile = cv2.resize(frame, (tile_width, tile_height), interpolation=cv2.INTER_AREA)
+        _burn_label(tile, label)
+        y, x = row * tile_height, column * tile_width
+        mosaic[y:y + tile_height, x:x + tile_width] = tile
+    return mosaic
+
+
+def extract_frame_mosaic(video_path: str, num_frames: int = MOSAIC_FRAMES, motion_samples: int = 0) -> Dict[str, Any]:
+    """
+    Sample num_frames frames and return them tiled into a single JPEG
+
+    Used when FRAME_DELIVERY is "mosaic": one image part covers the whole
+    clip, so many moments cost about as much as a single inline frame.
+    Module-level so it can run in a ProcessPoolExecutor.
+
+    Args:
+        video_path: Path to the video file
+        num_frames: Number of frames to tile (max MOSAIC_FRAMES)
+        motion_samples: Also score motion in the same decode (see select_frames)
+
+    Returns:
+        Same keys as extract_frame_images, with the mosaic JPEG as the only
+        entry of "frames" and "frame_timestamps" listing the tiles in order
+    """
+    if num_frames is None or num_frames <= 0:
+        num_frames = MOSAIC_FRAMES
+    started = time.perf_counter()
+    decoded = select_frames(video_path, min(num_frames, MOSAIC_FRAMES), motion_samples)
+    if "error" in decoded:
+        return decoded
+    decoded_at = time.perf_counter()
+    if not decoded["frames"]:
+        return {"error": "No frames could be extracted from the video"}
+
+    metadata = frame_metadata(decoded)
+    timestamps: List[Optional[float]] = metadata["frame_timestamps"] or [None] * len(decoded["frames"])
+    labels = [_label(seconds, index) for seconds, index in zip(timestamps, metadata["frame_indices"])]
+
+    try:
+        mosaic = build_mosaic([frame for _, frame in decoded["frames"]], labels)
+        _, buffer = cv2.imencode('.jpg', mosaic, [cv2.IMWRITE_JPEG_QUALITY, MOSAIC_JPEG_QUALITY])
+    except Exception as e:
+        return {"error": f"Error building frame mosaic: {str(e)}"}
+
+    columns = max(1, min(MOSAIC_COLUMNS, len(labels)))
+    sampling_method = metadata.pop("sampling_method")
+    return {
+        "frames": [buffer.tobytes()],
+        **metadata,
+        "mosaic_labels": labels,
+        "timings": {"decode": decoded_at - started, "mosaic": time.perf_counter() - decoded_at},
+        "optimization_info": {
+            "frame_size": f"{MOSAIC_WIDTH}x{MOSAIC_HEIGHT}",
+            "grid": f"{columns}x{math.ceil(len(labels) / columns)}",
+            "jpeg_quality": MOSAIC_JPEG_QUALITY,
+            "sampling_method": sampling_method,
+            "delivery": "mosaic",
+        },
+    }
@@ -0,0 +1,35 @@
+from typing import Any, Callable, Dict
+
+from .keyframes import _thumbnail, score_motion
+from .video_loader import extract_video_frames_uncached, read_video_frames
+
+
+def compute_motion_score(video_path: str, num_samples: int) -> Dict[str, Any]:
+    """
+    Measure how much a clip changes, without involving the model
+
+    Samples num_samples frames across the video, reduces them to small
+    grayscale thumbnails and scores them with keyframes.score_motion: the
+    largest mean absolute difference between consecutive samples, so a
+    single burst of activity is enough to count.
+
+    Returns:
+        Dictionary with "motion_score" and the per-pair "motion_profile",
+        or an "error" entry
+    """
+    decoded = read_video_frames(video_path, num_samples)
+    if "error" in decoded:
+        return decoded
+    return score_motion([_thumbnail(frame) for _, frame in decoded["frames"]])
+
+
+def extract_frames_with_activity(video_path: str, num_frames: int, num_samples: int, extractor: Callable[..., Dict[str, Any]] = extract_video_frames_uncached) -> Dict[str, Any]:
+    """
+    Frame extraction plus the clip's motion score, for the batch decode stage
+
+    The extractor decodes about num_samples frames once and scores motion on
+    them alongside the frames it delivers, so each file is opened a single
+    time per clip. Module-level so it can run in a ProcessPoolExecutor;
+    `extractor` must be a module-level function taking motion_samples.
+    """
+    return extractor(video_path, num_frames, motion_samples=num_samples)
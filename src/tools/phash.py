@@ -0,0 +1,124 @@
+"""
+Perceptual frame hashes
+
+dhash() compares neighbouring pixels of a 9x8 grayscale thumbnail; phash()
+takes the signs of the lowest 8x8 DCT coefficients of a 32x32 thumbnail
+relative to their median. Both return 64-bit ints whose Hamming distance
+stays small under re-encoding, rescaling and mild colour shifts.
+
+A hash alone is too coarse to decide that two frames show the same thing:
+a person-sized figure entering a static scene can move a 64-bit hash by a
+single bit. Frames are therefore only treated as duplicates when their
+hashes agree and their 80x60 grayscale thumbnails differ by at most a few
+levels in every pixel (pixel_difference), which re-encoding passes and any
+new object in the scene fails.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from ..settings import FRAME_HASH, FRAME_DEDUP_ENABLED, FRAME_DEDUP_MAX_DISTANCE, FRAME_DEDUP_MAX_PIXEL_DIFF
+
+FRAME_HASHES = ("dhash", "phash")
+
+# (width, height) of the grayscale thumbnails compared pixel by pixel
+THUMBNAIL_SIZE = (80, 60)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _gray(frame) -> np.ndarray:
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+
+def dhash(frame) -> int:
+    """Difference hash: is each pixel of a 9x8 thumbnail brighter than its right neighbour"""
+    small = cv2.resize(_gray(frame), (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(frame) -> int:
+    """DCT hash: is each of the lowest 8x8 frequencies of a 32x32 thumbnail above their median"""
+    small = cv2.resize(_gray(frame), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    # The DC term only tracks overall brightness; leave it out of the median
+    return _bits_to_int(low > np.median(low.flatten()[1:]))
+
+
+def frame_hash(frame, method: str = FRAME_HASH) -> int:
+    if method == "dhash":
+        return dhash(frame)
+    if method == "phash":
+        return phash(frame)
+    raise ValueError(f"Unknown FRAME_HASH {method!r}; expected one of {FRAME_HASHES}")
+
+
+def thumbnail(frame) -> np.ndarray:
+    """Area-averaged grayscale THUMBNAIL_SIZE copy of a frame (uint8), independent of its resolution"""
+    return cv2.resize(_gray(frame), THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def pixel_difference(a: np.ndarray, b: np.ndarray) -> int:
+    """Largest absolute difference between two thumbnails (or stacks of them), in grey levels"""
+    return int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def fingerprint_distance(a: Sequence[int], b: Sequence[int]) -> Optional[int]:
+    """Largest per-frame Hamming distance between two clips' hashes, or None if they differ in length"""
+    if len(a) != len(b) or not a:
+        return None
+    return max(hamming(x, y) for x, y in zip(a, b))
+
+
+def parse_hashes(hashes: Sequence[str]) -> List[int]:
+    return [int(value, 16) for value in hashes]
+
+
+def hash_and_dedupe(decoded: Dict[str, Any], max_distance: int = FRAME_DEDUP_MAX_DISTANCE, method: str = FRAME_HASH, dedupe: bool = FRAME_DEDUP_ENABLED, max_pixel_diff: int = FRAME_DEDUP_MAX_PIXEL_DIFF) -> Dict[str, Any]:
+    """
+    Hash a decode result's frames and drop duplicates
+
+    Sets "frame_hashes" to the hex hashes of every sampled frame and
+    "frame_thumbnails" to their stacked thumbnails (together the clip
+    fingerprint, taken before anything is dropped). With `dedupe`, a frame
+    is removed from "frames" (and "scores") when its hash is within
+    max_distance bits of the last kept frame's and no thumbnail pixel
+    differs by more than max_pixel_diff, so a static stretch is sent once;
+    the first frame is always kept. "duplicates_dropped" counts the removed
+    frames.
+    """
+    frames = decoded["frames"]
+    hashes = [frame_hash(frame, method) for _, frame in frames]
+    thumbnails = np.stack([thumbnail(frame) for _, frame in frames]) if frames else np.zeros((0, THUMBNAIL_SIZE[1], THUMBNAIL_SIZE[0]), np.uint8)
+    keep = list(range(len(frames)))
+    if dedupe and frames:
+        keep = [0]
+        for position in range(1, len(frames)):
+            last = keep[-1]
+            duplicate = (
+                hamming(hashes[position], hashes[last]) <= max_distance
+                and pixel_difference(thumbnails[position], thumbnails[last]) <= max_pixel_diff
+            )
+            if not duplicate:
+                keep.append(position)
+
+    decoded["frame_hashes"] = [format(value, "016x") for value in hashes]
+    decoded["frame_thumbnails"] = thumbnails
+    decoded["duplicates_dropped"] = len(frames) - len(keep)
+    if len(keep) < len(frames):
+        decoded["frames"] = [frames[position] for position in keep]
+        scores = decoded.get("scores")
+        if scores and len(scores) == len(frames):
+            decoded["scores"] = [scores[position] for position in keep]
+    return decoded
@@ -1,83 +1,291 @@
 import cv2
 import base64
-import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 from google.adk.tools import FunctionTool
+from .decoders import _sample_frame_indices, create_decoder
+from .frame_cache import FrameCache
+from .keyframes import _thumbnail, read_keyframes, score_motion
+from .phash import hash_and_dedupe
+from ..metrics import metrics
+from ..settings import (
+    FRAME_CACHE_MAX_ENTRIES,
+    FRAME_CACHE_MAX_BYTES,
+    FRAME_SELECTION,
+    KEYFRAME_ANALYSIS_FPS,
+    INLINE_MAX_FRAMES,
+    INLINE_FRAME_WIDTH,
+    INLINE_FRAME_HEIGHT,
+    INLINE_JPEG_QUALITY,
+    CASCADE_FRAMES,
+    CASCADE_FRAME_WIDTH,
+    CASCADE_FRAME_HEIGHT,
+    CASCADE_JPEG_QUALITY,
+    FRAME_HASH,
+)
 
-def extract_video_frames(video_path: str, num_frames: int) -> Dict[str, Any]:
+# Frame budget and encoding used for every frame sent to the model
+MAX_FRAMES = 2
+TARGET_WIDTH = 96
+TARGET_HEIGHT = 96
+JPEG_QUALITY = 20
+
+# Shared by the batch pre-validation and the agent tool call so each video
+# is only decoded once
+frame_cache = FrameCache(FRAME_CACHE_MAX_ENTRIES, FRAME_CACHE_MAX_BYTES)
+
+# Backend behind read_video_frames; replaceable per run (e.g. by the benchmark)
+decoder = create_decoder()
+
+
+def read_video_frames(video_path: str, num_frames: int, start_frame: int = 0, end_frame: Optional[int] = None) -> Dict[str, Any]:
     """
-    Extract frames from video and return as base64 encoded images with maximum optimization
-    
+    Decode num_frames frames spread evenly across the video
+
+    Decoding is done by the DECODER_BACKEND decoder (see decoders.py). With
+    OpenCV, targets are reached by seeking when they are far apart and by
+    grab() otherwise, and containers where seeking is unreliable fall back
+    to grabbing.
+
     Args:
         video_path: Path to the video file
-        num_frames: Number of frames to extract (max 2)
-        
+        num_frames: Number of frames to decode
+        start_frame: First frame of the range to sample from
+        end_frame: End (exclusive) of the range; defaults to the whole video
+
     Returns:
-        Dictionary containing base64 encoded frames
+        Dictionary with the decoded frames as (index, BGR array) pairs and
+        stream metadata, or an "error" entry
     """
-    # Enforce maximum limit of 2 frames for aggressive token optimization
+    return decoder.read_frames(video_path, num_frames, start_frame, end_frame)
+
+
+def encode_frame(frame, width: int = TARGET_WIDTH, height: int = TARGET_HEIGHT, quality: int = JPEG_QUALITY) -> bytes:
+    """Resize a BGR frame and encode it as JPEG bytes"""
+    resized_frame = cv2.resize(frame, (width, height))
+    _, buffer = cv2.imencode('.jpg', resized_frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def _clamp_num_frames(num_frames: int) -> int:
+    """Enforce maximum limit of 2 frames for aggressive token optimization"""
     if num_frames is None or num_frames <= 0:
-        num_frames = 2  # Default to 2
-    elif num_frames > 2:
-        num_frames = 2  # Cap at maximum 2 frames
-    
-    frames_per_prompt = 25  # Increased sampling for better frame distribution
-    
-    if not os.path.exists(video_path):
-        return {"error": f"Video file not found: {video_path}"}
-    
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        return {"error": f"Could not open video: {video_path}"}
-    
-    frames = []
-    frame_count = 0
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
+        return MAX_FRAMES  # Default to 2
+    return min(num_frames, MAX_FRAMES)  # Cap at maximum 2 frames
+
+
+def _frame_cache_key(video_path: str, num_frames: int):
+    return frame_cache.make_key(video_path, num_frames, FRAME_SELECTION, decoder.name, TARGET_WIDTH, TARGET_HEIGHT, JPEG_QUALITY)
+
+
+def _read_frames_with_motion(video_path: str, num_frames: int, motion_samples: int) -> Dict[str, Any]:
+    """
+    Uniform selection plus a motion score from a single decode of the file
+
+    Decodes num_frames * ratio evenly spaced frames, ratio being the smallest
+    odd number giving at least motion_samples of them. Every ratio-th one,
+    starting at ratio // 2, sits exactly where read_video_frames(video_path,
+    num_frames) would have landed, and all of them feed the motion score.
+    """
+    num_frames = max(1, num_frames)
+    ratio = max(1, -(-motion_samples // num_frames))
+    ratio += 1 - ratio % 2
+    decoded = read_video_frames(video_path, num_frames * ratio)
+    if "error" in decoded:
+        return decoded
+
+    sampled = decoded["frames"]
+    wanted = set(_sample_frame_indices(decoded["total_frames"], num_frames))
+    frames = [(index, frame) for index, frame in sampled if index in wanted]
+    if len(frames) != len(wanted):
+        if len(sampled) != num_frames * ratio:
+            # A clip shorter than the sample count or a container that lost
+            # frames; the subset no longer lines up, so decode the selection
+            selected = read_video_frames(video_path, num_frames)
+            if "error" in selected:
+                return selected
+            frames = selected["frames"]
+        else:
+            # Keyframe-only decoding reports the keyframe it used, not the target
+            frames = sampled[ratio // 2::ratio]
+
+    motion = score_motion([_thumbnail(frame) for _, frame in sampled])
+    return {**decoded, **motion, "frames": frames}
+
+
+def select_frames(video_path: str, num_frames: int, motion_samples: int = 0) -> Dict[str, Any]:
+    """
+    Decode num_frames frames using the configured FRAME_SELECTION strategy
+
+    The frames are perceptually hashed and near-duplicates of the previous
+    kept frame are dropped (see phash.hash_and_dedupe). With motion_samples
+    set, the same decode also yields the clip's "motion_score" over about
+    that many evenly spaced frames (see keyframes.score_motion).
+    """
+    if FRAME_SELECTION == "keyframe":
+        decoded = read_keyframes(video_path, num_frames, KEYFRAME_ANALYSIS_FPS, decoder, motion_samples)
+    elif motion_samples:
+        decoded = _read_frames_with_motion(video_path, num_frames, motion_samples)
+    else:
+        decoded = read_video_frames(video_path, num_frames)
+    if "error" in decoded:
+        return decoded
+    return hash_and_dedupe(decoded)
+
+
+def frame_metadata(decoded: Dict[str, Any]) -> Dict[str, Any]:
+    """Position and timing information for the frames returned by select_frames"""
+    fps = decoded["fps"]
+    indices = [index for index, _ in decoded["frames"]]
+    metadata = {
+        "total_frames": decoded["total_frames"],
+        "fps": fps,
+        "sampled_frames": len(indices),
+        "video_duration_frames": decoded["total_frames"],
+        "frame_indices": indices,
+        "frame_timestamps": [round(index / fps, 2) for index in indices] if fps > 0 else [],
+        "frame_scores": decoded.get("scores", []),
+        "sampling_method": decoded["sampling_method"],
+    }
+    if "motion_score" in decoded:
+        metadata["motion_score"] = decoded["motion_score"]
+    if "frame_hashes" in decoded:
+        metadata["duplicate_frames_dropped"] = decoded["duplicates_dropped"]
+        metadata["fingerprint"] = {
+            "method": FRAME_HASH,
+            "hashes": decoded["frame_hashes"],
+            "duration": round(decoded["total_frames"] / fps, 2) if fps > 0 else None,
+            # Pixel-level check for find_similar; kept out of the saved record
+            "thumbnails": decoded["frame_thumbnails"],
+        }
+    return metadata
+
+
+def _decode_and_encode(video_path: str, num_frames: int, width: int, height: int, quality: int, motion_samples: int = 0) -> Dict[str, Any]:
+    """Pick num_frames frames with the configured selection and encode each as JPEG bytes"""
+    started = time.perf_counter()
+    decoded = select_frames(video_path, num_frames, motion_samples)
+    if "error" in decoded:
+        return decoded
+    decoded_at = time.perf_counter()
+
     try:
-        while cap.isOpened() and len(frames) < num_frames:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_count % frames_per_prompt == 0:
-                # AGGRESSIVE OPTIMIZATION FOR MAXIMUM TOKEN REDUCTION
-                # Ultra-small resolution to minimize base64 size
-                target_width = 96   # Reduced from 256 to 96 (85% smaller)
-                target_height = 96  # Reduced from 256 to 96 (85% smaller)
-                resized_frame = cv2.resize(frame, (target_width, target_height))
-                
-                # Maximum compression with lowest quality
-                encode_params = [cv2.IMWRITE_JPEG_QUALITY, 20]  # Reduced from 50 to 20
-                _, buffer = cv2.imencode('.jpg', resized_frame, encode_params)
-                
-                frame_b64 = base64.b64encode(buffer).decode('utf-8')
-                frames.append(frame_b64)
-            
-            frame_count += 1
-            
+        frames = [encode_frame(frame, width, height, quality) for _, frame in decoded["frames"]]
     except Exception as e:
-        cap.release()
         return {"error": f"Error processing video frames: {str(e)}"}
-        
-    finally:
-        cap.release()
-    
+
     if not frames:
         return {"error": "No frames could be extracted from the video"}
-    
-    return {
-        "frames": frames,
-        "total_frames": frame_count,
-        "sampled_frames": len(frames),
-        "video_duration_frames": total_frames,
-        "optimization_info": {
-            "frame_size": f"{target_width}x{target_height}",
-            "jpeg_quality": 20,
-            "optimization_level": "maximum",
-            "token_reduction": "~85%"
-        }
+
+    timings = {"decode": decoded_at - started, "encode": time.perf_counter() - decoded_at}
+    return {"frames": frames, **frame_metadata(decoded), "timings": timings}
+
+
+def extract_video_frames_uncached(video_path: str, num_frames: int, motion_samples: int = 0) -> Dict[str, Any]:
+    """
+    Decode and encode frames without consulting the frame cache
+
+    Module-level so it can be shipped to a ProcessPoolExecutor; the parent
+    process records the per-stage "timings" entry in the run metrics, removes
+    it and stores the result with cache_extraction(). motion_samples adds a
+    "motion_score" from the same decode (see select_frames).
+    """
+    result = _decode_and_encode(video_path, _clamp_num_frames(num_frames), TARGET_WIDTH, TARGET_HEIGHT, JPEG_QUALITY, motion_samples)
+    if "error" in result:
+        return result
+
+    started = time.perf_counter()
+    result["frames"] = [base64.b64encode(frame).decode('utf-8') for frame in result["frames"]]
+    result["timings"]["base64"] = time.perf_counter() - started
+    result["optimization_info"] = {
+        "frame_size": f"{TARGET_WIDTH}x{TARGET_HEIGHT}",
+        "jpeg_quality": JPEG_QUALITY,
+        "sampling_method": result.pop("sampling_method"),
+        "optimization_level": "maximum",
+        "token_reduction": "~85%"
+    }
+    return result
+
+
+def extract_frame_images(video_path: str, num_frames: int = INLINE_MAX_FRAMES, motion_samples: int = 0) -> Dict[str, Any]:
+    """
+    Extract frames as raw JPEG bytes for inline image parts
+
+    Used when FRAME_DELIVERY is "inline": the frames travel as binary
+    image parts on the user message rather than as base64 text in a tool
+    result, so they are encoded at the larger INLINE_* size. Same keys as
+    extract_video_frames_uncached, with bytes in "frames".
+    """
+    if num_frames is None or num_frames <= 0:
+        num_frames = INLINE_MAX_FRAMES
+    result = _decode_and_encode(
+        video_path, min(num_frames, INLINE_MAX_FRAMES), INLINE_FRAME_WIDTH, INLINE_FRAME_HEIGHT, INLINE_JPEG_QUALITY, motion_samples
+    )
+    if "error" in result:
+        return result
+
+    result["optimization_info"] = {
+        "frame_size": f"{INLINE_FRAME_WIDTH}x{INLINE_FRAME_HEIGHT}",
+        "jpeg_quality": INLINE_JPEG_QUALITY,
+        "sampling_method": result.pop("sampling_method"),
+        "delivery": "inline",
     }
+    return result
+
+
+def extract_high_res_frames(video_path: str, num_frames: int = CASCADE_FRAMES) -> Dict[str, Any]:
+    """
+    Extract frames as raw JPEG bytes for the cascade's high-resolution tier
+
+    Same as extract_frame_images, at the CASCADE_* frame count, size and
+    quality; only clips the low-resolution tier flagged are decoded again.
+    """
+    if num_frames is None or num_frames <= 0:
+        num_frames = CASCADE_FRAMES
+    result = _decode_and_encode(video_path, num_frames, CASCADE_FRAME_WIDTH, CASCADE_FRAME_HEIGHT, CASCADE_JPEG_QUALITY)
+    if "error" in result:
+        return result
+
+    result["optimization_info"] = {
+        "frame_size": f"{CASCADE_FRAME_WIDTH}x{CASCADE_FRAME_HEIGHT}",
+        "jpeg_quality": CASCADE_JPEG_QUALITY,
+        "sampling_method": result.pop("sampling_method"),
+        "delivery": "inline",
+    }
+    return result
+
+
+def get_cached_extraction(video_path: str, num_frames: int) -> Optional[Dict[str, Any]]:
+    """Return a previously extracted result for this video, if still cached"""
+    return frame_cache.get(_frame_cache_key(video_path, _clamp_num_frames(num_frames)))
+
+
+def cache_extraction(video_path: str, num_frames: int, result: Dict[str, Any]) -> None:
+    """Store a result produced elsewhere (e.g. in a worker process) in the frame cache"""
+    frame_cache.put(_frame_cache_key(video_path, _clamp_num_frames(num_frames)), result)
+
+
+def extract_video_frames(video_path: str, num_frames: int) -> Dict[str, Any]:
+    """
+    Extract frames from video and return as base64 encoded images with maximum optimization
+
+    Args:
+        video_path: Path to the video file
+        num_frames: Number of frames to extract (max 2)
+
+    Returns:
+        Dictionary containing base64 encoded frames
+    """
+    cached = get_cached_extraction(video_path, num_frames)
+    if cached is not None:
+        return cached
+
+    result = extract_video_frames_uncached(video_path, num_frames)
+    metrics.observe_stages(result.pop("timings", None))
+    # Only used to find near-duplicate clips; the model has no use for it
+    result.pop("fingerprint", None)
+    cache_extraction(video_path, num_frames, result)
+    return result
 
 # Create the tool using FunctionTool (removed incompatible parameters)
 VideoFrameTool = FunctionTool(extract_video_frames)
@@ -0,0 +1,239 @@
+"""
+Watch-folder daemon for continuous ingestion
+
+Watches a directory for new video files (inotify through watchdog when it is
+installed, directory polling otherwise), waits until each file has stopped
+growing, and analyzes it with the same summarizer/classifier pipeline as
+process_videos. Results stream to a JSONL file, so restarting the daemon
+skips clips it has already analyzed.
+
+Usage:
+    python run.py --watch [DIRECTORY]
+    python -m src.watch_folder [DIRECTORY]
+"""
+
+import asyncio
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from google.adk.sessions import InMemorySessionService
+
+from .llm_backend import requires_api_key
+from .metrics import export_periodically, metrics, metrics_paths
+from .result_cache import ResultCache
+from .result_writer import JsonlResultWriter
+from .result_store import ResultRecord, camera_name, flush_periodically, open_result_store
+from .run_batch import (
+    VIDEO_EXTENSIONS,
+    _create_runners,
+    _finish_video,
+    _lookup_cached_result,
+    _submit_extraction,
+    find_video_files,
+)
+from .settings import (
+    GOOGLE_API_KEY,
+    BATCH_CONCURRENCY,
+    EXTRACT_WORKERS,
+    METRICS_EXPORT_INTERVAL,
+    METRICS_JSON_FILE,
+    RESULT_CACHE_ENABLED,
+    RESULT_STORE_ENABLED,
+    WATCH_OUTPUT_FILE,
+    WATCH_POLL_INTERVAL,
+    WATCH_SETTLE_SECONDS,
+)
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+
+def _is_video(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+class _VideoEventHandler(FileSystemEventHandler):
+    """Forward filesystem events for video files to the event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, callback):
+        self._loop = loop
+        self._callback = callback
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        path = getattr(event, "dest_path", "") or event.src_path
+        if _is_video(path):
+            self._loop.call_soon_threadsafe(self._callback, path)
+
+
+class FolderWatcher:
+    """
+    Track candidate files until they are fully written
+
+    A file is considered complete once its size and mtime have not changed
+    for `settle_seconds`. Each version of a file, identified by its full path,
+    size and mtime, is put on `queue` exactly once; a file replaced under the
+    same name is analyzed again. Files in the directory whose names are in
+    `completed` (analyzed by an earlier run) are skipped until they change.
+    """
+
+    def __init__(self, directory: str, queue: asyncio.Queue, settle_seconds: float = WATCH_SETTLE_SECONDS, poll_interval: float = WATCH_POLL_INTERVAL, completed=None):
+        self.directory = directory
+        self.queue = queue
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        # path -> (size, mtime_ns) of the version already queued
+        self.seen: Dict[str, Tuple[int, int]] = {}
+        # path -> (size, mtime_ns, time the file last changed)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._observer = None
+
+        completed = set(completed or ())
+        for video_file in find_video_files(directory):
+            if video_file.name in completed:
+                stat = video_file.stat()
+                self.seen[str(video_file.resolve())] = (stat.st_size, stat.st_mtime_ns)
+
+    def notice(self, path: str) -> None:
+        """Mark a file as possibly new or still being written"""
+        path = os.path.realpath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        if self.seen.get(path) != (stat.st_size, stat.st_mtime_ns):
+            self._pending.setdefault(path, (-1, -1, time.monotonic()))
+
+    def _scan(self) -> None:
+        for video_file in find_video_files(self.directory):
+            self.notice(str(video_file))
+
+    async def _settle(self) -> None:
+        now = time.monotonic()
+        for path, (size, mtime_ns, changed_at) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted or renamed away before it finished
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif stat.st_size > 0 and now - changed_at >= self.settle_seconds:
+                del self._pending[path]
+                self.seen[path] = (size, mtime_ns)
+                await self.queue.put(pathlib.Path(path))
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._scan()
+        if WATCHDOG_AVAILABLE:
+            self._observer = Observer()
+            self._observer.schedule(_VideoEventHandler(loop, self.notice), self.directory, recursive=False)
+            self._observer.start()
+            print(f"👀 Watching {self.directory} (filesystem events)")
+        else:
+            print(f"👀 Watching {self.directory} (polling every {self.poll_interval}s)")
+
+        try:
+            while True:
+                if self._observer is None:
+                    self._scan()
+                await self._settle()
+                # Re-check pending files often enough to honour the settle time
+                await asyncio.sleep(min(self.poll_interval, self.settle_seconds / 2))
+        finally:
+            if self._observer is not None:
+                self._observer.stop()
+                self._observer.join()
+
+
+async def watch_folder_async(video_directory: str = "videos", output_file: str = WATCH_OUTPUT_FILE, concurrency: int = BATCH_CONCURRENCY, extract_workers: int = EXTRACT_WORKERS, use_result_cache: bool = RESULT_CACHE_ENABLED, settle_seconds: float = WATCH_SETTLE_SECONDS, use_result_store: bool = RESULT_STORE_ENABLED, metrics_file: Optional[str] = METRICS_JSON_FILE) -> None:
+    """
+    Analyze new videos as they land in `video_directory` until cancelled
+
+    Files already present at startup that are not in `output_file` are
+    analyzed too, so a restarted daemon catches up on what it missed.
+    Metrics are exported to metrics_file (None skips the export) every
+    METRICS_EXPORT_INTERVAL seconds.
+    """
+    os.makedirs(video_directory, exist_ok=True)
+    session_service = InMemorySessionService()
+    video_runner, threat_runner = _create_runners(session_service)
+    writer = JsonlResultWriter(output_file)
+    result_cache = ResultCache() if use_result_cache else None
+    result_store = open_result_store() if use_result_store else None
+    executor = ProcessPoolExecutor(max_workers=extract_workers) if extract_workers > 0 else None
+
+    queue: asyncio.Queue = asyncio.Queue()
+    watcher = FolderWatcher(video_directory, queue, settle_seconds=settle_seconds, completed=writer.completed)
+
+    async def worker() -> None:
+        while True:
+            video_file = await queue.get()
+            started = time.monotonic()
+            print(f"\n📥 New clip: {video_file.name}")
+            try:
+                content_hash, cached_record = await _lookup_cached_result(video_file, result_cache)
+                frame_future = None if cached_record is not None else _submit_extraction(video_file, executor)
+                record = await _finish_video(
+                    video_file, frame_future, content_hash, cached_record,
+                    session_service, video_runner, threat_runner, result_cache
+                )
+            except Exception as e:
+                # Keep the daemon alive; the clip is retried on the next restart
+                print(f"💥 Critical error processing {video_file.name}: {e}")
+                continue
+            writer.write(video_file.name, record)
+            if result_store is not None:
+                result_store.add(ResultRecord.from_record(video_file.name, record, camera_name(video_file)))
+            if record.get("classification", "Normal") not in ("Normal", "Unknown"):
+                print(f"🚨 ALERT: {video_file.name} classified as {record['classification']} (RISK_SCORE {record['risk_score']})")
+            print(f"⏱️ {video_file.name} analyzed {time.monotonic() - started:.1f}s after it was ready")
+
+    try:
+        await asyncio.gather(
+            watcher.run(),
+            export_periodically(metrics, METRICS_EXPORT_INTERVAL, metrics_file),
+            flush_periodically(result_store),
+            *(worker() for _ in range(max(1, concurrency)))
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        writer.close()
+        if result_store is not None:
+            result_store.close()
+        if metrics_file is not None:
+            metrics.export(*metrics_paths(metrics_file))
+        if result_cache is not None:
+            result_cache.close()
+
+
+def watch_folder(video_directory: str = "videos", output_file: str = WATCH_OUTPUT_FILE, **kwargs) -> None:
+    """
+    Blocking entry point for the watch-folder daemon; stops on Ctrl-C
+    """
+    if not GOOGLE_API_KEY and requires_api_key():
+        print("❌ ERROR: GOOGLE_API_KEY not found in .env file")
+        print("🔧 Please add your Google AI API key to the .env file")
+        return
+
+    try:
+        asyncio.run(watch_folder_async(video_directory, output_file, **kwargs))
+    except KeyboardInterrupt:
+        print("\n⏹️ Watch mode stopped by user")
+
+
+if __name__ == "__main__":
+    watch_folder(sys.argv[1] if len(sys.argv) > 1 else "videos")
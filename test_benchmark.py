@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+
+from src.benchmark import benchmark_end_to_end, benchmark_extraction, generate_matrix, run_benchmark
+
+
+def test_extraction_benchmark_on_synthetic_clips():
+    print("Testing synthetic clip generation and extraction benchmark...")
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = generate_matrix(tmp, resolutions=[(160, 120)], lengths=[1], codecs=[("MJPG", ".avi")])
+        assert len(clips) == 1
+
+        rows = benchmark_extraction(clips, repeats=1)
+        assert rows[0]["error"] is None
+        assert rows[0]["sampled_frames"] > 0
+        assert rows[0]["frames_per_second"] > 0
+
+
+def test_end_to_end_against_fake_model():
+    print("Testing end-to-end benchmark with the fake model...")
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = generate_matrix(tmp, resolutions=[(160, 120)], lengths=[1], codecs=[("MJPG", ".avi")])
+        result = benchmark_end_to_end(clips[0], num_videos=3, latency=0.0, concurrency=2, extract_workers=0)
+        assert result["successful"] == 3
+        assert result["failed"] == 0
+        assert result["model_calls"] >= 3
+        assert result["tokens"] > 0
+
+
+def test_report_is_json():
+    print("Testing benchmark report...")
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, "benchmark.json")
+        run_benchmark(output_file, quick=True, latency=0.0, num_videos=2, extract_workers=0)
+        with open(output_file) as f:
+            report = json.load(f)
+        assert {"environment", "config", "extraction", "end_to_end"} <= set(report)
+
+
+if __name__ == "__main__":
+    test_extraction_benchmark_on_synthetic_clips()
+    test_end_to_end_against_fake_model()
+    test_report_is_json()
+    print("\nAll benchmark checks passed")
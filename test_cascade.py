@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+import src.run_batch as run_batch
+from src.benchmark import fake_models
+from src.cascade import cascade_stats, escalation_reason
+from src.metrics import metrics
+from src.settings import CASCADE_ESCALATE_MIN_RISK, CASCADE_FRAMES, CASCADE_FRAME_HEIGHT, CASCADE_FRAME_WIDTH
+from src.tools.video_loader import extract_high_res_frames
+
+
+def _write_clip(path, num_frames=60, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (320, 240))
+    for index in range(num_frames):
+        frame = np.full((240, 320, 3), 60, dtype=np.uint8)
+        cv2.rectangle(frame, (5 * index % 320, 60), (5 * index % 320 + 60, 180), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def test_escalation_reason():
+    print("Testing escalation rules...")
+    assert escalation_reason("SUMMARY: quiet corridor\nRISK_SCORE: 12") is None
+    assert escalation_reason(f"**RISK_SCORE:** {CASCADE_ESCALATE_MIN_RISK}") == "risk"
+    assert escalation_reason("RISK_SCORE: 336") == "risk"
+    assert escalation_reason("SUMMARY: the frames are too blurry to judge") == "unparsed"
+    assert escalation_reason("") == "unparsed"
+    assert escalation_reason("RISK_SCORE: 150", min_risk=200) is None
+
+
+def test_high_res_frames():
+    print("Testing high-resolution extraction...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.avi")
+        _write_clip(path)
+        result = extract_high_res_frames(path)
+        assert "error" not in result, result.get("error")
+        assert result["sampled_frames"] + result["duplicate_frames_dropped"] == CASCADE_FRAMES
+        image = cv2.imdecode(np.frombuffer(result["frames"][0], np.uint8), cv2.IMREAD_COLOR)
+        assert image.shape[:2] == (CASCADE_FRAME_HEIGHT, CASCADE_FRAME_WIDTH)
+
+
+def test_risky_clips_are_escalated():
+    print("Testing the two-tier cascade end to end...")
+    previous = run_batch.CASCADE_ENABLED
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = os.path.join(tmp, "videos")
+        os.makedirs(videos)
+        for index in range(8):
+            _write_clip(os.path.join(videos, f"clip_{index}.avi"))
+        output_file = os.path.join(tmp, "results.jsonl")
+        run_batch.CASCADE_ENABLED = True
+        try:
+            with fake_models(latency=0.0):
+                asyncio.run(run_batch.process_videos_async(videos, output_file, 2, 0, use_result_cache=False, use_result_store=False, metrics_file=None))
+        finally:
+            run_batch.CASCADE_ENABLED = previous
+
+        with open(output_file) as f:
+            records = [json.loads(line) for line in f]
+        escalated = [record for record in records if record["cascade"]["tier"] == 2]
+        kept = [record for record in records if record["cascade"]["tier"] == 1]
+        assert escalated and kept
+
+        for record in kept:
+            assert record["cascade"]["tier1_risk_score"] < CASCADE_ESCALATE_MIN_RISK
+            assert "reason" not in record["cascade"]
+            assert float(record["risk_score"]) == record["cascade"]["tier1_risk_score"]
+        for record in escalated:
+            assert record["cascade"]["reason"] == "risk"
+            assert record["cascade"]["tokens"]["tier2"] > 0
+            # The high-resolution summary replaces the first one
+            assert "Analyze these" in record["result"]
+
+        stats = cascade_stats(metrics)
+        assert stats["videos"] == {"1": len(kept), "2": len(escalated)}
+        assert stats["escalations"]["risk"] == len(escalated)
+        assert stats["tokens"]["2"] == sum(record["cascade"]["tokens"]["tier2"] for record in escalated)
+
+
+if __name__ == "__main__":
+    test_escalation_reason()
+    test_high_res_frames()
+    test_risky_clips_are_escalated()
+    print("\nAll cascade checks passed")
@@ -0,0 +1,152 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+import src.tools.decoders as decoders
+import src.tools.video_loader as video_loader
+from src.benchmark import generate_synthetic_clip
+from src.tools.decoders import (
+    PYAV_AVAILABLE, OpenCVDecoder, PyAVDecoder, _read_frames_by_grab, _read_frames_by_seek, _sample_frame_indices, av, create_decoder,
+)
+
+
+def _write_gop_clip(path, num_frames=90, fps=15):
+    """MPEG-4 part 2 clip (keyframe every 12 frames) of a circle moving over a flat background"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (1280, 720))
+    for index in range(num_frames):
+        frame = np.full((720, 1280, 3), 60, dtype=np.uint8)
+        cv2.circle(frame, (10 * index % 1280, 360), 40, (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def _write_numbered_clip(path, num_frames=240, fps=30):
+    """MJPG clip whose frame i is a flat grey of level i, so a decoded frame tells its own index"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (160, 120))
+    for index in range(num_frames):
+        writer.write(np.full((120, 160, 3), index, dtype=np.uint8))
+    writer.release()
+
+
+def _frame_number(frame):
+    return int(round(float(frame.mean())))
+
+
+def _keyframe_positions(path):
+    container = av.open(path)
+    stream = container.streams.video[0]
+    packets = sorted((packet for packet in container.demux(stream) if packet.size), key=lambda packet: packet.pts)
+    container.close()
+    return [index for index, packet in enumerate(packets) if packet.is_keyframe]
+
+
+def test_create_decoder():
+    print("Testing decoder selection...")
+    assert isinstance(create_decoder("opencv"), OpenCVDecoder)
+    assert create_decoder("pyav").name == ("pyav" if PYAV_AVAILABLE else "opencv")
+    try:
+        create_decoder("gstreamer")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown backends must be rejected")
+
+
+def test_pyav_matches_opencv_positions():
+    if not PYAV_AVAILABLE:
+        print("PyAV not installed, skipping")
+        return
+    print("Testing PyAV exact decoding against OpenCV...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.avi")
+        generate_synthetic_clip(path, 320, 240, 4, fps=15, fourcc="MJPG")
+
+        expected = OpenCVDecoder().read_frames(path, 4)
+        decoded = PyAVDecoder(keyframes_only=False).read_frames(path, 4)
+        assert "error" not in decoded, decoded.get("error")
+        assert decoded["total_frames"] == expected["total_frames"] == 60
+        assert [index for index, _ in decoded["frames"]] == [index for index, _ in expected["frames"]]
+        assert decoded["frames"][0][1].shape == expected["frames"][0][1].shape
+
+        ranged = PyAVDecoder(keyframes_only=False).read_frames(path, 2, start_frame=30, end_frame=60)
+        assert [index for index, _ in ranged["frames"]] == [37, 52]
+
+
+def test_pyav_keyframes_only_and_downscale():
+    if not PYAV_AVAILABLE:
+        print("PyAV not installed, skipping")
+        return
+    print("Testing keyframe-only decoding...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.mp4")
+        _write_gop_clip(path)
+        keyframes = _keyframe_positions(path)
+        assert len(keyframes) > 4
+
+        decoded = PyAVDecoder(keyframes_only=True, max_width=320).read_frames(path, 4)
+        assert "error" not in decoded, decoded.get("error")
+        # Targets 11, 33, 56 and 78 are answered by the keyframe before each
+        assert [index for index, _ in decoded["frames"]] == [keyframes[0], keyframes[2], keyframes[4], keyframes[6]]
+        assert decoded["frames"][0][1].shape == (180, 320, 3)
+        assert decoded["sampling_method"] == "pyav-keyframe"
+
+        # More targets than keyframes: shared keyframes fall back to exact frames
+        positions = [index for index, _ in PyAVDecoder(keyframes_only=True).read_frames(path, 10)["frames"]]
+        assert len(set(positions)) == 10
+        assert set(keyframes) <= set(positions)
+
+        # read_video_frames decodes with the module-level decoder
+        previous = video_loader.decoder
+        video_loader.decoder = PyAVDecoder(keyframes_only=True)
+        try:
+            assert video_loader.read_video_frames(path, 2)["sampling_method"] == "pyav-keyframe"
+        finally:
+            video_loader.decoder = previous
+
+
+def test_opencv_samples_the_whole_clip():
+    print("Testing OpenCV seek and grab sampling...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "numbered.avi")
+        _write_numbered_clip(path)
+        indices = _sample_frame_indices(240, 4)
+        assert indices == [30, 90, 150, 210]
+
+        # Each path on its own returns the requested frames, from the start to the end of the clip
+        for read in (_read_frames_by_seek, _read_frames_by_grab):
+            cap = cv2.VideoCapture(path)
+            try:
+                frames = read(cap, indices)
+            finally:
+                cap.release()
+            assert [index for index, _ in frames] == indices, read.__name__
+            assert all(abs(_frame_number(frame) - index) <= 2 for index, frame in frames), read.__name__
+
+        decoded = OpenCVDecoder().read_frames(path, 4)
+        assert decoded["sampling_method"] == "seek"
+        assert [index for index, _ in decoded["frames"]] == indices
+
+        # A container that will not seek falls back to grabbing the same frames
+        previous = decoders._read_frames_by_seek
+        decoders._read_frames_by_seek = lambda cap, indices: []
+        try:
+            fallback = OpenCVDecoder().read_frames(path, 4)
+        finally:
+            decoders._read_frames_by_seek = previous
+        assert fallback["sampling_method"] == "grab"
+        assert [(index, _frame_number(frame)) for index, frame in fallback["frames"]] == [(index, _frame_number(frame)) for index, frame in decoded["frames"]]
+
+        # Close targets are grabbed, and a range is sampled within its bounds
+        assert OpenCVDecoder().read_frames(path, 20)["sampling_method"] == "grab"
+        ranged = OpenCVDecoder().read_frames(path, 2, start_frame=120, end_frame=240)
+        assert [index for index, _ in ranged["frames"]] == [150, 210]
+
+
+if __name__ == "__main__":
+    test_create_decoder()
+    test_opencv_samples_the_whole_clip()
+    test_pyav_matches_opencv_positions()
+    test_pyav_keyframes_only_and_downscale()
+    print("\nAll decoder checks passed")
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import src.run_batch as run_batch
+from src.benchmark import fake_models, generate_synthetic_clip
+
+# Longest clip first, so the first extraction is the last to finish
+CLIP_SECONDS = {"a_long.avi": 12, "b_short.avi": 1, "c_medium.avi": 4, "d_short.avi": 2}
+FPS = 10
+
+
+def _write_clips(directory):
+    for name, seconds in CLIP_SECONDS.items():
+        generate_synthetic_clip(os.path.join(directory, name), 160, 120, seconds, fps=FPS, fourcc="MJPG")
+
+
+def test_pipelined_extraction_keeps_file_order():
+    print("Testing the process-pool decode stage...")
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_clips(tmp)
+        video_files = run_batch.find_video_files(tmp)
+
+        async def drain():
+            queue = asyncio.Queue(maxsize=2)
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                producer = asyncio.ensure_future(run_batch._produce_frames(video_files, queue, executor, consumers=1))
+                items = []
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    position, video_file, frame_future, _, _ = item
+                    # The producer never runs more than the queue's bound ahead
+                    assert queue.qsize() <= 2
+                    items.append((position, video_file.name, await frame_future))
+                await producer
+            return items
+
+        items = asyncio.run(drain())
+        assert [(position, name) for position, name, _ in items] == list(enumerate(sorted(CLIP_SECONDS), 1))
+        for _, name, result in items:
+            assert "error" not in result, result.get("error")
+            assert result["total_frames"] == CLIP_SECONDS[name] * FPS, name
+            assert "motion_score" in result
+
+
+def test_batch_results_in_file_order():
+    print("Testing batch results with extraction workers...")
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = os.path.join(tmp, "videos")
+        os.makedirs(videos)
+        _write_clips(videos)
+        output_file = os.path.join(tmp, "results.jsonl")
+
+        with fake_models(latency=0.0):
+            asyncio.run(run_batch.process_videos_async(videos, output_file, 1, 2, use_result_cache=False, use_result_store=False, metrics_file=None))
+
+        with open(output_file) as f:
+            records = [json.loads(line) for line in f]
+        assert [record["video"] for record in records] == sorted(CLIP_SECONDS)
+        assert all(record["status"] == "ok" for record in records)
+
+
+if __name__ == "__main__":
+    test_pipelined_extraction_keeps_file_order()
+    test_batch_results_in_file_order()
+    print("\nAll extraction pipeline checks passed")
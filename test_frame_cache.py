@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+from src.tools.frame_cache import FrameCache
+
+
+def _result(frame_bytes):
+    return {"frames": [b"x" * frame_bytes], "sampled_frames": 1}
+
+
+def test_lru_eviction_by_count():
+    print("Testing LRU eviction by entry count...")
+    cache = FrameCache(max_entries=2, max_bytes=1 << 20)
+    cache.put("a", _result(10))
+    cache.put("b", _result(10))
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") is not None
+    cache.put("c", _result(10))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["entries"] == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_eviction_by_bytes():
+    print("Testing eviction by encoded size...")
+    # Each entry is 1000 frame bytes plus 512 bytes of overhead
+    cache = FrameCache(max_entries=10, max_bytes=3100)
+    cache.put("a", _result(1000))
+    cache.put("b", _result(1000))
+    assert cache.stats()["bytes"] == 3024
+    cache.put("c", _result(1000))
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 2, "bytes": 3024, "hits": 0, "misses": 1}
+
+    # Replacing an entry does not count it twice, and oversized results are never cached
+    cache.put("b", _result(1000))
+    assert cache.stats()["bytes"] == 3024
+    cache.put("huge", _result(4000))
+    assert cache.get("huge") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+    cache.put("error", {"error": "boom"})
+    assert cache.get("error") is None
+
+
+def test_entries_are_copies_keyed_by_file_identity():
+    print("Testing cache keys and copies...")
+    cache = FrameCache(max_entries=4, max_bytes=1 << 20)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.mp4")
+        with open(path, "wb") as f:
+            f.write(b"clip")
+        key = FrameCache.make_key(path, 2)
+        cache.put(key, _result(10))
+        cache.get(key)["frames"].clear()
+        assert len(cache.get(key)["frames"]) == 1
+
+        # A rewritten file gets a different key
+        with open(path, "ab") as f:
+            f.write(b" and more")
+        assert FrameCache.make_key(path, 2) != key
+        assert FrameCache.make_key(path, 3) != FrameCache.make_key(path, 2)
+        assert FrameCache.make_key(os.path.join(tmp, "missing.mp4"), 2) is None
+        assert cache.get(None) is None
+
+
+if __name__ == "__main__":
+    test_lru_eviction_by_count()
+    test_eviction_by_bytes()
+    test_entries_are_copies_keyed_by_file_identity()
+    print("\nAll frame cache checks passed")
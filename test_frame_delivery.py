@@ -0,0 +1,81 @@
+import os
+import pathlib
+import tempfile
+
+import cv2
+import numpy as np
+
+import src.run_batch as run_batch
+from src.settings import INLINE_FRAME_WIDTH, INLINE_MAX_FRAMES, MOSAIC_FRAMES, MOSAIC_HEIGHT, MOSAIC_WIDTH
+from src.tools.mosaic import build_mosaic, extract_frame_mosaic
+from src.tools.video_loader import extract_frame_images, extract_video_frames_uncached
+
+
+def _write_clip(path, num_frames=60, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (640, 480))
+    for index in range(num_frames):
+        frame = np.full((480, 640, 3), 60, dtype=np.uint8)
+        cv2.circle(frame, (10 * index % 640, 240), 40, (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def test_inline_frames_are_jpeg_bytes():
+    print("Testing inline frame extraction...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.avi")
+        _write_clip(path)
+
+        result = extract_frame_images(path)
+        assert "error" not in result, result.get("error")
+        assert result["sampled_frames"] == INLINE_MAX_FRAMES
+        assert all(isinstance(frame, bytes) and frame.startswith(b"\xff\xd8") for frame in result["frames"])
+        decoded = cv2.imdecode(np.frombuffer(result["frames"][0], np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape[1] == INLINE_FRAME_WIDTH
+
+        # Tool delivery still returns base64 strings
+        tool_result = extract_video_frames_uncached(path, 2)
+        assert all(isinstance(frame, str) for frame in tool_result["frames"])
+
+
+def test_inline_message_carries_image_parts():
+    print("Testing inline summarizer message...")
+    frame_result = {"frames": [b"\xff\xd8one", b"\xff\xd8two"], "frame_timestamps": [0.5, 1.5]}
+    previous = run_batch.FRAME_DELIVERY
+    run_batch.FRAME_DELIVERY = "inline"
+    try:
+        message = run_batch._summarizer_message(pathlib.Path("videos/clip.mp4"), frame_result)
+    finally:
+        run_batch.FRAME_DELIVERY = previous
+
+    images = [part.inline_data for part in message.parts if part.inline_data is not None]
+    assert [image.data for image in images] == frame_result["frames"]
+    assert all(image.mime_type == "image/jpeg" for image in images)
+    assert "Frame 2 at 1.5s:" in [part.text for part in message.parts]
+
+
+def test_mosaic_tiles_frames_in_reading_order():
+    print("Testing frame mosaic...")
+    frames = [np.full((120, 160, 3), value, dtype=np.uint8) for value in (0, 100, 200, 250)]
+    mosaic = build_mosaic(frames, ["a", "b", "c", "d"], columns=2, width=200, height=200)
+    assert mosaic.shape == (200, 200, 3)
+    # Sample the bottom-right of each tile, away from the burned-in label
+    assert [int(mosaic[y, x, 0]) for y, x in ((90, 90), (90, 190), (190, 90), (190, 190))] == [0, 100, 200, 250]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.avi")
+        _write_clip(path)
+
+        result = extract_frame_mosaic(path)
+        assert "error" not in result, result.get("error")
+        assert len(result["frames"]) == 1
+        assert result["sampled_frames"] == MOSAIC_FRAMES == len(result["mosaic_labels"])
+        image = cv2.imdecode(np.frombuffer(result["frames"][0], np.uint8), cv2.IMREAD_COLOR)
+        assert image.shape[:2] == (MOSAIC_HEIGHT, MOSAIC_WIDTH)
+
+
+if __name__ == "__main__":
+    test_inline_frames_are_jpeg_bytes()
+    test_inline_message_carries_image_parts()
+    test_mosaic_tiles_frames_in_reading_order()
+    print("\nAll frame delivery checks passed")
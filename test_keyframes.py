@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+import src.tools.video_loader as video_loader
+from src.tools.decoders import PYAV_AVAILABLE, OpenCVDecoder, PyAVDecoder
+from src.tools.keyframes import read_keyframes
+
+
+def _write_clip(path, event_start, num_frames=90, fps=30):
+    """Grey static scene with a bright block appearing at event_start"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (160, 120))
+    for index in range(num_frames):
+        frame = np.full((120, 160, 3), 80, dtype=np.uint8)
+        if index >= event_start:
+            frame[30:90, 40:120] = 255
+        writer.write(frame)
+    writer.release()
+
+
+def test_keyframe_finds_scene_change():
+    print("Testing keyframe selection on a synthetic clip...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "event.avi")
+        _write_clip(path, event_start=60)
+
+        result = read_keyframes(path, num_frames=1, analysis_fps=30)
+        assert "error" not in result, result.get("error")
+        assert [index for index, _ in result["frames"]] == [60]
+        assert result["motion_energy"] > 0
+
+
+def test_keyframes_use_the_configured_decoder():
+    print("Testing keyframe selection through the configured decoder...")
+    scanned = []
+
+    class RecordingDecoder(OpenCVDecoder):
+        def scan_frames(self, video_path, sample_fps):
+            scanned.append(video_path)
+            return super().scan_frames(video_path, sample_fps)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "event.avi")
+        _write_clip(path, event_start=60)
+
+        previous = video_loader.FRAME_SELECTION, video_loader.decoder
+        video_loader.FRAME_SELECTION, video_loader.decoder = "keyframe", RecordingDecoder()
+        try:
+            result = video_loader.select_frames(path, 1)
+        finally:
+            video_loader.FRAME_SELECTION, video_loader.decoder = previous
+        assert "error" not in result, result.get("error")
+        assert scanned == [path]
+        assert [index for index, _ in result["frames"]] == [60]
+
+        if PYAV_AVAILABLE:
+            decoded = read_keyframes(path, num_frames=1, analysis_fps=30, decoder=PyAVDecoder())
+            assert "error" not in decoded, decoded.get("error")
+            assert [index for index, _ in decoded["frames"]] == [60]
+
+
+if __name__ == "__main__":
+    test_keyframe_finds_scene_change()
+    test_keyframes_use_the_configured_decoder()
+    print("\nAll keyframe checks passed")
@@ -0,0 +1,80 @@
+import asyncio
+import tempfile
+
+from google.adk.models.llm_request import LlmRequest
+from google.genai import errors, types
+
+from src.agents.threat_classifier import parse_risk_score
+from src.agents.video_summarizer import SURVEILLANCE_PROMPT
+from src.benchmark import benchmark_end_to_end, generate_matrix
+from src.llm_backend import FakeLlm, create_model
+from src.rate_limiter import retry_after_from_error
+
+
+def _summarizer_request(*extra_parts):
+    parts = [types.Part.from_text(text="Analyze this video.\n\nVIDEO_PATH=videos/clip.mp4")]
+    return LlmRequest(
+        contents=[types.Content(role="user", parts=parts + list(extra_parts))],
+        config=types.GenerateContentConfig(system_instruction=SURVEILLANCE_PROMPT, tools=[
+            types.Tool(function_declarations=[types.FunctionDeclaration(name="extract_video_frames")])
+        ]),
+    )
+
+
+async def _collect(model, request):
+    return [response async for response in model.generate_content_async(request)]
+
+
+def test_fake_follows_tool_protocol():
+    print("Testing fake backend protocol...")
+    model = FakeLlm(latency=0, response_chars=600)
+
+    first = asyncio.run(_collect(model, _summarizer_request()))
+    call = first[0].content.parts[0].function_call
+    assert call.name == "extract_video_frames" and call.args["video_path"] == "videos/clip.mp4"
+
+    response = types.Part.from_function_response(name="extract_video_frames", response={"frames": []})
+    second = asyncio.run(_collect(model, _summarizer_request(response)))
+    summary = second[0].content.parts[0].text
+    assert len(summary) >= 600
+    assert parse_risk_score(summary) is not None
+    assert second[0].usage_metadata.total_token_count > 0
+
+    # Same video, same scores
+    again = asyncio.run(_collect(model, _summarizer_request(response)))
+    assert again[0].content.parts[0].text == summary
+
+
+def test_fake_injects_errors():
+    print("Testing fake backend error injection...")
+    model = FakeLlm(latency=0, rate_limit_error_rate=1.0, retry_delay_seconds=3)
+    try:
+        asyncio.run(_collect(model, _summarizer_request()))
+        raise AssertionError("expected a 429")
+    except errors.ClientError as e:
+        assert e.code == 429
+        assert retry_after_from_error(e) == 3.0
+
+    model = FakeLlm(latency=0, malformed_call_rate=1.0)
+    responses = asyncio.run(_collect(model, _summarizer_request()))
+    assert responses[0].error_code == "MALFORMED_FUNCTION_CALL"
+    assert model.stats()["malformed_calls"] == 1
+
+    assert create_model("gemini") == "gemini-1.5-flash"
+    assert isinstance(create_model("fake"), FakeLlm)
+
+
+def test_pipeline_retries_malformed_calls():
+    print("Testing the pipeline against a flaky fake backend...")
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = generate_matrix(tmp, resolutions=[(160, 120)], lengths=[1], codecs=[("MJPG", ".avi")])
+        result = benchmark_end_to_end(clips[0], num_videos=4, latency=0.0, concurrency=2, extract_workers=0, malformed_call_rate=0.4, seed=1)
+        assert result["malformed_calls"] > 0
+        assert result["successful"] == 4
+
+
+if __name__ == "__main__":
+    test_fake_follows_tool_protocol()
+    test_fake_injects_errors()
+    test_pipeline_retries_malformed_calls()
+    print("\nAll fake backend checks passed")
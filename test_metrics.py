@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+
+from src.metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_and_quantiles():
+    print("Testing histogram...")
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.5, 0.5, 5.0, 50.0):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [(0.1, 1), (1.0, 3), (10.0, 4)]
+    assert histogram.quantile(0.5) == 1.0
+    # Beyond the last bucket the observed maximum is reported
+    assert histogram.quantile(1.0) == 50.0
+
+
+def test_registry_exports_json_and_prometheus():
+    print("Testing metrics export...")
+    registry = MetricsRegistry(prefix="test")
+    registry.inc("videos_total", status="ok")
+    registry.inc("videos_total", status="ok")
+    registry.inc("tokens_total", 1500)
+    with registry.span("llm_summarize"):
+        pass
+    registry.observe_stages({"decode": 0.2, "encode": 0.003})
+
+    assert registry.counter("videos_total", status="ok") == 2
+    assert registry.histogram("stage_seconds", stage="decode").count == 1
+
+    text = registry.to_prometheus()
+    assert '# TYPE test_videos_total counter' in text
+    assert 'test_videos_total{status="ok"} 2' in text
+    assert 'test_tokens_total 1500' in text
+    assert 'test_stage_seconds_bucket{stage="decode",le="0.25"} 1' in text
+    assert 'test_stage_seconds_bucket{stage="decode",le="+Inf"} 1' in text
+    assert 'test_stage_seconds_count{stage="llm_summarize"} 1' in text
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, prometheus_path = os.path.join(tmp, "m.json"), os.path.join(tmp, "m.prom")
+        registry.export(json_path, prometheus_path)
+        with open(json_path) as f:
+            exported = json.load(f)
+        assert exported["counters"]['videos_total{status="ok"}'] == 2
+        assert exported["histograms"]['stage_seconds{stage="encode"}']["count"] == 1
+        with open(prometheus_path) as f:
+            assert f.read() == text
+
+
+if __name__ == "__main__":
+    test_histogram_buckets_and_quantiles()
+    test_registry_exports_json_and_prometheus()
+    print("\nAll metrics checks passed")
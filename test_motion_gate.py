@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+import src.run_batch as run_batch
+import src.tools.video_loader as video_loader
+from src.benchmark import fake_models, generate_synthetic_clip
+from src.settings import MOTION_GATE_SAMPLES, MOTION_GATE_THRESHOLD
+from src.tools.decoders import OpenCVDecoder
+from src.tools.motion import compute_motion_score, extract_frames_with_activity
+
+
+def _write_static_clip(path, num_frames=30, fps=10):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (160, 120))
+    frame = np.full((120, 160, 3), 90, dtype=np.uint8)
+    cv2.rectangle(frame, (20, 20), (70, 90), (200, 180, 40), -1)
+    for _ in range(num_frames):
+        writer.write(frame)
+    writer.release()
+
+
+def test_motion_score():
+    print("Testing the motion score...")
+    with tempfile.TemporaryDirectory() as tmp:
+        static, moving = os.path.join(tmp, "static.avi"), os.path.join(tmp, "moving.avi")
+        _write_static_clip(static)
+        generate_synthetic_clip(moving, 160, 120, 3, fps=10, fourcc="MJPG")
+
+        quiet = compute_motion_score(static, MOTION_GATE_SAMPLES)
+        busy = compute_motion_score(moving, MOTION_GATE_SAMPLES)
+        assert quiet["motion_score"] < MOTION_GATE_THRESHOLD <= busy["motion_score"]
+        assert len(busy["motion_profile"]) == MOTION_GATE_SAMPLES - 1
+        assert "error" in compute_motion_score(os.path.join(tmp, "missing.avi"), MOTION_GATE_SAMPLES)
+
+
+def test_motion_score_reuses_the_extraction_decode():
+    print("Testing that extraction and the motion score share one decode...")
+    opened = []
+
+    class CountingDecoder(OpenCVDecoder):
+        def read_frames(self, video_path, *args, **kwargs):
+            opened.append(video_path)
+            return super().read_frames(video_path, *args, **kwargs)
+
+        def scan_frames(self, video_path, sample_fps):
+            opened.append(video_path)
+            return super().scan_frames(video_path, sample_fps)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        moving = os.path.join(tmp, "moving.avi")
+        generate_synthetic_clip(moving, 160, 120, 3, fps=10, fourcc="MJPG")
+
+        previous = video_loader.FRAME_SELECTION, video_loader.decoder
+        try:
+            video_loader.decoder = CountingDecoder()
+            for selection in ("uniform", "keyframe"):
+                video_loader.FRAME_SELECTION = selection
+                plain = video_loader.extract_video_frames_uncached(moving, 2)
+                opened.clear()
+                result = extract_frames_with_activity(moving, 2, MOTION_GATE_SAMPLES)
+                assert "error" not in result, result.get("error")
+                assert opened == [moving], selection
+                assert result["motion_score"] >= MOTION_GATE_THRESHOLD, selection
+                # The gate does not change which frames are delivered
+                assert result["frame_indices"] == plain["frame_indices"], selection
+                assert result["frames"] == plain["frames"], selection
+        finally:
+            video_loader.FRAME_SELECTION, video_loader.decoder = previous
+
+
+def test_static_clip_skips_the_agents():
+    print("Testing the activity gate end to end...")
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = os.path.join(tmp, "videos")
+        os.makedirs(videos)
+        _write_static_clip(os.path.join(videos, "a_static.avi"))
+        generate_synthetic_clip(os.path.join(videos, "b_moving.avi"), 160, 120, 3, fps=10, fourcc="MJPG")
+        output_file = os.path.join(tmp, "results.json")
+
+        with fake_models(latency=0.0) as fake:
+            asyncio.run(run_batch.process_videos_async(videos, output_file, 1, 0, use_result_cache=False, use_result_store=False, metrics_file=None))
+
+        with open(output_file) as f:
+            results = json.load(f)["video_results"]
+        static, moving = results["a_static.avi"], results["b_moving.avi"]
+        assert static["gate"]["decision"] == "skipped"
+        assert static["gate"]["motion_score"] < MOTION_GATE_THRESHOLD
+        assert static["tokens"]["calls"] == 0
+        assert static["classification"] == "Normal"
+        assert moving["gate"]["decision"] == "analyzed"
+        assert moving["tokens"]["calls"] > 0
+        # Only the moving clip reached the model
+        assert fake.calls == moving["tokens"]["calls"]
+
+
+if __name__ == "__main__":
+    test_motion_score()
+    test_motion_score_reuses_the_extraction_decode()
+    test_static_clip_skips_the_agents()
+    print("\nAll activity gate checks passed")
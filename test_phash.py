@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+import src.run_batch as run_batch
+from src.benchmark import fake_models
+from src.result_cache import ResultCache
+from src.tools.phash import dhash, fingerprint_distance, hamming, hash_and_dedupe, phash, thumbnail
+
+
+def _scene(index, width=640, height=480):
+    frame = np.full((height, width, 3), 60, dtype=np.uint8)
+    cv2.rectangle(frame, (width // 8, height // 6), (width // 3, height // 2), (200, 180, 40), -1)
+    cv2.circle(frame, (int(width * (0.1 + 0.013 * index)), height * 2 // 3), height // 10, (255, 255, 255), -1)
+    return frame
+
+
+def _static_scene(figure=None):
+    """Blurred noise background, optionally with a dark (width, height) figure standing in it"""
+    rng = np.random.default_rng(0)
+    frame = cv2.GaussianBlur(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8), (0, 0), 25)
+    frame = cv2.normalize(frame, None, 40, 200, cv2.NORM_MINMAX)
+    if figure is not None:
+        cv2.rectangle(frame, (300, 250), (300 + figure[0], 250 + figure[1]), (20, 20, 20), -1)
+    return frame
+
+
+def _fingerprint(frames):
+    decoded = hash_and_dedupe({"frames": list(enumerate(frames))}, dedupe=False)
+    return [int(value, 16) for value in decoded["frame_hashes"]], decoded["frame_thumbnails"]
+
+
+def _write_clip(path, width=640, height=480, num_frames=60, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for index in range(num_frames):
+        writer.write(cv2.resize(_scene(index), (width, height)))
+    writer.release()
+
+
+def test_hashes_survive_reencoding():
+    print("Testing perceptual hashes...")
+    frame = _scene(10)
+    _, jpeg = cv2.imencode(".jpg", cv2.resize(frame, (320, 240)), [cv2.IMWRITE_JPEG_QUALITY, 30])
+    copy = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+    other = cv2.flip(_scene(40), 1)
+    for method in (dhash, phash):
+        assert hamming(method(frame), method(copy)) <= 4
+        assert hamming(method(frame), method(other)) > 10
+    assert fingerprint_distance([1, 2], [1, 3]) == 1
+    assert fingerprint_distance([1, 2], [1]) is None
+
+
+def test_near_duplicate_frames_are_dropped():
+    print("Testing frame deduplication...")
+    still = _scene(0)
+    decoded = {"frames": [(0, still), (10, still.copy()), (20, _scene(30)), (30, _scene(30))], "scores": [1, 2, 3, 4]}
+    hash_and_dedupe(decoded, max_distance=2, method="dhash")
+    assert [index for index, _ in decoded["frames"]] == [0, 20]
+    assert decoded["scores"] == [1, 3]
+    assert decoded["duplicates_dropped"] == 2
+    assert len(decoded["frame_hashes"]) == len(decoded["frame_thumbnails"]) == 4
+
+
+def test_new_object_is_never_a_duplicate():
+    print("Testing that a small intruder is not deduplicated...")
+    quiet = _static_scene()
+    for figure in ((15, 40), (30, 80), (50, 120)):
+        intruder = _static_scene(figure)
+        decoded = hash_and_dedupe({"frames": [(0, quiet), (10, intruder)]})
+        assert [index for index, _ in decoded["frames"]] == [0, 10], figure
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, "cache.sqlite3"), config_hash="test")
+        hashes, thumbnails = _fingerprint([quiet, quiet])
+        record = {"result": "report", "classification": "Normal", "risk_score": "4", "status": "ok",
+                  "fingerprint": {"method": "dhash", "hashes": [format(value, "016x") for value in hashes], "duration": 10.0}}
+        cache.put("quiet", "cam1_quiet.mp4", record, thumbnails)
+
+        # Same camera, same length, a figure in the second frame: even with a
+        # generous hash distance the thumbnails keep it from matching
+        hashes, thumbnails = _fingerprint([quiet, _static_scene((30, 80))])
+        assert cache.find_similar(hashes, thumbnails, duration=10.0, max_distance=64) is None
+        # A re-encoded copy of the quiet clip still matches
+        _, jpeg = cv2.imencode(".jpg", cv2.resize(quiet, (320, 240)), [cv2.IMWRITE_JPEG_QUALITY, 40])
+        copy = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        hashes, thumbnails = _fingerprint([copy, copy])
+        assert cache.find_similar(hashes, thumbnails, duration=10.0)["video"] == "cam1_quiet.mp4"
+        cache.close()
+
+
+def test_cache_finds_similar_clips():
+    print("Testing the fingerprint index...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, "cache.sqlite3"), config_hash="test")
+        hashes = [0x0F0F0F0F0F0F0F0F, 0x00FF00FF00FF00FF]
+        thumbnails = np.stack([thumbnail(_scene(0)), thumbnail(_scene(30))])
+        record = {"result": "report", "classification": "Abuse", "risk_score": "280", "status": "ok",
+                  "fingerprint": {"method": "dhash", "hashes": [format(value, "016x") for value in hashes], "duration": 10.0}}
+        cache.put("original", "cam1_clip.mp4", record, thumbnails)
+
+        brighter = np.clip(thumbnails.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+        match = cache.find_similar([hashes[0] ^ 0b111, hashes[1] ^ 0b1], brighter, duration=10.2)
+        assert match["video"] == "cam1_clip.mp4" and (match["distance"], match["pixel_diff"]) == (3, 3)
+        assert match["record"]["classification"] == "Abuse"
+        assert cache.find_similar([hashes[0] ^ 0xFFFF, hashes[1]], thumbnails, duration=10.0) is None
+        assert cache.find_similar(hashes, thumbnails, duration=20.0) is None
+        assert cache.find_similar(hashes[:1], thumbnails[:1]) is None
+        assert cache.find_similar(hashes, None) is None
+
+        cache.invalidate(video_name="cam1_clip.mp4")
+        assert cache.find_similar(hashes, thumbnails) is None
+        cache.close()
+
+
+def test_reexported_copy_reuses_the_analysis():
+    print("Testing near-duplicate clips end to end...")
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = os.path.join(tmp, "videos")
+        os.makedirs(videos)
+        _write_clip(os.path.join(videos, "a_original.avi"))
+        _write_clip(os.path.join(videos, "b_reexport.avi"), width=320, height=240)
+        previous = run_batch.CLIP_DEDUP_ENABLED
+        run_batch.CLIP_DEDUP_ENABLED = True
+        os.chdir(tmp)
+        try:
+            with fake_models(latency=0.0) as fake:
+                asyncio.run(run_batch.process_videos_async("videos", "results.jsonl", 1, 0, use_result_cache=True, use_result_store=False, metrics_file=None))
+        finally:
+            os.chdir(previous_dir)
+            run_batch.CLIP_DEDUP_ENABLED = previous
+
+        with open(os.path.join(tmp, "results.jsonl")) as f:
+            original, copy = [json.loads(line) for line in f]
+        assert "duplicate_of" not in original
+        assert copy["duplicate_of"]["video"] == "a_original.avi"
+        assert copy["classification"] == original["classification"]
+        assert copy["tokens"]["calls"] == 0
+        assert "thumbnails" not in copy["fingerprint"]
+        assert fake.calls == original["tokens"]["calls"]
+
+
+if __name__ == "__main__":
+    test_hashes_survive_reencoding()
+    test_near_duplicate_frames_are_dropped()
+    test_new_object_is_never_a_duplicate()
+    test_cache_finds_similar_clips()
+    test_reexported_copy_reuses_the_analysis()
+    print("\nAll perceptual hash checks passed")
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import AsyncGenerator
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import errors, types
+
+from src.callbacks import quota_guard
+from src.rate_limiter import RateLimiter, TokenBucket, backoff_delay, is_rate_limit_error, retry_after_from_error
+from src.run_batch import _run_agent_with_retries
+
+
+def _quota_error(delay: str = "0.2s") -> errors.ClientError:
+    return errors.ClientError(429, {"error": {
+        "code": 429,
+        "message": "You exceeded your current quota.",
+        "status": "RESOURCE_EXHAUSTED",
+        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": delay}],
+    }})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class QuotaLimitedLlm(BaseLlm):
+    """Local stand-in for the model endpoint that rejects the first request with a 429"""
+    model: str = "fake-quota-limited"
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request, stream=False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        if self.calls == 1:
+            raise _quota_error()
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part.from_text(text="RISK_SCORE: 5")]))
+
+
+def test_token_bucket_spaces_requests():
+    print("Testing token bucket...")
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=clock)
+    # Full bucket: the first minute's worth goes through immediately
+    assert limiter.reserve(100) == 0
+    assert limiter.reserve(500) == 0
+    # Token bucket is now empty; 300 more tokens need 30s to refill at 10/s
+    assert abs(limiter.reserve(300) - 30.0) < 1e-9
+    clock.now = 30.0
+    assert limiter.reserve(0) == 0
+
+    bucket = TokenBucket(60, capacity=1, clock=clock)
+    assert bucket.reserve(1) == 0
+    assert abs(bucket.reserve(1) - 1.0) < 1e-9
+    assert abs(bucket.reserve(1) - 2.0) < 1e-9
+
+
+def test_pause_holds_every_caller():
+    print("Testing global pause...")
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=None, tokens_per_minute=None, clock=clock)
+    limiter.pause(17)
+    assert limiter.reserve() == 17
+    clock.now = 10
+    assert limiter.reserve() == 7
+
+
+def test_retry_after_and_backoff():
+    print("Testing retry-after parsing and backoff...")
+    error = _quota_error("17s")
+    assert is_rate_limit_error(error)
+    assert retry_after_from_error(error) == 17.0
+    assert retry_after_from_error(ValueError("boom")) is None
+    assert not is_rate_limit_error(ValueError("boom"))
+
+    for attempt in range(6):
+        delay = backoff_delay(attempt, base=2, cap=10)
+        assert 0 <= delay <= min(10, 2 * 2 ** attempt)
+    # The server's hint is a floor
+    assert backoff_delay(0, error, base=2, cap=10) >= 17.0
+
+
+def test_retry_against_fake_endpoint():
+    print("Testing retry after a 429 from a local fake endpoint...")
+    model = QuotaLimitedLlm()
+    agent = LlmAgent(name="limited", model=model, instruction="Reply.", before_model_callback=quota_guard)
+    session_service = InMemorySessionService()
+    runner = Runner(agent=agent, app_name="rate_limit_test", session_service=session_service)
+
+    async def run() -> str:
+        await session_service.create_session(app_name="rate_limit_test", user_id="surveillance_user", session_id="s")
+        message = types.Content(role="user", parts=[types.Part.from_text(text="hello")])
+        return await _run_agent_with_retries(runner, "s", message, "Limited", max_retries=3)
+
+    started = time.monotonic()
+    result = asyncio.run(run())
+    assert result.startswith("RISK_SCORE: 5"), result
+    assert model.calls == 2
+    # The retry waited at least the endpoint's retryDelay
+    assert time.monotonic() - started >= 0.2
+
+
+if __name__ == "__main__":
+    test_token_bucket_spaces_requests()
+    test_pause_holds_every_caller()
+    test_retry_after_and_backoff()
+    test_retry_against_fake_endpoint()
+    print("\nAll rate limiter checks passed")
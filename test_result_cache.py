@@ -0,0 +1,112 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import src.settings as settings
+from src.result_cache import ResultCache, analysis_config_fingerprint, main
+
+
+def _record(classification="Abuse", risk_score="280"):
+    return {"result": f"RISK_SCORE: {risk_score}", "classification": classification, "risk_score": risk_score, "status": "ok"}
+
+
+def test_hit_after_put_and_miss_after_config_change():
+    print("Testing cache hits and configuration keys...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        cache = ResultCache(db_path, config_hash="v1")
+        assert cache.get("clip") is None
+        cache.put("clip", "cam1_clip.mp4", _record())
+        assert cache.get("clip")["classification"] == "Abuse"
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
+
+        # The same clip under another configuration is not answered
+        changed = ResultCache(db_path, config_hash="v2")
+        assert changed.get("clip") is None
+        assert changed.stats()["stale_entries"] == 1
+        changed.close()
+
+    # Any analysis setting feeds the configuration fingerprint
+    previous = settings.MOTION_GATE_THRESHOLD
+    before = analysis_config_fingerprint()
+    settings.MOTION_GATE_THRESHOLD = previous + 1
+    try:
+        assert analysis_config_fingerprint() != before
+    finally:
+        settings.MOTION_GATE_THRESHOLD = previous
+    assert analysis_config_fingerprint() == before
+
+
+def test_invalidate_stale():
+    print("Testing invalidate --stale...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        old = ResultCache(db_path, config_hash="old prompts")
+        old.put("a", "a.mp4", _record())
+        old.put("b", "b.mp4", _record())
+        old.close()
+        current = ResultCache(db_path)
+        current.put("a", "a.mp4", _record("Normal", "4"))
+        current.close()
+
+        main(["--db", db_path, "invalidate", "--stale"])
+
+        cache = ResultCache(db_path)
+        assert cache.stats()["entries"] == 1
+        assert cache.get("a")["classification"] == "Normal"
+        cache.close()
+
+
+def test_prune_keeps_the_most_recently_used():
+    print("Testing prune(max_entries)...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, "cache.sqlite3"), config_hash="test")
+        for name in ("a", "b", "c"):
+            cache.put(name, f"{name}.mp4", _record())
+            time.sleep(0.01)
+        # Reading "a" makes it the most recently used
+        cache.get("a")
+
+        assert cache.prune(max_entries=2) == 1
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.prune(max_entries=2) == 0
+        cache.close()
+
+
+def test_file_hashes_are_reused_while_unchanged():
+    print("Testing mtime-keyed content hashes...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, "cache.sqlite3"), config_hash="test")
+        path = os.path.join(tmp, "clip.mp4")
+        with open(path, "wb") as f:
+            f.write(b"original bytes")
+        original = cache.content_hash(path)
+        assert original == hashlib.sha256(b"original bytes").hexdigest()
+
+        # Same size and mtime: the memoized hash is returned without reading the file
+        stat = os.stat(path)
+        with open(path, "wb") as f:
+            f.write(b"modified bytes")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert cache.content_hash(path) == original
+
+        # A new mtime invalidates the memo
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert cache.content_hash(path) == hashlib.sha256(b"modified bytes").hexdigest()
+
+        # Hashes of deleted files are forgotten on prune
+        os.remove(path)
+        cache.prune()
+        assert cache._conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0] == 0
+        cache.close()
+
+
+if __name__ == "__main__":
+    test_hit_after_put_and_miss_after_config_change()
+    test_invalidate_stale()
+    test_prune_keeps_the_most_recently_used()
+    test_file_hashes_are_reused_while_unchanged()
+    print("\nAll result cache checks passed")
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+import src.run_batch as run_batch
+from src.benchmark import fake_models, generate_synthetic_clip
+from src.result_store import PYARROW_AVAILABLE, ResultRecord, ResultStore, camera_name, compact, flush_periodically, query_results
+
+
+def _pipeline_record(risk_score, classification, status="ok"):
+    return {
+        "result": f"""=== VIDEO SURVEILLANCE ANALYSIS ===
+
+**SUMMARY:** synthetic
+**HAZARD:** 8 (weapon)
+EXPOSURE: 5
+VULNERABILITY: 7
+
+=== THREAT CLASSIFICATION ===
+
+RISK_SCORE: {risk_score}
+CLASSIFICATION: {classification}""",
+        "risk_score": str(risk_score),
+        "classification": classification,
+        "status": status,
+        "tokens": {"calls": 2, "tokens": 900},
+    }
+
+
+def test_record_from_pipeline_result():
+    print("Testing result record parsing...")
+    record = ResultRecord.from_record("clip.mp4", _pipeline_record(280, "Abuse"), camera="cam1", analyzed_at=100.0)
+    assert (record.risk_score, record.classification) == (280.0, "Abuse")
+    assert (record.hazard, record.exposure, record.vulnerability) == (8, 5, 7)
+    assert (record.model_calls, record.tokens, record.cache_hit) == (2, 900, False)
+    assert not hasattr(record, "__dict__")
+
+    # Unparsed fields in the record are recovered from markdown-decorated report lines
+    record = ResultRecord.from_record("clip.mp4", {"result": "**RISK_SCORE:** 640\n**CLASSIFICATION:** Assault", "risk_score": "Unknown", "classification": "Unknown"})
+    assert (record.risk_score, record.classification) == (640.0, "Assault")
+
+    # The structured engine's validated fields win over parsing
+    structured = {**_pipeline_record(280, "Abuse"), "analysis": {"hazard": 2, "exposure": 3, "vulnerability": 4, "risk_score": 24, "classification": "Normal"}}
+    record = ResultRecord.from_record("clip.mp4", structured)
+    assert (record.hazard, record.risk_score) == (2, 24.0)
+
+    assert camera_name(os.path.join("recordings", "cam7", "clip.mp4")) == "cam7"
+
+
+def test_store_and_query():
+    if not PYARROW_AVAILABLE:
+        print("pyarrow not installed, skipping")
+        return
+    print("Testing the Parquet results store...")
+    now = time.time()
+    rows = [
+        ("a.mp4", "cam1", now - 3600, 640, "Assault"),
+        ("b.mp4", "cam1", now - 20 * 86400, 700, "Assault"),
+        ("c.mp4", "cam2", now - 3600, 900, "Assault"),
+        ("d.mp4", "cam1", now - 7200, 280, "Abuse"),
+        ("e.mp4", "cam1", now - 60, 320, "Assault"),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store")
+        store = ResultStore(path, flush_rows=2)
+        for video, camera, analyzed_at, risk_score, classification in rows:
+            store.add(ResultRecord.from_record(video, _pipeline_record(risk_score, classification), camera, analyzed_at))
+        store.close()
+        assert store.rows_written == 5
+        assert len(os.listdir(path)) == 3
+
+        results = query_results(path, classification="Assault", min_risk=300, camera="cam1", since=timedelta(days=7))
+        assert list(results["video"]) == ["e.mp4", "a.mp4"]
+        assert "report" not in results.columns
+        assert str(results["risk_score"].dtype) == "float64"
+
+        assert len(query_results(path)) == 5
+        assert list(query_results(path, camera=["cam2"], columns=["video", "report"])["video"]) == ["c.mp4"]
+        assert query_results(path, max_risk=300)["video"].tolist() == ["d.mp4"]
+
+        assert compact(path) == 5
+        assert len(os.listdir(path)) == 1
+        assert len(query_results(path, classification="Assault", min_risk=300, camera="cam1", since=timedelta(days=7))) == 2
+
+        assert query_results(os.path.join(tmp, "missing")).empty
+
+
+def test_idle_store_flushes_on_a_timer():
+    print("Testing the timed flush of a quiet store...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store")
+        store = ResultStore(path, flush_rows=100, flush_seconds=0.2)
+        store.add(ResultRecord.from_record("a.mp4", _pipeline_record(640, "Assault"), "cam1"))
+        assert store.rows_written == 0
+
+        async def idle():
+            flusher = asyncio.ensure_future(flush_periodically(store))
+            # No further rows arrive; only the timer can flush the first one
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if store.rows_written:
+                    break
+            flusher.cancel()
+
+        asyncio.run(idle())
+        assert store.rows_written == 1
+        assert list(query_results(path)["video"]) == ["a.mp4"]
+        store.close()
+
+
+def test_rerun_does_not_duplicate_rows():
+    print("Testing that cached results are not stored twice...")
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = os.path.join(tmp, "cam1")
+        os.makedirs(videos)
+        generate_synthetic_clip(os.path.join(videos, "a.avi"), 160, 120, 2, fps=10, fourcc="MJPG")
+        generate_synthetic_clip(os.path.join(videos, "b.avi"), 160, 120, 3, fps=10, fourcc="MJPG")
+        os.chdir(tmp)
+        try:
+            with fake_models(latency=0.0):
+                for run in (1, 2):
+                    asyncio.run(run_batch.process_videos_async("cam1", f"results{run}.jsonl", 1, 0, use_result_cache=True, use_result_store=True, metrics_file=None))
+        finally:
+            os.chdir(previous_dir)
+
+        # The second run is answered entirely from the result cache
+        with open(os.path.join(tmp, "results2.jsonl")) as f:
+            assert [json.loads(line)["cache_hit"] for line in f] == [True, True]
+        rows = query_results(os.path.join(tmp, "src", "results", "results_store"))
+        assert sorted(rows["video"]) == ["a.avi", "b.avi"]
+        assert not rows["cache_hit"].any()
+
+
+if __name__ == "__main__":
+    test_record_from_pipeline_result()
+    test_store_and_query()
+    test_idle_store_flushes_on_a_timer()
+    test_rerun_does_not_duplicate_rows()
+    print("\nAll result store checks passed")
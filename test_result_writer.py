@@ -0,0 +1,38 @@
+import json
+import os
+import tempfile
+
+from src.result_writer import JsonlResultWriter
+
+
+def test_jsonl_resume():
+    print("Testing JSONL checkpoint/resume...")
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, "results.jsonl")
+
+        writer = JsonlResultWriter(output_file)
+        writer.write("a.mp4", {"result": "RISK_SCORE: 12", "status": "ok"})
+        writer.write("b.mp4", {"result": "ERROR: boom", "status": "error"})
+        writer.close()
+
+        # Simulate a crash in the middle of writing the third record
+        with open(output_file, "a") as f:
+            f.write('{"video": "c.mp4", "res')
+
+        resumed = JsonlResultWriter(output_file)
+        assert resumed.completed == {"a.mp4", "b.mp4"}
+        assert resumed.summary.total_videos == 2
+        assert resumed.summary.failed_analyses == 1
+
+        resumed.write("c.mp4", {"result": "RISK_SCORE: 40", "status": "ok"})
+        resumed.close()
+
+        with open(output_file) as f:
+            videos = [json.loads(line)["video"] for line in f]
+        assert videos == ["a.mp4", "b.mp4", "c.mp4"]
+        assert resumed.results()["total_videos"] == 3
+
+
+if __name__ == "__main__":
+    test_jsonl_resume()
+    print("\nAll result writer checks passed")
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import pathlib
+import tempfile
+
+from google.adk.sessions import InMemorySessionService
+
+from src.benchmark import fake_models, generate_synthetic_clip
+from src.segments import analyze_long_video, is_long_video, merge_timeline, plan_windows
+from src.settings import LONG_VIDEO_MIN_SECONDS, SEGMENT_MAX_WINDOWS, SEGMENT_WINDOW_SECONDS, VIDEO_TOKEN_BUDGET
+from src.token_accounting import token_ledger
+from src.tools.video_loader import extract_frame_images
+
+
+def test_plan_windows():
+    print("Testing window planning...")
+    assert plan_windows(300, 1.0, window_seconds=60) == [(0, 60), (60, 120), (120, 180), (180, 240), (240, 300)]
+    assert plan_windows(130, 1.0, window_seconds=60)[-1] == (120, 130)
+    # Too many windows: they are widened so max_windows cover the video
+    windows = plan_windows(1000, 1.0, window_seconds=10, max_windows=4)
+    assert windows == [(0, 250), (250, 500), (500, 750), (750, 1000)]
+    assert plan_windows(0, 30.0) == []
+
+
+def test_merge_timeline_puts_peak_last():
+    print("Testing timeline merge...")
+    windows = [
+        {"start": "00:00", "end": "01:00", "status": "ok", "risk_score": 40.0, "classification": "Normal", "summary": "quiet\nRISK_SCORE: 40"},
+        {"start": "01:00", "end": "02:00", "status": "ok", "risk_score": 300.0, "classification": "Abuse", "summary": "fight\nRISK_SCORE: 300"},
+        {"start": "02:00", "end": "02:30", "status": "error", "error": "No RISK_SCORE in window analysis"},
+    ]
+    merged = merge_timeline(pathlib.Path("long.mp4"), windows)
+    lines = merged.splitlines()
+    assert lines[1] == "[00:00-01:00] risk 40 (Normal)"
+    assert lines[2] == "[01:00-02:00] risk 300 (Abuse)  <== HIGHEST RISK"
+    assert lines[3].startswith("[02:00-02:30] analysis failed")
+    assert merged.endswith("fight\nRISK_SCORE: 300")
+
+    assert merge_timeline(pathlib.Path("long.mp4"), windows[2:]) is None
+
+
+def test_long_video_windows_run_concurrently():
+    print("Testing segmented analysis of a long video...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "long.avi")
+        generate_synthetic_clip(path, 160, 120, LONG_VIDEO_MIN_SECONDS + 60, fps=2, fourcc="MJPG")
+        frame_result = extract_frame_images(path)
+        assert is_long_video(frame_result)
+
+        with fake_models(latency=0.3) as fake:
+            merged, windows = asyncio.run(analyze_long_video(pathlib.Path(path), frame_result, InMemorySessionService()))
+
+        assert len(windows) == 3
+        assert all(window["status"] == "ok" for window in windows)
+        assert [window["start"] for window in windows] == ["00:00", "01:00", "02:00"]
+        assert merged.startswith("LONG VIDEO TIMELINE for long.avi (3 windows):")
+        # All three windows were waiting on the model at the same time
+        assert fake.peak_in_flight == 3
+
+
+def test_every_window_fits_the_default_budget():
+    print("Testing a 30-window video under the per-video token budget...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "long.avi")
+        generate_synthetic_clip(path, 160, 120, SEGMENT_MAX_WINDOWS * SEGMENT_WINDOW_SECONDS, fps=1, fourcc="MJPG")
+        frame_result = extract_frame_images(path)
+
+        with fake_models(latency=0.0), token_ledger.track("long.avi"):
+            merged, windows = asyncio.run(analyze_long_video(pathlib.Path(path), frame_result, InMemorySessionService()))
+        usage = token_ledger.finish_video("long.avi")
+
+        assert len(windows) == SEGMENT_MAX_WINDOWS
+        assert [window["status"] for window in windows] == ["ok"] * SEGMENT_MAX_WINDOWS
+        assert "analysis failed" not in merged
+        # Together the windows use more than one video's budget, and all of it is reported
+        assert usage["calls"] == SEGMENT_MAX_WINDOWS
+        assert usage["tokens"] > VIDEO_TOKEN_BUDGET
+
+
+if __name__ == "__main__":
+    test_plan_windows()
+    test_merge_timeline_puts_peak_last()
+    test_long_video_windows_run_concurrently()
+    test_every_window_fits_the_default_budget()
+    print("\nAll long video checks passed")
@@ -0,0 +1,46 @@
+import asyncio
+
+from google.adk.sessions import InMemorySessionService
+
+from src.sessions import USER_ID, agent_session
+
+
+def _session_ids(service, app_name):
+    return set(service.sessions.get(app_name, {}).get(USER_ID, {}))
+
+
+def test_sessions_are_deleted_after_the_turn():
+    print("Testing session teardown...")
+    service = InMemorySessionService()
+
+    async def run():
+        async with agent_session(service, "video_analysis", "video", "clip") as session:
+            assert _session_ids(service, "video_analysis") == {session.id}
+        assert _session_ids(service, "video_analysis") == set()
+
+        async with agent_session(service, "video_analysis", "video", "clip", keep=True) as kept:
+            pass
+        assert _session_ids(service, "video_analysis") == {kept.id}
+
+    asyncio.run(run())
+
+
+def test_same_stem_does_not_collide():
+    print("Testing session ids for videos sharing a stem...")
+    service = InMemorySessionService()
+
+    async def run():
+        # cam1/clip.mp4 and cam2/clip.mp4 analyzed at the same time
+        async with agent_session(service, "video_analysis", "video", "clip") as first:
+            async with agent_session(service, "video_analysis", "video", "clip") as second:
+                assert first.id != second.id
+                assert first.id.startswith("video_clip_") and second.id.startswith("video_clip_")
+                assert len(_session_ids(service, "video_analysis")) == 2
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_sessions_are_deleted_after_the_turn()
+    test_same_stem_does_not_collide()
+    print("\nAll session checks passed")
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from google.adk.events import Event
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+import src.run_batch as run_batch
+from src.agents.structured_analyzer import STRUCTURED_ANALYSIS_PROMPT, ThreatAnalysis, parse_analysis, render_report
+from src.agents.threat_classifier import parse_risk_score
+from src.benchmark import benchmark_end_to_end, fake_models, generate_matrix
+from src.llm_backend import FakeLlm
+from src.settings import RETRY_BACKOFF_BASE_SECONDS
+
+
+def test_parse_analysis():
+    print("Testing structured reply parsing...")
+    reply = {
+        "summary": "A person walks past the entrance",
+        "threats": "None identified",
+        "hazard": 2,
+        "exposure": 3,
+        "vulnerability": 2,
+        "risk_score": 12,
+        "classification": "Normal",
+    }
+    analysis = parse_analysis(json.dumps(reply))
+    assert analysis == ThreatAnalysis(**reply)
+    assert parse_analysis(f"```json\n{json.dumps(reply)}\n```") == analysis
+    assert parse_risk_score(render_report(analysis)) == 12
+
+    assert parse_analysis("SUMMARY: not json") is None
+    assert parse_analysis(json.dumps({**reply, "hazard": 11})) is None
+    assert parse_analysis(json.dumps({**reply, "classification": "Burglary"})) is None
+    # 2 × 3 × 2 is 12, not 18
+    assert parse_analysis(json.dumps({**reply, "risk_score": 18})) is None
+
+
+class _ScriptedRunner:
+    """Stands in for a Runner, answering each turn with the next scripted reply (None: a malformed function call)"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.turns = 0
+
+    async def run_async(self, user_id, session_id, new_message):
+        reply = self.replies[self.turns]
+        self.turns += 1
+        if reply is None:
+            yield Event(author="StructuredVideoAnalyzer", error_code="MALFORMED_FUNCTION_CALL")
+            return
+        yield Event(author="StructuredVideoAnalyzer", content=types.Content(role="model", parts=[types.Part.from_text(text=reply)]))
+
+
+def test_inconsistent_risk_score_is_retried():
+    print("Testing the retry of an inconsistent risk score...")
+    reply = {"summary": "Two people fight", "threats": "Assault", "hazard": 7, "exposure": 4, "vulnerability": 5, "risk_score": 140, "classification": "Assault"}
+    runner = _ScriptedRunner([json.dumps({**reply, "risk_score": 700}), json.dumps(reply)])
+    result = asyncio.run(run_batch._run_agent_with_retries(runner, "session", None, "Structured analysis", validate=parse_analysis))
+    assert runner.turns == 2
+    assert parse_analysis(result).risk_score == 140
+
+
+def test_malformed_and_empty_replies_back_off():
+    print("Testing the backoff before retrying malformed and empty replies...")
+    delays = []
+
+    def fixed_delay(attempt, error=None, base=None, cap=None):
+        delays.append((attempt, error, base))
+        return 0.2
+
+    reply = {"summary": "Two people fight", "threats": "Assault", "hazard": 7, "exposure": 4, "vulnerability": 5, "risk_score": 140, "classification": "Assault"}
+    runner = _ScriptedRunner([None, "", json.dumps(reply)])
+    previous = run_batch.backoff_delay
+    run_batch.backoff_delay = fixed_delay
+    try:
+        started = time.perf_counter()
+        result = asyncio.run(run_batch._run_agent_with_retries(runner, "session", None, "Structured analysis", validate=parse_analysis))
+        elapsed = time.perf_counter() - started
+    finally:
+        run_batch.backoff_delay = previous
+    assert runner.turns == 3
+    assert parse_analysis(result).risk_score == 140
+    assert delays == [(0, None, RETRY_BACKOFF_BASE_SECONDS), (1, None, RETRY_BACKOFF_BASE_SECONDS)]
+    assert elapsed >= 0.4
+
+
+def test_fake_answers_schema_requests_with_json():
+    print("Testing fake backend structured replies...")
+    request = LlmRequest(
+        contents=[types.Content(role="user", parts=[types.Part.from_text(text="Analyze these 4 frames from clip.mp4 for surveillance threats.")])],
+        config=types.GenerateContentConfig(system_instruction=STRUCTURED_ANALYSIS_PROMPT, response_schema=ThreatAnalysis, response_mime_type="application/json"),
+    )
+    model = FakeLlm(latency=0, response_chars=600)
+    responses = asyncio.run(_collect(model, request))
+    text = responses[0].content.parts[0].text
+    analysis = parse_analysis(text)
+    assert analysis is not None and len(text) >= 600
+    assert analysis.risk_score == analysis.hazard * analysis.exposure * analysis.vulnerability
+
+
+async def _collect(model, request):
+    return [response async for response in model.generate_content_async(request)]
+
+
+def test_structured_engine_makes_one_call_per_video():
+    print("Testing the structured engine end to end...")
+    previous = run_batch.ANALYSIS_ENGINE
+    previous_cascade = run_batch.CASCADE_ENABLED
+    with tempfile.TemporaryDirectory() as tmp:
+        clips = generate_matrix(tmp, resolutions=[(160, 120)], lengths=[1], codecs=[("MJPG", ".avi")])
+        # One call per video is the first tier's cost; escalation is covered in test_cascade.py
+        run_batch.ANALYSIS_ENGINE, run_batch.CASCADE_ENABLED = "structured", False
+        try:
+            result = benchmark_end_to_end(clips[0], num_videos=3, latency=0.0, concurrency=2, extract_workers=0)
+        finally:
+            run_batch.ANALYSIS_ENGINE, run_batch.CASCADE_ENABLED = previous, previous_cascade
+        assert result["successful"] == 3
+        assert result["model_calls"] == 3
+
+        # The record keeps the validated JSON next to the rendered report
+        video_dir = os.path.join(tmp, "videos")
+        os.makedirs(video_dir)
+        os.link(clips[0]["path"], os.path.join(video_dir, "clip.avi"))
+        run_batch.ANALYSIS_ENGINE, run_batch.CASCADE_ENABLED = "structured", False
+        try:
+            with fake_models(latency=0.0):
+                asyncio.run(run_batch.process_videos_async(video_dir, os.path.join(tmp, "results.jsonl"), 1, 0, use_result_cache=False, use_result_store=False, metrics_file=None))
+        finally:
+            run_batch.ANALYSIS_ENGINE, run_batch.CASCADE_ENABLED = previous, previous_cascade
+        with open(os.path.join(tmp, "results.jsonl")) as f:
+            record = json.loads(f.readline())
+        assert record["status"] == "ok"
+        assert record["classification"] == record["analysis"]["classification"]
+        assert record["risk_score"] == str(record["analysis"]["risk_score"])
+        assert record["tokens"]["calls"] == 1
+
+
+if __name__ == "__main__":
+    test_parse_analysis()
+    test_inconsistent_risk_score_is_retried()
+    test_malformed_and_empty_replies_back_off()
+    test_fake_answers_schema_requests_with_json()
+    test_structured_engine_makes_one_call_per_video()
+    print("\nAll structured engine checks passed")
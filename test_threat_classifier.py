@@ -0,0 +1,64 @@
+from src.agents.threat_classifier import classify_locally, classify_risk_score, parse_classification, parse_factor, parse_risk_score
+
+
+def test_parse_risk_score():
+    print("Testing RISK_SCORE parsing...")
+    assert parse_risk_score("SUMMARY: quiet corridor\nRISK_SCORE: 12") == 12
+    assert parse_risk_score("**RISK_SCORE:** 6 × 5 × 4 = 120") == 120
+    assert parse_risk_score("RISK_SCORE: 125 (Fallback score due to analysis failure)") == 125
+    assert parse_risk_score("SUMMARY: no score given") is None
+
+
+def test_parse_risk_score_formulas_and_separators():
+    print("Testing RISK_SCORE formulas and thousands separators...")
+    assert parse_risk_score("RISK_SCORE: 8 × 7 × 6") == 336
+    assert parse_risk_score("**RISK_SCORE:** 10 x 10 x 10") == 1000
+    assert parse_risk_score("RISK_SCORE: 6*5*4 (high)") == 120
+    assert parse_risk_score("RISK_SCORE: 1,000") == 1000
+    assert parse_risk_score("RISK_SCORE: 10 × 10 × 10 = 1,000") == 1000
+    assert parse_risk_score("RISK_SCORE: 120 (6 × 5 × 4)") == 120
+    assert parse_risk_score("RISK_SCORE: 12, low") == 12
+    # A misread score would be classified locally without the LLM
+    assert classify_locally("SUMMARY: man robs store\nRISK_SCORE: 8 × 7 × 6") == "RISK_SCORE: 336\nCLASSIFICATION: Abuse"
+    assert classify_locally("SUMMARY: man robs store\nRISK_SCORE: 1,000") == "RISK_SCORE: 1000\nCLASSIFICATION: Assault"
+
+
+def test_parse_classification_and_factors():
+    print("Testing CLASSIFICATION and factor parsing...")
+    assert parse_classification("RISK_SCORE: 336\nCLASSIFICATION: Abuse") == "Abuse"
+    assert parse_classification("**RISK_SCORE:** 640\n**CLASSIFICATION:** Assault") == "Assault"
+    assert parse_classification("- classification: **arrest**") == "Arrest"
+    assert parse_classification("CLASSIFICATION: [Abuse|Assault|Arson|Arrest|Normal]") is None
+    assert parse_classification("THREAT_SCORE: 50") is None
+
+    report = "**HAZARD:** 7/10 (armed threat)\nEXPOSURE: 4 - five people\nVULNERABILITY: unclear"
+    assert parse_factor(report, "hazard") == 7
+    assert parse_factor(report, "EXPOSURE") == 4
+    assert parse_factor(report, "VULNERABILITY") is None
+
+
+def test_classification_rules():
+    print("Testing classification table...")
+    assert classify_risk_score(500) == "Assault"
+    assert classify_risk_score(499) == "Abuse"
+    assert classify_risk_score(100) == "Arrest"
+    assert classify_risk_score(99) == "Normal"
+    assert classify_risk_score(0) == "Normal"
+
+
+def test_special_cases_fall_back_to_llm():
+    print("Testing special-case fallback...")
+    assert classify_locally("SUMMARY: man robs store\nRISK_SCORE: 336") == "RISK_SCORE: 336\nCLASSIFICATION: Abuse"
+    assert classify_locally("SUMMARY: police officers detain a man\nRISK_SCORE: 150") is None
+    assert classify_locally("SUMMARY: person in a wheelchair is pushed\nRISK_SCORE: 210") is None
+    assert classify_locally("THREATS: two armed men with several guns\nRISK_SCORE: 640") is None
+    assert classify_locally("SUMMARY: unreadable output") is None
+
+
+if __name__ == "__main__":
+    test_parse_risk_score()
+    test_parse_risk_score_formulas_and_separators()
+    test_parse_classification_and_factors()
+    test_classification_rules()
+    test_special_cases_fall_back_to_llm()
+    print("\nAll threat classifier checks passed")
@@ -0,0 +1,50 @@
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from src.settings import IMAGE_TOKENS
+from src.token_accounting import TokenLedger, estimate_request_tokens
+
+
+def test_structural_estimate():
+    print("Testing structural token estimate...")
+    jpeg = b"\xff\xd8" + b"\x00" * 20000
+    request = LlmRequest(contents=[
+        types.Content(role="user", parts=[
+            types.Part.from_text(text="x" * 400),
+            types.Part.from_bytes(data=jpeg, mime_type="image/jpeg"),
+        ]),
+        types.Content(role="user", parts=[
+            types.Part.from_function_response(name="extract_video_frames", response={"frames": ["a" * 800]}),
+        ]),
+    ])
+    tokens = estimate_request_tokens(request)
+    # 100 text tokens + one image + the base64 string and names in the function response
+    assert tokens == 100 + IMAGE_TOKENS + 200 + 5 + 2, tokens
+
+
+def test_ledger_tracks_videos_and_settles():
+    print("Testing per-video ledger...")
+    ledger = TokenLedger()
+    with ledger.track("a.mp4"):
+        ledger.charge_estimate(300)
+        ledger.settle(450)
+        ledger.charge_estimate(100)
+        ledger.settle(None)
+        assert ledger.used() == {"run": 550, "video": 550}
+    assert ledger.finish_video("a.mp4") == {"calls": 2, "estimated_prompt_tokens": 400, "tokens": 550}
+    assert ledger.run_usage()["tokens"] == 550
+
+    # A sub-scope with its own budget is reported with the video but not budgeted
+    with ledger.track("b.mp4"):
+        with ledger.track("b.mp4#window1"):
+            ledger.charge_estimate(200)
+        ledger.absorb(ledger.finish_video("b.mp4#window1"))
+        ledger.charge_estimate(50)
+        assert ledger.used() == {"run": 800, "video": 50}
+    assert ledger.finish_video("b.mp4") == {"calls": 2, "estimated_prompt_tokens": 250, "tokens": 250}
+
+
+if __name__ == "__main__":
+    test_structural_estimate()
+    test_ledger_tracks_videos_and_settles()
+    print("\nAll token accounting checks passed")
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import src.watch_folder as watch_folder
+from src.watch_folder import FolderWatcher
+
+
+async def _watch(watcher, seconds, during=None):
+    """Run `watcher` for `seconds`, calling `during()` halfway through; returns (queued paths, times)"""
+    task = asyncio.ensure_future(watcher.run())
+    try:
+        if during is not None:
+            await asyncio.sleep(seconds / 2)
+            during()
+            await asyncio.sleep(seconds / 2)
+        else:
+            await asyncio.sleep(seconds)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    queued = []
+    while not watcher.queue.empty():
+        queued.append(watcher.queue.get_nowait())
+    return queued
+
+
+def _append(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def test_file_is_queued_once_after_it_settles():
+    print("Testing the settle window in polling mode...")
+    previous = watch_folder.WATCHDOG_AVAILABLE
+    watch_folder.WATCHDOG_AVAILABLE = False
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cam1_clip.mp4")
+            _append(path, b"first chunk")
+            _append(os.path.join(tmp, "notes.txt"), b"not a video")
+            watcher = FolderWatcher(tmp, asyncio.Queue(), settle_seconds=0.4, poll_interval=0.05)
+            second_write = []
+
+            def write_second_chunk():
+                _append(path, b"second chunk")
+                second_write.append(time.monotonic())
+
+            async def scenario():
+                loop_started = time.monotonic()
+                task = asyncio.ensure_future(watcher.run())
+                # The second chunk lands before the first one has settled
+                await asyncio.sleep(0.25)
+                write_second_chunk()
+                queued_at = None
+                while time.monotonic() - loop_started < 2.0:
+                    if queued_at is None and not watcher.queue.empty():
+                        queued_at = time.monotonic()
+                    await asyncio.sleep(0.01)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return queued_at
+
+            queued_at = asyncio.run(scenario())
+            assert queued_at is not None
+            assert queued_at - second_write[0] >= 0.4
+            assert watcher.queue.qsize() == 1
+            assert str(watcher.queue.get_nowait()) == os.path.realpath(path)
+    finally:
+        watch_folder.WATCHDOG_AVAILABLE = previous
+
+
+def test_completed_files_are_skipped_until_they_change():
+    print("Testing restart and replaced files...")
+    previous = watch_folder.WATCHDOG_AVAILABLE
+    watch_folder.WATCHDOG_AVAILABLE = False
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            done, new = os.path.join(tmp, "a_done.mp4"), os.path.join(tmp, "b_new.mp4")
+            _append(done, b"analyzed by an earlier run")
+            _append(new, b"arrived while the daemon was down")
+            watcher = FolderWatcher(tmp, asyncio.Queue(), settle_seconds=0.1, poll_interval=0.05, completed={"a_done.mp4"})
+
+            queued = asyncio.run(_watch(watcher, 0.5))
+            assert [str(path) for path in queued] == [os.path.realpath(new)]
+
+            # A different clip copied over the analyzed one is a new version
+            queued = asyncio.run(_watch(watcher, 0.8, during=lambda: _append(done, b" and replaced")))
+            assert [str(path) for path in queued] == [os.path.realpath(done)]
+    finally:
+        watch_folder.WATCHDOG_AVAILABLE = previous
+
+
+if __name__ == "__main__":
+    test_file_is_queued_once_after_it_settles()
+    test_completed_files_are_skipped_until_they_change()
+    print("\nAll watch folder checks passed")